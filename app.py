@@ -1,19 +1,44 @@
+import time
+INICIO = time.perf_counter()  # referência para o modo --perfil
+
+import argparse
 import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 from datetime import datetime # Caso necessário importar também: timedelta
 import json
 import os
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from PIL import Image as PILImage # Caso necessário importar também: ImageDraw, ImageFont
-import io
+import threading
+
+from armazenamento import SECOES, chave_paciente, criar_armazenamento
+from diario_evolucao import DiarioEvolucao
+from formulario import (CAMPOS_ANTROPOMETRIA, CAMPOS_EXAMES, CAMPOS_IDENTIFICACAO,
+                        ModeloFormulario)
+from observador import ObservadorPacientes
+from persistencia import GerenciadorPersistencia
+from sessao import CacheSessao, ModeloPaciente
+from trabalhador import TrabalhadorES
+
+# matplotlib, NumPy, reportlab e PIL não são importados aqui: a maior parte
+# das sessões é digitação de dados. Os módulos que dependem deles (graficos,
+# relatorios, nutricao, serie_historica, catalogo, composicao) são importados no
+# primeiro uso, dentro dos métodos. Ver "python app.py --perfil".
+PESADOS = ('matplotlib', 'numpy', 'reportlab', 'PIL')
+
+# Cores da paleta moderna (também usadas nos relatórios em lote)
+CORES = {
+    'primaria': '#2c3e50',
+    'secundaria': '#3498db',
+    'sucesso': '#27ae60',
+    'alerta': '#f39c12',
+    'perigo': '#e74c3c',
+    'info': '#17a2b8',
+    'fundo': '#f8f9fa',
+    'card': '#ffffff',
+    'texto': '#2c3e50',
+    'texto_secundario': '#6c757d'
+}
+
 
 class AvaliacaoNutricionalIdosos:
     def __init__(self, root):
@@ -23,31 +48,98 @@ class AvaliacaoNutricionalIdosos:
         self.root.configure(bg='#f0f2f5')
         
         # Cores da paleta moderna
-        self.cores = {
-            'primaria': '#2c3e50',
-            'secundaria': '#3498db',
-            'sucesso': '#27ae60',
-            'alerta': '#f39c12',
-            'perigo': '#e74c3c',
-            'info': '#17a2b8',
-            'fundo': '#f8f9fa',
-            'card': '#ffffff',
-            'texto': '#2c3e50',
-            'texto_secundario': '#6c757d'
-        }
+        self.cores = CORES
         
         # Dados do paciente
         self.dados_paciente = {}
         self.dados_antropometricos = {}
         self.dados_clinicos = {}
         self.dados_alimentares = {}
-        self.historico_consultas = []
+        # Histórico antropométrico em colunas NumPy (pacientes/historico/<nome>/),
+        # criado no primeiro uso (propriedade historico)
+        self._historico = None
+        self.historico_gravado = None  # (pasta, registros) do que já está em disco
+        # Versão dos dados exibidos: incrementada a cada alteração, para o
+        # dashboard só redesenhar quando algo mudou
+        self.versao_dados = 0
+        self.versao_desenhada = None
+        self.recalculo_recordatorio = None  # after() pendente dos totais do recordatório
         self.dados_intervencao = {}
         self.dados_evolucao = {}
 
-        
+        # Armazenamento: JSON em pacientes/ (padrão) ou SQLite indexado
+        # (NUTRI_ARMAZENAMENTO=sqlite)
+        self.pasta_pacientes = os.path.join(os.getcwd(), "pacientes")
+        self.pasta_evolucoes = os.path.join(os.getcwd(), "evoluções")
+        self.armazenamento = criar_armazenamento(pasta=self.pasta_pacientes)
+        self.catalogo = None  # criado na primeira abertura do seletor de pacientes
+        # Indicadores da coorte (aba Coorte): lidos uma vez numa thread própria,
+        # para não atrasar as gravações, e depois atualizados a cada paciente salvo
+        self.coorte = None
+        self.coorte_pendentes = None  # resumos salvos durante a leitura inicial
+        self.trabalhador_coorte = None
+        # Relatório em PDF sendo gerado (thread própria): evento de cancelamento
+        # e (flowables diagramados, total), lidos pela interface com after()
+        self.trabalhador_relatorios = None
+        self.relatorio_cancelar = None
+        self.relatorio_progresso = (0, 0)
+        self.versao_coorte_desenhada = None
+        # Linha do tempo das evoluções do paciente atual (aba Linha do Tempo),
+        # criada quando a aba é aberta e descartada ao trocar de paciente
+        self.linha_tempo = None
+        # Pacientes abertos recentemente, em memória: reabri-los não lê o disco.
+        # chave_sessao é a chave com que o paciente atual volta ao cache ao ser
+        # trocado (None enquanto ele não estiver gravado no armazenamento)
+        self.sessao = CacheSessao()
+        self.chave_sessao = None
+        # Importação de planilha em andamento (thread própria, para não atrasar
+        # as gravações): último resumo parcial, escrito pela thread da
+        # importação e lido pela interface com after(), e evento de cancelamento
+        self.importacao = None
+        self.trabalhador_importacao = None
+        self.importacao_cancelar = None
+
+        # Campos da interface ligados a variáveis do Tk: abrir um paciente só
+        # atribui as variáveis, sem reescrever widget por widget
+        self.formulario = ModeloFormulario(self.root, self.dados_formulario)
+
+        # Gravações em disco rodam numa thread de E/S, fora do mainloop do Tk
+        self.trabalhador = TrabalhadorES(self.root)
+
+        # Seções alteradas são agrupadas e gravadas de forma atômica
+        self.persistencia = GerenciadorPersistencia(self.armazenamento,
+                                                    self.dados_completos,
+                                                    agendar=self.root.after,
+                                                    cancelar=self.root.after_cancel,
+                                                    trabalhador=self.trabalhador,
+                                                    ao_gravar=self.ao_gravar_arquivo,
+                                                    ao_falhar=self.ao_falhar_persistencia)
+        
+        # Pacientes alterados por outra estação na mesma pasta (ou banco):
+        # verificações periódicas, numa thread própria, com espera exponencial
+        self.observador = ObservadorPacientes(
+            self.armazenamento, self.root.after, self.root.after_cancel,
+            TrabalhadorES(self.root, intervalo_ms=100), self.ao_mudar_pacientes,
+            ocupado=lambda: (self.persistencia.pendente or self.trabalhador.pendentes > 0
+                             or self.importacao is not None))
+        self.aviso_alteracao = False  # pergunta sobre o paciente aberto já na tela
+
         self.setup_interface()
-        
+        self.observador.iniciar()
+        # Ao voltar para a janela, verifica logo em vez de esperar o intervalo
+        self.root.bind('<FocusIn>', lambda event: self.observador.acelerar(), add='+')
+        
+    @property
+    def historico(self):
+        if self._historico is None:
+            from serie_historica import SerieAntropometrica
+            self._historico = SerieAntropometrica()
+        return self._historico
+
+    @historico.setter
+    def historico(self, serie):
+        self._historico = serie
+
     def setup_interface(self):
         # Estilo personalizado
         self.style = ttk.Style()
@@ -98,28 +190,66 @@ class AvaliacaoNutricionalIdosos:
                                   text="Carregar Avaliação", 
                                   command=self.carregar_dados)
         btn_carregar.place(relx=0.98, rely=0.5, anchor='e')  # ajusta posição no header
+
+        # Troca rápida entre os pacientes abertos recentemente (cache de sessão)
+        self.menu_recentes = tk.Menu(self.root, tearoff=0,
+                                     postcommand=self.atualizar_menu_recentes)
+        btn_recentes = ttk.Menubutton(header_frame, text="Recentes", menu=self.menu_recentes)
+        btn_recentes.place(in_=btn_carregar, x=-10, rely=0.5, anchor='e')
+
+        # Situação da última gravação (bytes e tempo), no lado esquerdo do header
+        self.status_gravacao = tk.Label(header_frame, text="",
+                                        font=('Arial', 9),
+                                        bg=self.cores['primaria'], fg='white')
+        self.status_gravacao.place(relx=0.02, rely=0.5, anchor='w')
         
         # Notebook para abas
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill='both', expand=True)
         
-        # Criar abas
-        self.criar_aba_identificacao()
-        self.criar_aba_anamnese()
-        self.criar_aba_antropometria()
-        self.criar_aba_clinica()
-        self.criar_aba_alimentar()
-        self.criar_aba_intervencao()
-        self.criar_aba_evolucao()
-        self.criar_aba_dashboard()
-        self.criar_aba_relatorios()
-        
-        # Bind para atualizar dashboard quando trocar de aba
-        self.notebook.bind('<<NotebookTabChanged>>', self.atualizar_dashboard)
+        # Criar abas: só a aba visível é construída agora; as demais, na primeira
+        # vez em que forem selecionadas. Os valores ficam nos dicionários dados_*;
+        # os campos de uma aba nova já são criados com eles (self.formulario) e
+        # preencher_* atualiza o que é calculado a partir deles.
+        self.abas_pendentes = {}
+        self.abas_construidas = []
+        for titulo, criar, preencher in [
+            ('Identificação', self.criar_aba_identificacao, None),
+            ('Anamnese', self.criar_aba_anamnese, None),
+            ('Antropometria', self.criar_aba_antropometria, self.preencher_antropometria),
+            ('Avaliação Clínica', self.criar_aba_clinica, None),
+            ('Avaliação Alimentar', self.criar_aba_alimentar, self.preencher_alimentar),
+            ('Intervenção Nutricional', self.criar_aba_intervencao, None),
+            ('Evolução Nutricional', self.criar_aba_evolucao, None),
+            ('Linha do Tempo', self.criar_aba_linha_tempo, None),
+            ('Dashboard', self.criar_aba_dashboard, None),
+            ('Coorte', self.criar_aba_coorte, None),
+            ('Relatórios', self.criar_aba_relatorios, None),
+        ]:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=titulo)
+            self.abas_pendentes[str(frame)] = (frame, criar, preencher)
+        self.construir_aba(self.notebook.select())
+        
+        # Constrói a aba na primeira seleção e atualiza o dashboard
+        self.notebook.bind('<<NotebookTabChanged>>', self.ao_trocar_aba)
+        
+    def construir_aba(self, aba):
+        if aba not in self.abas_pendentes:
+            return
+        frame, criar, preencher = self.abas_pendentes.pop(aba)
+        criar(frame)
+        if preencher is not None:
+            preencher()
+            self.abas_construidas.append(preencher)
+    
+    def ao_trocar_aba(self, event=None):
+        self.construir_aba(self.notebook.select())
+        self.atualizar_dashboard(event)
+        self.atualizar_coorte()
+        self.atualizar_linha_tempo()
         
-    def criar_aba_identificacao(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Identificação')
+    def criar_aba_identificacao(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -152,22 +282,7 @@ class AvaliacaoNutricionalIdosos:
         form_frame.pack(fill='x', padx=20, pady=20)
         
         # Grid de campos
-        campos = [
-            ('Nome Completo:', 'nome'),
-            ('Data de Nascimento:', 'data_nascimento'),
-            ('Idade:', 'idade'),
-            ('Sexo:', 'sexo'),
-            ('Nº de Registro:', 'registro'),
-            ('Telefone:', 'telefone'),
-            ('Email:', 'email'),
-            ('Endereço:', 'endereco'),
-            ('Profissão:', 'profissao'),
-            ('Contato de Emergência :', 'contato_emergencia'),
-            ('Telefone de Emergência :', 'telefone_emergencia'),
-            ('Estado Civil:', 'estado_civil'),
-            ('Escolaridade:', 'escolaridade'),
-            ('Data da Admissão:', 'data_admissao'),
-        ]
+        campos = CAMPOS_IDENTIFICACAO
         
         self.campos_identificacao = {}
         
@@ -180,13 +295,16 @@ class AvaliacaoNutricionalIdosos:
                     bg=self.cores['card']).grid(row=row, column=col, 
                                               sticky='w', padx=(0, 10), pady=5)
             
+            variavel = self.formulario.var(('paciente', campo))
             if campo == 'sexo':
                 self.campos_identificacao[campo] = ttk.Combobox(form_frame, 
                                                               values=['Masculino', 'Feminino'],
+                                                              textvariable=variavel,
                                                               width=25)
             elif campo == 'estado_civil':
                 self.campos_identificacao[campo] = ttk.Combobox(form_frame,
                                                               values=['Solteiro(a)', 'Casado(a)', 'Divorciado(a)', 'Viúvo(a)'],
+                                                              textvariable=variavel,
                                                               width=25)
             elif campo == 'escolaridade':
                 self.campos_identificacao[campo] = ttk.Combobox(form_frame,
@@ -194,9 +312,11 @@ class AvaliacaoNutricionalIdosos:
                                                                      'Fundamental Completo', 'Médio Incompleto',
                                                                      'Médio Completo', 'Superior Incompleto',
                                                                      'Superior Completo', 'Pós-graduação'],
+                                                              textvariable=variavel,
                                                               width=25)
             else:
-                self.campos_identificacao[campo] = tk.Entry(form_frame, width=30)
+                self.campos_identificacao[campo] = tk.Entry(form_frame, width=30,
+                                                            textvariable=variavel)
             
             self.campos_identificacao[campo].grid(row=row, column=col+1, 
                                                 sticky='w', padx=(0, 20), pady=5)
@@ -214,13 +334,17 @@ class AvaliacaoNutricionalIdosos:
                  bg=self.cores['alerta'], fg='white',
                  font=('Arial', 10, 'bold'),
                  command=self.limpar_identificacao).pack(side='left')
-        
+
+        self.botao_importar = tk.Button(btn_frame, text="Importar Planilha (CSV)",
+                                        bg=self.cores['secundaria'], fg='white',
+                                        font=('Arial', 10, 'bold'),
+                                        command=self.importar_planilha)
+        self.botao_importar.pack(side='left', padx=(10, 0))
+
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-    def criar_aba_anamnese(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Anamnese')
+    def criar_aba_anamnese(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -284,11 +408,14 @@ class AvaliacaoNutricionalIdosos:
             if campo in ['historico_familiar', 'historico_pessoal', 'habitos_vida',
                             'alergias', 'intolerancias', 'suplementos_utilizados', 
                             'objetivos_nutricionais']:
-                    self.campos_anamnese[campo] = tk.Text(form_frame, height=4, width=50)
+                    self.campos_anamnese[campo] = self.formulario.vincular_texto(
+                        ('paciente', 'anamnese', campo), tk.Text(form_frame, height=4, width=50))
                     self.campos_anamnese[campo].grid(row=row, column=col+1, 
                                                     sticky='w', padx=(0, 20), pady=5)
             else:
-                self.campos_anamnese[campo] = tk.Entry(form_frame, width=30)
+                self.campos_anamnese[campo] = tk.Entry(
+                    form_frame, width=30,
+                    textvariable=self.formulario.var(('paciente', 'anamnese', campo)))
                 self.campos_anamnese[campo].grid(row=row, column=col+1, 
                                                 sticky='w', padx=(0, 20), pady=5)
         # Botões
@@ -307,9 +434,7 @@ class AvaliacaoNutricionalIdosos:
         
 
         
-    def criar_aba_antropometria(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Antropometria')
+    def criar_aba_antropometria(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -341,30 +466,7 @@ class AvaliacaoNutricionalIdosos:
         form_frame = tk.Frame(card_frame, bg=self.cores['card'])
         form_frame.pack(fill='x', padx=20, pady=20)
         
-        campos_antropo = [
-            ('Peso Atual (kg):', 'peso_atual'),
-            ('Altura (cm):', 'altura'),
-            ('Peso Habitual (kg):', 'peso_habitual'),
-            ('Peso Estimado (kg):', 'peso_estimado'),
-            ('Peso Ideal (kg):', 'peso_ideal'),
-            ('Altura Estimada (cm):', 'altura_estimada'),
-            ('Altura do Joelho (cm):', 'altura_joelho'),
-            ('Circunferência do Braço (cm):', 'circ_braco'),
-            ('Circunferência Muscular do Braço (cm):', 'circ_musc_braco'),
-            ('Circunferência da Panturrilha (cm):', 'circ_panturrilha'),
-            ('Circunferência da Cintura (cm):', 'circ_cintura'),
-            ('Circunferência do Quadril (cm):', 'circ_quadril'),
-            ('Circunferência Abdominal (cm):', 'circ_abdominal'),
-            ('Dobra Cutânea Tricipital (mm):', 'dobra_triceps'),
-            ('Dobra Cutânea Bicipital (mm):', 'dobra_biceps'),
-            ('Dobra Cutânea Subescapular (mm):', 'dobra_subescapular'),
-            ('Dobra Cutânea Suprailiaca (mm):', 'dobra_suprailiaca'),
-            ('Dobra Cutânea Abdominal (mm):', 'dobra_abdominal'),
-            ('Dobra Cutânea Peitoral (mm):', 'dobra_peitoral'),
-            ('Dobra Cutânea Axilar (mm):', 'dobra_axilar'),
-            ('Percentual de Gordura (%):', 'percentual_gordura'),
-            ('Data da Medição:', 'data_medicao')
-        ]
+        campos_antropo = CAMPOS_ANTROPOMETRIA
         
         self.campos_antropometria = {}
         
@@ -377,7 +479,9 @@ class AvaliacaoNutricionalIdosos:
                     bg=self.cores['card']).grid(row=row, column=col, 
                                               sticky='w', padx=(0, 10), pady=5)
             
-            self.campos_antropometria[campo] = tk.Entry(form_frame, width=15)
+            self.campos_antropometria[campo] = tk.Entry(
+                form_frame, width=15,
+                textvariable=self.formulario.var(('antropometricos', campo)))
             self.campos_antropometria[campo].grid(row=row, column=col+1, 
                                                 sticky='w', padx=(0, 20), pady=5)
         
@@ -433,9 +537,7 @@ class AvaliacaoNutricionalIdosos:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-    def criar_aba_clinica(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Avaliação Clínica')
+    def criar_aba_clinica(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -486,7 +588,8 @@ class AvaliacaoNutricionalIdosos:
             row = i // 3
             col = i % 3
             
-            self.doencas_vars[doenca] = tk.BooleanVar()
+            self.doencas_vars[doenca] = self.formulario.var(('clinicos', 'doencas', doenca),
+                                                            booleano=True)
             tk.Checkbutton(doencas_grid, text=doenca,
                           variable=self.doencas_vars[doenca],
                           bg=self.cores['card'],
@@ -499,7 +602,8 @@ class AvaliacaoNutricionalIdosos:
                                  bg=self.cores['card'])
         med_frame.pack(fill='x', padx=20, pady=10)
         
-        self.medicamentos_text = tk.Text(med_frame, height=4, width=80)
+        self.medicamentos_text = self.formulario.vincular_texto(
+            ('clinicos', 'medicamentos'), tk.Text(med_frame, height=4, width=80))
         self.medicamentos_text.pack(padx=10, pady=10)
         
         # Exames laboratoriais
@@ -511,24 +615,7 @@ class AvaliacaoNutricionalIdosos:
         exames_grid = tk.Frame(exames_frame, bg=self.cores['card'])
         exames_grid.pack(fill='x', padx=10, pady=10)
         
-        exames_campos = [
-            ('Glicemia (mg/dL):', 'glicemia'),
-            ('Hemoglobina (g/dL):', 'hemoglobina'),
-            ('Colesterol Total (mg/dL):', 'colesterol_total'),
-            ('HDL (mg/dL):', 'hdl'),
-            ('LDL (mg/dL):', 'ldl'),
-            ('Triglicerídeos (mg/dL):', 'triglicerideos'),
-            ('Ureia (mg/dL):', 'ureia'),
-            ('Creatinina (mg/dL):', 'creatinina'),
-            ('Albumina (g/dL):', 'albumina'),
-            ('Proteínas Totais (g/dL):', 'proteinas_totais'),
-            ('Pré-albumina (mg/dL):', 'pre_albumina'),
-            ('Ferro (µg/dL):', 'ferro'),
-            ('Transferrina (mg/dL):', 'transferrina'),
-            ('Ferritina (ng/mL):', 'ferritina'),
-            ('Vitamina B12 (pg/mL):', 'vitamin_b12'),
-            ('Folato (ng/mL):', 'folato'),
-        ]
+        exames_campos = CAMPOS_EXAMES
         
         self.campos_exames = {}
         
@@ -541,7 +628,8 @@ class AvaliacaoNutricionalIdosos:
                     bg=self.cores['card']).grid(row=row, column=col, 
                                               sticky='w', padx=(0, 10), pady=5)
             
-            self.campos_exames[campo] = tk.Entry(exames_grid, width=15)
+            self.campos_exames[campo] = tk.Entry(
+                exames_grid, width=15, textvariable=self.formulario.var(('clinicos', campo)))
             self.campos_exames[campo].grid(row=row, column=col+1, 
                                          sticky='w', padx=(0, 20), pady=5)
         
@@ -562,9 +650,7 @@ class AvaliacaoNutricionalIdosos:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-    def criar_aba_alimentar(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Avaliação Alimentar')
+    def criar_aba_alimentar(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -600,6 +686,7 @@ class AvaliacaoNutricionalIdosos:
         
         # Refeições
         self.refeicoes = {}
+        self.totais_refeicoes = {}
         refeicoes_nomes = ['Café da Manhã', 'Lanche da Manhã', 'Almoço', 
                           'Lanche da Tarde', 'Jantar', 'Ceia']
         
@@ -609,8 +696,19 @@ class AvaliacaoNutricionalIdosos:
                                      bg=self.cores['card'])
             ref_frame.pack(fill='x', padx=10, pady=5)
             
-            self.refeicoes[refeicao] = tk.Text(ref_frame, height=3, width=80)
+            self.refeicoes[refeicao] = self.formulario.vincular_texto(
+                ('alimentares', 'recordatorio', refeicao), tk.Text(ref_frame, height=3, width=80))
             self.refeicoes[refeicao].pack(padx=5, pady=5)
+            # Energia e macronutrientes, recalculados enquanto se digita
+            self.refeicoes[refeicao].bind('<KeyRelease>', self.ao_digitar_recordatorio)
+            self.totais_refeicoes[refeicao] = tk.Label(ref_frame, text='', font=('Arial', 9),
+                                                      bg=self.cores['card'],
+                                                      fg=self.cores['texto_secundario'])
+            self.totais_refeicoes[refeicao].pack(anchor='w', padx=5)
+        
+        self.total_recordatorio = tk.Label(r24h_frame, text='', font=('Arial', 10, 'bold'),
+                                           bg=self.cores['card'], fg=self.cores['primaria'])
+        self.total_recordatorio.pack(anchor='w', padx=10, pady=5)
         
         # Frequência alimentar
         freq_frame = tk.LabelFrame(card_frame, text="Frequência Alimentar Semanal", 
@@ -644,11 +742,14 @@ class AvaliacaoNutricionalIdosos:
                     bg=self.cores['card']).grid(row=i+1, column=0, 
                                               sticky='w', padx=10, pady=2)
             
-            self.frequencia_vars[grupo] = ttk.Combobox(freq_grid, 
-                                                      values=opcoes_freq,
-                                                      width=15)
+            self.frequencia_vars[grupo] = ttk.Combobox(
+                freq_grid, values=opcoes_freq, width=15,
+                textvariable=self.formulario.var(('alimentares', 'frequencia', grupo)))
             self.frequencia_vars[grupo].grid(row=i+1, column=1, 
                                            padx=10, pady=2)
+            # O gráfico de frequência usa os valores da tela, mesmo antes de salvar
+            self.frequencia_vars[grupo].bind('<<ComboboxSelected>>',
+                                             lambda e: self.dados_alterados())
         
         # Hábitos alimentares
         habitos_frame = tk.LabelFrame(card_frame, text="Hábitos e Preferências", 
@@ -680,12 +781,15 @@ class AvaliacaoNutricionalIdosos:
                     bg=self.cores['card']).grid(row=row, column=col, 
                                               sticky='w', padx=(0, 10), pady=5)
             
+            variavel = self.formulario.var(('alimentares', 'habitos', campo))
             if opcoes:
                 self.campos_habitos[campo] = ttk.Combobox(habitos_grid, 
                                                          values=opcoes,
+                                                         textvariable=variavel,
                                                          width=20)
             else:
-                self.campos_habitos[campo] = tk.Entry(habitos_grid, width=25)
+                self.campos_habitos[campo] = tk.Entry(habitos_grid, width=25,
+                                                      textvariable=variavel)
             
             self.campos_habitos[campo].grid(row=row, column=col+1, 
                                           sticky='w', padx=(0, 20), pady=5)
@@ -707,9 +811,7 @@ class AvaliacaoNutricionalIdosos:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-    def criar_aba_intervencao(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Intervenção Nutricional')
+    def criar_aba_intervencao(self, frame):
         
         # Scroll
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -743,7 +845,8 @@ class AvaliacaoNutricionalIdosos:
                                        bg=self.cores['card'])
         objetivos_frame.pack(fill='x', padx=20, pady=10)
         
-        self.objetivos_text = tk.Text(objetivos_frame, height=4, width=80)
+        self.objetivos_text = self.formulario.vincular_texto(
+            ('intervencao', 'objetivos'), tk.Text(objetivos_frame, height=4, width=80))
         self.objetivos_text.pack(padx=10, pady=10)
         
         # Prescrição dietética
@@ -752,7 +855,8 @@ class AvaliacaoNutricionalIdosos:
                                    bg=self.cores['card'])
         dieta_frame.pack(fill='x', padx=20, pady=10)
         
-        self.dieta_text = tk.Text(dieta_frame, height=6, width=80)
+        self.dieta_text = self.formulario.vincular_texto(
+            ('intervencao', 'dieta'), tk.Text(dieta_frame, height=6, width=80))
         self.dieta_text.pack(padx=10, pady=10)
         
         # Suplementação
@@ -760,14 +864,16 @@ class AvaliacaoNutricionalIdosos:
                                        font=('Arial', 11, 'bold'),
                                         bg=self.cores['card'])
         suplemento_frame.pack(fill='x', padx=20, pady=10)
-        self.suplemento_text = tk.Text(suplemento_frame, height=4, width=80)
+        self.suplemento_text = self.formulario.vincular_texto(
+            ('intervencao', 'suplementacao'), tk.Text(suplemento_frame, height=4, width=80))
         self.suplemento_text.pack(padx=10, pady=10)
         # Recomendações gerais
         recomendacoes_frame = tk.LabelFrame(card_frame, text="Recomendações Gerais",
                                              font=('Arial', 11, 'bold'),
                                                 bg=self.cores['card'])
         recomendacoes_frame.pack(fill='x', padx=20, pady=10)
-        self.recomendacoes_text = tk.Text(recomendacoes_frame, height=4, width=80)
+        self.recomendacoes_text = self.formulario.vincular_texto(
+            ('intervencao', 'recomendacoes'), tk.Text(recomendacoes_frame, height=4, width=80))
         self.recomendacoes_text.pack(padx=10, pady=10)
         # Botões
         btn_frame = tk.Frame(card_frame, bg=self.cores['card'])
@@ -783,9 +889,7 @@ class AvaliacaoNutricionalIdosos:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
     
-    def criar_aba_evolucao(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Evolução Nutricional')
+    def criar_aba_evolucao(self, frame):
 
         # Scroll interno (igual às outras abas)
         canvas = tk.Canvas(frame, bg=self.cores['fundo'])
@@ -842,7 +946,8 @@ class AvaliacaoNutricionalIdosos:
             tk.Label(form, text=rotulo, font=('Arial', 10, 'bold'),
                     bg=self.cores['card']).grid(row=row, column=col*2,
                                                 sticky='w', padx=5, pady=3)
-            entry = tk.Entry(form, width=25)
+            entry = tk.Entry(form, width=25,
+                             textvariable=self.formulario.var(('evolucao', chave)))
             entry.grid(row=row, column=col*2+1, sticky='w', padx=5, pady=3)
             self.campos_evolucao[chave] = entry
 
@@ -872,9 +977,8 @@ class AvaliacaoNutricionalIdosos:
         scrollbar.pack(side='right', fill='y')
 
     
-    def criar_aba_dashboard(self):
-        self.dashboard_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.dashboard_frame, text='Dashboard')
+    def criar_aba_dashboard(self, frame):
+        self.dashboard_frame = frame
         
         # Frame principal do dashboard
         main_dash = tk.Frame(self.dashboard_frame, bg=self.cores['fundo'])
@@ -889,6 +993,12 @@ class AvaliacaoNutricionalIdosos:
                 font=('Arial', 16, 'bold'),
                 bg=self.cores['primaria'], fg='white').pack(expand=True)
         
+        # Redesenhos realizados x pedidos (ver AgendadorRenderizacao)
+        self.contador_redesenhos = tk.Label(title_frame, text="",
+                                            font=('Arial', 8),
+                                            bg=self.cores['primaria'], fg='white')
+        self.contador_redesenhos.place(relx=0.99, rely=0.5, anchor='e')
+        
         # Frame para cards de resumo
         cards_frame = tk.Frame(main_dash, bg=self.cores['fundo'])
         cards_frame.pack(fill='x', pady=(0, 20))
@@ -953,112 +1063,211 @@ class AvaliacaoNutricionalIdosos:
         graph_frame = tk.Frame(parent, bg=self.cores['fundo'])
         graph_frame.pack(fill='both', expand=True)
         
-        # Configurar matplotlib
-        plt.style.use('seaborn-v0_8')
+        # Configurar matplotlib (importado só quando o dashboard é aberto)
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from graficos import ESTILO
+        plt.style.use(ESTILO)
         
         # Gráfico de evolução do peso
-        self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(12, 8))
+        from graficos import AgendadorRenderizacao, NavegacaoPeso, PainelGraficos
+        self.fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
         self.fig.patch.set_facecolor(self.cores['fundo'])
         
         # Canvas para matplotlib
         self.canvas = FigureCanvasTkAgg(self.fig, graph_frame)
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
         
-        # Atualizar gráficos iniciais
-        self.atualizar_graficos_dashboard()
+        # Artistas criados uma vez; o primeiro desenho vem de atualizar_dashboard
+        self.painel = PainelGraficos(self.fig, (ax1, ax2, ax3, ax4), self.cores)
+        # Zoom e arraste no gráfico de peso (roda do mouse, arrastar, duplo clique)
+        self.navegacao = NavegacaoPeso(self.painel)
+        
+        # Pedidos de redesenho (trocas de aba, gravações) agrupados por quadro
+        self.renderizacao = AgendadorRenderizacao(self.redesenhar_dashboard,
+                                                  agendar=self.root.after)
         
     def atualizar_graficos_dashboard(self):
-        # Limpar gráficos
-        self.ax1.clear()
-        self.ax2.clear()
-        self.ax3.clear()
-        self.ax4.clear()
-        
-        # Gráfico 1: Evolução do Peso
-        if self.historico_consultas:
-            datas = [consulta.get('data', datetime.now()) for consulta in self.historico_consultas]
-            pesos = [consulta.get('peso', 0) for consulta in self.historico_consultas]
-            
-            self.ax1.plot(datas, pesos, marker='o', color=self.cores['secundaria'], linewidth=2)
-            self.ax1.set_title('Evolução do Peso', fontweight='bold')
-            self.ax1.set_ylabel('Peso (kg)')
-            self.ax1.grid(True, alpha=0.3)
-        else:
-            self.ax1.text(0.5, 0.5, 'Sem dados históricos', 
-                         ha='center', va='center', transform=self.ax1.transAxes)
-            self.ax1.set_title('Evolução do Peso', fontweight='bold')
-        
-        # Gráfico 2: Distribuição de Macronutrientes
-        macros = ['Carboidratos', 'Proteínas', 'Lipídios']
-        valores = [50, 20, 30]  # Valores exemplo
-        cores_macro = [self.cores['sucesso'], self.cores['info'], self.cores['alerta']]
-        
-        self.ax2.pie(valores, labels=macros, colors=cores_macro, autopct='%1.1f%%', startangle=90)
-        self.ax2.set_title('Distribuição de Macronutrientes', fontweight='bold')
-        
-        # Gráfico 3: Frequência Alimentar
-        if hasattr(self, 'frequencia_vars') and any(var.get() for var in self.frequencia_vars.values()):
-            grupos = list(self.frequencia_vars.keys())[:5]  # Primeiros 5 grupos
-            frequencias = [3, 5, 4, 2, 6]  # Valores exemplo convertidos para números
-            
-            bars = self.ax3.bar(grupos, frequencias, color=self.cores['secundaria'], alpha=0.7)
-            self.ax3.set_title('Frequência de Consumo por Grupo', fontweight='bold')
-            self.ax3.set_ylabel('Frequência Semanal')
-            self.ax3.tick_params(axis='x', rotation=45)
-            
-            # Adicionar valores nas barras
-            for bar, freq in zip(bars, frequencias):
-                height = bar.get_height()
-                self.ax3.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                             f'{freq}x', ha='center', va='bottom')
-        else:
-            self.ax3.text(0.5, 0.5, 'Preencha a avaliação\nalimentar', 
-                         ha='center', va='center', transform=self.ax3.transAxes)
-            self.ax3.set_title('Frequência de Consumo por Grupo', fontweight='bold')
-        
-        # Gráfico 4: Indicadores Antropométricos
-        if self.dados_antropometricos:
-            indicadores = ['IMC', 'RCQ', 'Perda Peso %']
-            valores_atuais = [
-                self.dados_antropometricos.get('imc', 0),
-                self.dados_antropometricos.get('rcq', 0),
-                self.dados_antropometricos.get('perda_peso_perc', 0)
-            ]
-            valores_ideais = [25, 0.85, 0]  # Valores de referência
-            
-            x = np.arange(len(indicadores))
-            width = 0.35
-            
-            bars1 = self.ax4.bar(x - width/2, valores_atuais, width, 
-                               label='Atual', color=self.cores['secundaria'], alpha=0.7)
-            bars2 = self.ax4.bar(x + width/2, valores_ideais, width, 
-                               label='Referência', color=self.cores['sucesso'], alpha=0.7)
-            
-            self.ax4.set_title('Indicadores Antropométricos', fontweight='bold')
-            self.ax4.set_ylabel('Valores')
-            self.ax4.set_xticks(x)
-            self.ax4.set_xticklabels(indicadores)
-            self.ax4.legend()
-            
-            # Adicionar valores nas barras
-            for bars in [bars1, bars2]:
-                for bar in bars:
-                    height = bar.get_height()
-                    if height > 0:
-                        self.ax4.text(bar.get_x() + bar.get_width()/2., height + 0.5,
-                                     f'{height:.1f}', ha='center', va='bottom')
-        else:
-            self.ax4.text(0.5, 0.5, 'Preencha a avaliação\nantropométrica', 
-                         ha='center', va='center', transform=self.ax4.transAxes)
-            self.ax4.set_title('Indicadores Antropométricos', fontweight='bold')
+        # Só os dados dos artistas mudam (graficos.py); o desenho fica para
+        # quando o Tk estiver ocioso
+        self.painel.atualizar(self.dados_antropometricos, self.historico,
+                              self.frequencia_atual(), self.macros_atuais())
+        self.canvas.draw_idle()
+        
+    def criar_aba_coorte(self, frame):
+        self.coorte_frame = frame
+        main_coorte = tk.Frame(frame, bg=self.cores['fundo'])
+        main_coorte.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        # Título
+        title_frame = tk.Frame(main_coorte, bg=self.cores['primaria'], height=60)
+        title_frame.pack(fill='x', pady=(0, 20))
+        title_frame.pack_propagate(False)
+        
+        tk.Label(title_frame, text="Coorte - Todos os Pacientes", 
+                font=('Arial', 16, 'bold'),
+                bg=self.cores['primaria'], fg='white').pack(expand=True)
         
-        # Ajustar layout
-        self.fig.tight_layout()
-        self.canvas.draw()
+        # Resumo e releitura manual
+        resumo_frame = tk.Frame(main_coorte, bg=self.cores['fundo'])
+        resumo_frame.pack(fill='x', pady=(0, 10))
         
-    def criar_aba_relatorios(self):
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text='Relatórios')
+        self.resumo_coorte = tk.Label(resumo_frame, text="Lendo pacientes...",
+                                      font=('Arial', 11),
+                                      bg=self.cores['fundo'], fg=self.cores['texto'])
+        self.resumo_coorte.pack(side='left')
+        
+        tk.Button(resumo_frame, text="🔄 Reler Pacientes", 
+                 bg=self.cores['secundaria'], fg='white',
+                 font=('Arial', 10, 'bold'),
+                 command=self.varrer_coorte).pack(side='right')
+        
+        # Gráficos
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from graficos import ESTILO, PainelCoorte
+        plt.style.use(ESTILO)
+        self.fig_coorte, eixos = plt.subplots(1, 3, figsize=(14, 5))
+        self.fig_coorte.patch.set_facecolor(self.cores['fundo'])
+        self.canvas_coorte = FigureCanvasTkAgg(self.fig_coorte, main_coorte)
+        self.canvas_coorte.get_tk_widget().pack(fill='both', expand=True)
+        self.painel_coorte = PainelCoorte(self.fig_coorte, eixos, self.cores)
+        
+        if self.coorte is None:
+            self.varrer_coorte()
+        
+    def varrer_coorte(self):
+        """Lê (ou relê, incrementalmente) todos os pacientes fora da thread do Tk."""
+        if self.coorte_pendentes is not None:
+            return  # Já há uma leitura em andamento
+        import coorte
+        if self.trabalhador_coorte is None:
+            self.trabalhador_coorte = TrabalhadorES(self.root, intervalo_ms=100)
+        self.coorte_pendentes = {}
+        if hasattr(self, 'resumo_coorte'):
+            self.resumo_coorte.config(text="Lendo pacientes...")
+        self.trabalhador_coorte.enviar(coorte.varrer, self.armazenamento,
+                                       self.pasta_pacientes, self.pasta_evolucoes,
+                                       ao_concluir=self.ao_varrer_coorte,
+                                       ao_falhar=self.ao_falhar_coorte)
+    
+    def ao_varrer_coorte(self, agregados):
+        # Pacientes salvos durante a leitura podem ter sido lidos antes da gravação
+        for chave, resumo in self.coorte_pendentes.items():
+            agregados.atualizar(chave, resumo)
+        self.coorte_pendentes = None
+        self.coorte = agregados
+        self.versao_coorte_desenhada = None
+        self.atualizar_coorte()
+    
+    def ao_falhar_coorte(self, erro):
+        self.coorte_pendentes = None
+        if hasattr(self, 'resumo_coorte'):
+            self.resumo_coorte.config(text=f"Falha ao ler os pacientes: {erro}")
+    
+    def atualizar_coorte_paciente(self):
+        """Troca só a contribuição do paciente atual, logo após salvá-lo."""
+        if self.coorte is None and self.coorte_pendentes is None:
+            return
+        from coorte import resumo_coorte
+        resumo = resumo_coorte(self.dados_completos())
+        if self.coorte_pendentes is not None:
+            self.coorte_pendentes[self.chave_atual()] = resumo
+        elif self.coorte.atualizar(self.chave_atual(), resumo):
+            self.atualizar_coorte()
+    
+    def atualizar_coorte(self):
+        """Redesenha a aba Coorte se estiver visível e os agregados mudaram."""
+        if (self.coorte is None or not hasattr(self, 'coorte_frame')
+                or self.notebook.select() != str(self.coorte_frame)
+                or self.versao_coorte_desenhada == self.coorte.versao):
+            return
+        self.versao_coorte_desenhada = self.coorte.versao
+        c = self.coorte
+        alto_risco = c.percentual(c.riscos['Alto Risco'])
+        texto = f"{c.total} pacientes  |  Alto risco: {alto_risco:.1f}%"
+        if c.segundos_varredura is not None:
+            texto += f"  |  Lidos em {c.segundos_varredura:.1f} s"
+        self.resumo_coorte.config(text=texto)
+        self.painel_coorte.atualizar(c)
+        self.canvas_coorte.draw_idle()
+        
+    # Janelas de datas da linha do tempo, contadas da última visita (dias)
+    JANELAS_LINHA_TEMPO = {'Últimos 3 meses': 91, 'Últimos 6 meses': 182,
+                           'Último ano': 365, 'Tudo': None}
+
+    def criar_aba_linha_tempo(self, frame):
+        self.linha_tempo_frame = frame
+        main_linha = tk.Frame(frame, bg=self.cores['fundo'])
+        main_linha.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        # Título
+        title_frame = tk.Frame(main_linha, bg=self.cores['primaria'], height=60)
+        title_frame.pack(fill='x', pady=(0, 20))
+        title_frame.pack_propagate(False)
+        
+        tk.Label(title_frame, text="Linha do Tempo das Evoluções", 
+                font=('Arial', 16, 'bold'),
+                bg=self.cores['primaria'], fg='white').pack(expand=True)
+        
+        # Período e resumo
+        periodo_frame = tk.Frame(main_linha, bg=self.cores['fundo'])
+        periodo_frame.pack(fill='x', pady=(0, 10))
+        
+        tk.Label(periodo_frame, text="Período:", font=('Arial', 10, 'bold'),
+                 bg=self.cores['fundo']).pack(side='left')
+        self.janela_linha_tempo = ttk.Combobox(periodo_frame, state='readonly', width=18,
+                                               values=list(self.JANELAS_LINHA_TEMPO))
+        self.janela_linha_tempo.set('Último ano')
+        self.janela_linha_tempo.pack(side='left', padx=(5, 15))
+        self.janela_linha_tempo.bind('<<ComboboxSelected>>',
+                                     lambda e: self.atualizar_linha_tempo())
+        
+        self.resumo_linha_tempo = tk.Label(periodo_frame, text="", font=('Arial', 10),
+                                           bg=self.cores['fundo'], fg=self.cores['texto'])
+        self.resumo_linha_tempo.pack(side='left')
+        
+        # Gráficos
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from graficos import ESTILO, PainelEvolucao
+        plt.style.use(ESTILO)
+        self.fig_linha_tempo, eixos = plt.subplots(2, 2, figsize=(12, 7))
+        self.fig_linha_tempo.patch.set_facecolor(self.cores['fundo'])
+        self.canvas_linha_tempo = FigureCanvasTkAgg(self.fig_linha_tempo, main_linha)
+        self.canvas_linha_tempo.get_tk_widget().pack(fill='both', expand=True)
+        self.painel_linha_tempo = PainelEvolucao(self.fig_linha_tempo, eixos.ravel(), self.cores)
+        
+    def atualizar_linha_tempo(self):
+        """
+        Redesenha a aba Linha do Tempo, se estiver visível: só as evoluções do
+        período escolhido são lidas do diário (as já lidas vêm do cache).
+        """
+        if (not hasattr(self, 'linha_tempo_frame')
+                or self.notebook.select() != str(self.linha_tempo_frame)):
+            return
+        from diario_evolucao import LinhaTempoEvolucao
+        from graficos import CAMPOS_EVOLUCAO
+        nome = self.dados_paciente.get('nome')
+        if not nome:
+            self.resumo_linha_tempo.config(text="Carregue um paciente para ver as evoluções")
+            self.painel_linha_tempo.atualizar([], {})
+            self.canvas_linha_tempo.draw_idle()
+            return
+        if self.linha_tempo is None:
+            self.linha_tempo = LinhaTempoEvolucao(DiarioEvolucao(self.pasta_evolucoes, nome))
+        linha = self.linha_tempo
+        dias = self.JANELAS_LINHA_TEMPO[self.janela_linha_tempo.get()]
+        inicio = linha.datas[-1] - dias * 86400 if dias and len(linha) else None
+        lidas = linha.lidas
+        datas, valores = linha.serie(CAMPOS_EVOLUCAO, inicio)
+        self.resumo_linha_tempo.config(
+            text=f"{len(datas)} de {len(linha)} evoluções no período  |  "
+                 f"{linha.lidas - lidas} lidas do diário, {len(datas) - (linha.lidas - lidas)} do cache")
+        self.painel_linha_tempo.atualizar(datas, valores)
+        self.canvas_linha_tempo.draw_idle()
+        
+    def criar_aba_relatorios(self, frame):
         
         # Frame principal
         main_frame = tk.Frame(frame, bg=self.cores['fundo'])
@@ -1092,16 +1301,30 @@ class AvaliacaoNutricionalIdosos:
         btn_frame1 = tk.Frame(card1, bg=self.cores['card'])
         btn_frame1.pack(fill='x', padx=20, pady=(0, 20))
         
-        tk.Button(btn_frame1, text="Gerar PDF Completo",
+        self.botao_gerar_pdf = tk.Button(btn_frame1, text="Gerar PDF Completo",
                  bg=self.cores['sucesso'], fg='white',
                  font=('Arial', 10, 'bold'),
-                 command=self.gerar_relatorio_completo).pack(side='left', padx=(0, 10))
+                 command=self.gerar_relatorio_completo)
+        self.botao_gerar_pdf.pack(side='left', padx=(0, 10))
         
         tk.Button(btn_frame1, text="Visualizar",
                  bg=self.cores['info'], fg='white',
                  font=('Arial', 10, 'bold'),
                  command=self.visualizar_relatorio).pack(side='left')
         
+        # Progresso da geração (flowables diagramados) e cancelamento
+        progresso_frame = tk.Frame(card1, bg=self.cores['card'])
+        progresso_frame.pack(fill='x', padx=20, pady=(0, 20))
+        
+        self.barra_relatorio = ttk.Progressbar(progresso_frame, mode='determinate')
+        self.barra_relatorio.pack(side='left', fill='x', expand=True, padx=(0, 10))
+        
+        self.botao_cancelar_pdf = tk.Button(progresso_frame, text="Cancelar",
+                 bg=self.cores['perigo'], fg='white',
+                 font=('Arial', 9, 'bold'), state='disabled',
+                 command=self.cancelar_relatorio)
+        self.botao_cancelar_pdf.pack(side='left')
+        
         # Relatórios Específicos
         card2 = tk.Frame(reports_frame, bg=self.cores['card'], relief='solid', bd=1)
         card2.pack(fill='x', pady=(0, 20))
@@ -1127,6 +1350,8 @@ class AvaliacaoNutricionalIdosos:
                  bg=self.cores['secundaria'], fg='white',
                  font=('Arial', 9, 'bold'),
                  command=lambda: self.gerar_relatorio_especifico('alimentar')).pack(side='left')
+        # Desabilitados juntos enquanto um relatório é gerado
+        self.botoes_relatorio = [self.botao_gerar_pdf] + btn_frame2.winfo_children()
         
         # Dashboard em PDF
         card3 = tk.Frame(reports_frame, bg=self.cores['card'], relief='solid', bd=1)
@@ -1157,73 +1382,57 @@ class AvaliacaoNutricionalIdosos:
     def calcular_antropometria(self):
         try:
             # Obter valores dos campos
-            peso = float(self.campos_antropometria['peso_atual'].get() or 0)
-            altura = float(self.campos_antropometria['altura'].get() or 0) / 100  # Converter para metros
-            peso_habitual = float(self.campos_antropometria['peso_habitual'].get() or peso)
-            circ_cintura = float(self.campos_antropometria['circ_cintura'].get() or 0)
-            circ_quadril = float(self.campos_antropometria['circ_quadril'].get() or 0)
-            circ_braco = float(self.campos_antropometria['circ_braco'].get() or 0)
-            dobra_triceps = float(self.campos_antropometria['dobra_triceps'].get() or 0)
-            
-            # Calcular IMC
-            if altura > 0:
-                imc = peso / (altura ** 2)
-                self.labels_resultados['IMC'].config(text=f"{imc:.1f}")
-                
-                # Classificar IMC para idosos (pontos de corte específicos)
-                if imc < 22:
-                    classificacao_imc = "Baixo peso"
-                elif imc <= 27:
-                    classificacao_imc = "Adequado"
-                else:
-                    classificacao_imc = "Sobrepeso"
-                
-                self.labels_resultados['Classificação IMC'].config(text=classificacao_imc)
-                
-                # Salvar no dados
-                self.dados_antropometricos['imc'] = imc
-                self.dados_antropometricos['classificacao_imc'] = classificacao_imc
-            
-            # Calcular RCQ (Relação Cintura-Quadril)
-            if circ_cintura > 0 and circ_quadril > 0:
-                rcq = circ_cintura / circ_quadril
-                self.labels_resultados['RCQ'].config(text=f"{rcq:.2f}")
-                
-                # Classificar RCQ
-                sexo = self.campos_identificacao.get('sexo', ttk.Combobox()).get()
-                if sexo == "Masculino":
-                    classificacao_rcq = "Baixo risco" if rcq <= 0.95 else "Alto risco"
-                else:
-                    classificacao_rcq = "Baixo risco" if rcq <= 0.80 else "Alto risco"
-                
-                self.labels_resultados['Classificação RCQ'].config(text=classificacao_rcq)
-                self.dados_antropometricos['rcq'] = rcq
-                self.dados_antropometricos['classificacao_rcq'] = classificacao_rcq
-            
-            # Calcular perda de peso
-            if peso_habitual > 0:
-                perda_peso = ((peso_habitual - peso) / peso_habitual) * 100
-                self.labels_resultados['Perda de Peso (%)'].config(text=f"{perda_peso:.1f}%")
-                self.dados_antropometricos['perda_peso_perc'] = perda_peso
-            
-            # Calcular CMB (Circunferência Muscular do Braço)
-            if circ_braco > 0 and dobra_triceps > 0:
-                cmb = circ_braco - (3.1416 * dobra_triceps / 10)
-                self.labels_resultados['CMB (cm)'].config(text=f"{cmb:.1f}")
-                self.dados_antropometricos['cmb'] = cmb
-                
-                # Calcular AMB (Área Muscular do Braço)
-                amb = (cmb ** 2) / (4 * 3.1416)
-                self.labels_resultados['AMB (cm²)'].config(text=f"{amb:.1f}")
-                self.dados_antropometricos['amb'] = amb
-            
-            messagebox.showinfo("Sucesso", "Cálculos realizados com sucesso!")
+            medidas = {}
+            for campo in ('peso_atual', 'altura', 'peso_habitual', 'circ_cintura',
+                          'circ_quadril', 'circ_braco', 'dobra_triceps'):
+                valor = self.campos_antropometria[campo].get()
+                if valor:
+                    medidas[campo] = float(valor)
+
+            # IMC, RCQ, perda de peso, CMB e AMB (cálculo em nutricao.py)
+            import nutricao
+            resultados = nutricao.calcular_antropometria(medidas, self.sexo_atual())
+            self.dados_antropometricos.update(resultados)
+            self.atualizar_resultados_antropometria()
+            self.dados_alterados()
+            self.definir_status("Cálculos realizados", 'sucesso')
             
         except ValueError:
             messagebox.showerror("Erro", "Por favor, insira valores numéricos válidos.")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro no cálculo: {str(e)}")
     
+    def recalcular_antropometria(self):
+        """Mesmo cálculo, a partir das medidas em dados_antropometricos (sem widgets)."""
+        import nutricao
+        medidas = {}
+        for campo, valor in self.dados_antropometricos.items():
+            try:
+                medidas[campo] = float(valor)
+            except (TypeError, ValueError):
+                pass
+        self.dados_antropometricos.update(
+            nutricao.calcular_antropometria(medidas, self.sexo_atual()))
+    
+    def atualizar_resultados_antropometria(self):
+        for rotulo, chave, formato in [
+            ('IMC', 'imc', "{:.1f}"),
+            ('Classificação IMC', 'classificacao_imc', "{}"),
+            ('RCQ', 'rcq', "{:.2f}"),
+            ('Classificação RCQ', 'classificacao_rcq', "{}"),
+            ('Perda de Peso (%)', 'perda_peso_perc', "{:.1f}%"),
+            ('CMB (cm)', 'cmb', "{:.1f}"),
+            ('AMB (cm²)', 'amb', "{:.1f}"),
+        ]:
+            valor = self.dados_antropometricos.get(chave)
+            self.labels_resultados[rotulo].config(
+                text="--" if valor in (None, '') else formato.format(valor))
+    
+    def sexo_atual(self):
+        if hasattr(self, 'campos_identificacao'):
+            return self.campos_identificacao['sexo'].get()
+        return self.dados_paciente.get('sexo', '')
+    
     # Métodos de salvamento
     def salvar_identificacao(self):
         try:
@@ -1231,8 +1440,7 @@ class AvaliacaoNutricionalIdosos:
                 self.dados_paciente[campo] = widget.get()
             
             self.dados_paciente['data_cadastro'] = datetime.now().strftime("%d/%m/%Y %H:%M")
-            messagebox.showinfo("Sucesso", "Dados de identificação salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['paciente'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar: {str(e)}")
     
@@ -1249,8 +1457,7 @@ class AvaliacaoNutricionalIdosos:
                 if valor:
                     self.dados_paciente['anamnese'][campo] = valor
 
-            messagebox.showinfo("Sucesso", "Dados de anamnese salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['paciente'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar anamnese: {e}")
     
@@ -1261,14 +1468,9 @@ class AvaliacaoNutricionalIdosos:
                 if valor:
                     self.dados_antropometricos[campo] = float(valor)
             
-            registro = {
-                'data': datetime.now().strftime("%d/%m/%Y %H:%M"),
-                'peso': self.dados_antropometricos.get('peso_atual', 0)
-            }
-            self.historico_consultas.append(registro)
+            self.historico.anexar(datetime.now(), self.dados_antropometricos)
 
-            messagebox.showinfo("Sucesso", "Dados antropométricos salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['antropometricos', 'historico'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar: {str(e)}")
     
@@ -1289,8 +1491,7 @@ class AvaliacaoNutricionalIdosos:
                 if valor:
                     self.dados_clinicos[campo] = valor
             
-            messagebox.showinfo("Sucesso", "Dados clínicos salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['clinicos'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar: {str(e)}")
     
@@ -1311,8 +1512,7 @@ class AvaliacaoNutricionalIdosos:
             for campo, widget in self.campos_habitos.items():
                 self.dados_alimentares['habitos'][campo] = widget.get()
             
-            messagebox.showinfo("Sucesso", "Dados alimentares salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['alimentares'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar: {str(e)}")
     
@@ -1324,8 +1524,7 @@ class AvaliacaoNutricionalIdosos:
                 'suplementacao': self.suplemento_text.get(1.0, tk.END).strip(),
                 'recomendacoes': self.recomendacoes_text.get(1.0, tk.END).strip()
             }
-            messagebox.showinfo("Sucesso", "Dados de intervenção salvos!")
-            self.salvar_arquivo()
+            self.salvar_arquivo(['intervencao'])
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar: {e}")
     
@@ -1337,52 +1536,180 @@ class AvaliacaoNutricionalIdosos:
                 if valor:
                     self.dados_evolucao[chave] = valor
 
-            # 2) salva no JSON geral do paciente
-            self.salvar_arquivo()
+            # 2) salva no JSON geral do paciente (recusado ao manter a versão
+            #    de outra estação: nada vai para o diário)
+            if not self.salvar_arquivo(['evolucao']):
+                return
 
-            # 3) salva num JSON separado
-            evol_dir = os.path.join(os.getcwd(), "evoluções")
-            os.makedirs(evol_dir, exist_ok=True)
+            # 3) acrescenta ao diário de evoluções do paciente (evoluções/<nome>.jsonl),
+            #    na thread de E/S, a partir de uma cópia dos dados atuais
+            evol_dir = self.pasta_evolucoes
+            nome = self.dados_paciente.get('nome')
+            instantaneo = dict(self.dados_evolucao)
 
-            # sugestão de nome: evolucao_<nome>_YYYYMMDD_HHMMSS.json
-            nome = self.dados_paciente.get('nome', 'paciente').replace(' ', '_')
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_name = f"evolucao_{nome}_{ts}.json"
-            fname = os.path.join(evol_dir, f"evolucao_{nome}_{ts}.json")
+            def anexar():
+                diario = DiarioEvolucao(evol_dir, nome)
+                return diario.anexar(instantaneo), diario.caminho
 
-            with open(fname, 'w', encoding='utf-8') as f:
-                json.dump(self.dados_evolucao, f, ensure_ascii=False, indent=2)
+            def concluido(resultado):
+                numero, caminho = resultado
+                if self.linha_tempo is not None and self.linha_tempo.diario.caminho == caminho:
+                    self.linha_tempo.recarregar()
+                    self.atualizar_linha_tempo()
+                self.definir_status(f"Evolução nº {numero + 1} salva em "
+                                    f"{os.path.basename(evol_dir)}/{os.path.basename(caminho)}",
+                                    'sucesso')
 
-            messagebox.showinfo("Sucesso",
-                f"Evolução salva com sucesso em:\n{fname.split(os.sep)[-2]}/{fname.split(os.sep)[-1]}"
-            )
+            self.definir_status("Salvando evolução...", 'pendente')
+            self.trabalhador.enviar(anexar, ao_concluir=concluido,
+                                    ao_falhar=lambda e: self.ao_falhar_gravacao(e))
 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar evolução: {e}")
     
-    def salvar_arquivo(self):
+    def dados_completos(self):
+        from serie_historica import referencia_historico
+        return dict(self.dados_formulario(),
+                    historico=referencia_historico(self.chave_atual(), self.historico))
+
+    def chave_atual(self):
+        return chave_paciente(self.dados_paciente.get('nome'))
+
+    def salvar_arquivo(self, secoes=None):
+        """
+        Marca as seções alteradas; a gravação é agrupada com outras feitas em
+        seguida. O SQLite grava só essas seções; o JSON reescreve o documento.
+        Retorna False se o usuário preferiu recarregar a versão de outra estação.
+        """
+        if (not self.trabalhador.pendentes
+                and self.observador.conflito(self.dados_paciente.get('nome'))
+                and not self.confirmar_sobrescrita()):
+            return False
+        secoes = list(secoes or SECOES)
+        # O que está em memória passa a ser o que está gravado: pode voltar ao
+        # cache, no lugar de uma cópia anterior do mesmo paciente
+        self.chave_sessao = self.chave_atual()
+        self.sessao.remover(self.chave_sessao)
+        if 'paciente' in secoes and 'historico' not in secoes:
+            # O nome define a pasta da série: ao mudar, a referência acompanha
+            secoes.append('historico')
+        if 'historico' in secoes:
+            self.salvar_historico()
+        self.persistencia.marcar(*secoes)
+        self.dados_alterados()
+        self.definir_status("Salvando...", 'pendente')
+        return True
+
+    def salvar_historico(self):
+        """Grava as colunas .npy da série na thread de E/S, a partir de uma cópia."""
+        if self._historico is None:
+            return  # Nenhuma série carregada ou medida nesta sessão
+        from serie_historica import pasta_serie
+        pasta = pasta_serie(self.pasta_pacientes, self.chave_atual())
+        if self.historico_gravado == (pasta, len(self.historico)):
+            # Nada novo; evita também regravar arquivos abertos com memory-map
+            return
+        self.historico_gravado = (pasta, len(self.historico))
+        self.trabalhador.enviar(self.historico.copia().salvar, pasta,
+                                ao_falhar=self.ao_falhar_gravacao)
+
+    def definir_status(self, texto, tipo='info'):
+        """Indicador de gravação no header, sem janelas modais."""
+        cores = {'pendente': self.cores['alerta'], 'sucesso': '#ffffff',
+                 'perigo': self.cores['perigo'], 'info': '#ffffff'}
+        self.status_gravacao.config(text=texto, fg=cores.get(tipo, '#ffffff'))
+
+    def ao_gravar_arquivo(self, estatistica):
+        self.observador.registrar(estatistica.nome)
+        if self.catalogo is not None and self.armazenamento.tipo == 'json':
+            self.catalogo.atualizar_arquivo(estatistica.caminho)
+        self.atualizar_coorte_paciente()
+        if self.persistencia.pendente or self.trabalhador.pendentes:
+            return
+        self.definir_status(
+            f"Salvo às {estatistica.quando:%H:%M:%S} — "
+            f"{estatistica.bytes / 1024:.1f} KB em {estatistica.latencia_ms:.1f} ms "
+            f"({', '.join(estatistica.secoes)})", 'sucesso')
+
+    def ao_falhar_gravacao(self, erro):
+        self.definir_status("Falha ao salvar", 'perigo')
+        messagebox.showerror("Erro", f"Erro ao salvar arquivo: {str(erro)}")
+
+    def ao_falhar_persistencia(self, erro):
+        # A persistência tenta de novo sozinha: só a primeira falha seguida abre janela
+        if self.persistencia.falhas_seguidas > 1:
+            self.definir_status(f"Falha ao salvar ({erro}); tentando de novo...", 'perigo')
+            return
+        self.ao_falhar_gravacao(erro)
+
+    # Alterações feitas por outra estação
+    def ao_mudar_pacientes(self, alterados, removidos):
+        """Chamada pelo observador com as chaves alteradas ou removidas fora deste programa."""
+        mudados = alterados | removidos
+        for chave in mudados:
+            self.sessao.remover(chave)  # A cópia em memória ficou desatualizada
+        if self.catalogo is not None and self.armazenamento.tipo == 'json':
+            self.catalogo.atualizar()
+            self.catalogo.salvar_indice()
+        if self.coorte is not None and self.coorte_pendentes is None:
+            from coorte import reler
+            self.trabalhador_coorte.enviar(reler, self.armazenamento, sorted(alterados),
+                                           ao_concluir=self.ao_reler_coorte)
+            for chave in removidos:
+                self.coorte.remover(chave)
+        if self.chave_sessao in alterados:
+            self.avisar_alteracao_externa()
+        elif self.chave_sessao in removidos:
+            self.definir_status(f"{self.dados_paciente.get('nome')} foi removido em outra "
+                                f"estação; salvar recria o paciente", 'perigo')
+        else:
+            self.definir_status(f"{len(mudados)} paciente(s) atualizado(s) por outra estação")
+
+    def ao_reler_coorte(self, resumos):
+        for chave, resumo in resumos.items():
+            if resumo is None:
+                self.coorte.remover(chave)
+            else:
+                self.coorte.atualizar(chave, resumo)
+        self.atualizar_coorte()
+
+    def avisar_alteracao_externa(self, onde="em outra estação"):
+        if self.aviso_alteracao:
+            return  # A pergunta anterior ainda não foi respondida
+        self.aviso_alteracao = True
         try:
-            dados_completos = {
-                'paciente': self.dados_paciente,
-                'antropometricos': self.dados_antropometricos,
-                'clinicos': self.dados_clinicos,
-                'alimentares': self.dados_alimentares,
-                'intervencao': self.dados_intervencao,
-                'evolucao': self.dados_evolucao,
-                'historico': self.historico_consultas,
-                'ultima_atualizacao': datetime.now().isoformat()
-            }
-            
-            nome_arquivo = f"avaliacao_{self.dados_paciente.get('nome', 'paciente').replace(' ', '_')}"
-            pacientes_dir = os.path.join(os.getcwd(), "pacientes")
-            os.makedirs(pacientes_dir, exist_ok=True)
+            nome = self.dados_paciente.get('nome') or 'O paciente aberto'
+            if messagebox.askyesno(
+                    "Paciente alterado",
+                    f"{nome} foi alterado {onde}.\n\nRecarregar agora? "
+                    f"Alterações desta tela que ainda não foram salvas serão descartadas."):
+                self.recarregar_paciente()
+            else:
+                self.definir_status("Mantida a versão desta tela: ao salvar, ela substitui "
+                                    "a da outra estação", 'perigo')
+        finally:
+            self.aviso_alteracao = False
 
-            file_path = os.path.join(pacientes_dir, f"{nome_arquivo}.json")
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(dados_completos, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao salvar arquivo: {str(e)}")
+    def confirmar_sobrescrita(self):
+        """
+        O paciente mudou no armazenamento e o observador ainda não percebeu:
+        pergunta antes de sobrescrever. Retorna True para gravar assim mesmo.
+        """
+        nome = self.dados_paciente.get('nome')
+        if messagebox.askyesno(
+                "Paciente alterado",
+                f"{nome} foi alterado em outra estação depois de aberto aqui.\n\n"
+                f"Sobrescrever com os dados desta tela? (Não: recarrega a versão "
+                f"da outra estação e descarta as alterações desta tela.)"):
+            self.observador.registrar(nome)
+            return True
+        self.recarregar_paciente()
+        return False
+
+    def recarregar_paciente(self):
+        """Lê de novo o paciente aberto, descartando o que não foi gravado."""
+        self.persistencia.descartar()
+        self.abrir_paciente({'chave': self.chave_atual(), 'nome': self.dados_paciente.get('nome')})
     
     # Métodos de limpeza
     def limpar_identificacao(self):
@@ -1418,9 +1745,11 @@ class AvaliacaoNutricionalIdosos:
     def limpar_alimentar(self):
         for widget in self.refeicoes.values():
             widget.delete(1.0, tk.END)
+        self.atualizar_totais_recordatorio()
         
         for widget in self.frequencia_vars.values():
             widget.set('')
+        self.dados_alterados()
         
         for widget in self.campos_habitos.values():
             if isinstance(widget, tk.Entry):
@@ -1447,28 +1776,53 @@ class AvaliacaoNutricionalIdosos:
         self.limpar_evolucao()
 
     def carregar_evolucao(self):
-        """Carrega um .json de evolução previamente salvo e preenche os campos."""
+        """
+        Carrega uma evolução previamente salva e preenche os campos: a mais
+        recente de um diário (.jsonl) ou um .json avulso antigo.
+        """
         path = filedialog.askopenfilename(
             title="Selecione arquivo de evolução",
-            filetypes=[("JSON", "*.json")]
+            initialdir=self.pasta_evolucoes,
+            filetypes=[("Diário de evoluções", "*.jsonl"), ("JSON", "*.json")]
         )
         if not path:
             return
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if path.endswith('.jsonl'):
+                diario = DiarioEvolucao(os.path.dirname(path),
+                                        os.path.basename(path)[:-len('.jsonl')])
+                ultimas = diario.ultimos(1)
+                if not ultimas:
+                    messagebox.showwarning("Aviso", "O diário selecionado não tem evoluções.")
+                    return
+                data = ultimas[0]['evolucao']
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             self.dados_evolucao = data
-            # preenche cada campo
-            for chave, entry in self.campos_evolucao.items():
-                entry.delete(0, tk.END)
-                if chave in data:
-                    entry.insert(0, data[chave])
-            messagebox.showinfo("Sucesso", "Evolução carregada!")
+            self.formulario.carregar(['evolucao'])
+            self.definir_status(f"Evolução carregada de {os.path.basename(path)}", 'sucesso')
         except Exception as e:
             messagebox.showerror("Erro", f"Não foi possível carregar: {e}")
     
     # Métodos do dashboard
+    def dados_alterados(self):
+        """Nova versão dos dados: o dashboard será redesenhado quando visível."""
+        self.versao_dados += 1
+    
     def atualizar_dashboard(self, event=None):
+        """Pede um redesenho; pedidos próximos viram um só (AgendadorRenderizacao)."""
+        if hasattr(self, 'renderizacao'):
+            self.renderizacao.pedir()
+    
+    def redesenhar_dashboard(self):
+        """Chamado pelo agendador. Retorna True se o dashboard foi redesenhado."""
+        if self.notebook.select() != str(self.dashboard_frame):
+            return False  # Redesenhado quando a aba for exibida
+        if self.versao_desenhada == self.versao_dados:
+            return False  # Nada mudou desde o último desenho
+        self.versao_desenhada = self.versao_dados
+        
         # Atualizar cards de estatísticas
         if self.dados_antropometricos.get('imc'):
             self.imc_valor.config(text=f"{self.dados_antropometricos['imc']:.1f}")
@@ -1483,50 +1837,59 @@ class AvaliacaoNutricionalIdosos:
         self.risco_nutricional.config(text=risco)
         
         # Atualizar gráficos
-        if hasattr(self, 'canvas'):
-            self.atualizar_graficos_dashboard()
+        self.atualizar_graficos_dashboard()
+        
+        r = self.renderizacao
+        self.contador_redesenhos.config(text=f"{r.realizados} redesenhos / {r.pedidos} pedidos")
+        return True
+    
+    def frequencia_atual(self):
+        if hasattr(self, 'frequencia_vars'):
+            return {grupo: var.get() for grupo, var in self.frequencia_vars.items()}
+        return self.dados_alimentares.get('frequencia', {})
+    
+    def recordatorio_atual(self):
+        if hasattr(self, 'refeicoes'):
+            return {refeicao: widget.get(1.0, tk.END).strip()
+                    for refeicao, widget in self.refeicoes.items()}
+        return self.dados_alimentares.get('recordatorio', {})
+    
+    def macros_atuais(self):
+        import composicao
+        return composicao.macros_recordatorio(self.recordatorio_atual())
+    
+    def ao_digitar_recordatorio(self, event=None):
+        # Agrupa as teclas digitadas em um único recálculo
+        if self.recalculo_recordatorio is not None:
+            self.root.after_cancel(self.recalculo_recordatorio)
+        self.recalculo_recordatorio = self.root.after(150, self.atualizar_totais_recordatorio)
+    
+    def atualizar_totais_recordatorio(self):
+        import composicao
+        self.recalculo_recordatorio = None
+        por_refeicao, total = composicao.analisar_recordatorio(self.recordatorio_atual())
+        for refeicao, totais in por_refeicao.items():
+            texto = composicao.formatar_totais(totais) if totais[0] > 0 else ''
+            self.totais_refeicoes[refeicao].config(text=texto)
+        self.total_recordatorio.config(
+            text=f"Total do dia: {composicao.formatar_totais(total)}" if total[0] > 0 else '')
+        self.dados_alterados()
     
     def determinar_status_nutricional(self):
-        imc = self.dados_antropometricos.get('imc', 0)
-        perda_peso = self.dados_antropometricos.get('perda_peso_perc', 0)
-        
-        if imc < 22 or perda_peso > 10:
-            return "Desnutrição"
-        elif imc > 27:
-            return "Sobrepeso"
-        else:
-            return "Adequado"
+        import nutricao
+        return nutricao.determinar_status_nutricional(self.dados_antropometricos)
     
     def determinar_risco_nutricional(self):
-        # Lógica simplificada de risco nutricional
-        fatores_risco = 0
-        
-        # Idade avançada (assumindo > 80 anos)
-        if self.dados_paciente.get('data_nascimento'):
-            # Aqui deveria calcular a idade real
-            fatores_risco += 1
-        
-        # Doenças crônicas
-        if len(self.dados_clinicos.get('doencas', [])) > 2:
-            fatores_risco += 1
-        
-        # Perda de peso
-        if self.dados_antropometricos.get('perda_peso_perc', 0) > 5:
-            fatores_risco += 1
-        
-        # Problemas alimentares
-        if self.dados_alimentares.get('habitos', {}).get('apetite') in ['Regular', 'Ruim']:
-            fatores_risco += 1
-        
-        if fatores_risco >= 3:
-            return "Alto Risco"
-        elif fatores_risco >= 1:
-            return "Risco Moderado"
-        else:
-            return "Baixo Risco"
+        import nutricao
+        return nutricao.determinar_risco_nutricional(self.dados_paciente,
+                                                     self.dados_antropometricos,
+                                                     self.dados_clinicos,
+                                                     self.dados_alimentares)
     
     # Métodos de relatórios
     def gerar_relatorio_completo(self):
+        if self.relatorio_em_geracao():
+            return
         try:
             nome_paciente = self.dados_paciente.get('nome', 'paciente').replace(' ', '_')
             nome_arquivo = filedialog.asksaveasfilename(
@@ -1537,352 +1900,464 @@ class AvaliacaoNutricionalIdosos:
             )
             
             if nome_arquivo:
-                self.criar_pdf_completo(nome_arquivo)
-                messagebox.showinfo("Sucesso", f"Relatório salvo em: {nome_arquivo}")
+                self.iniciar_relatorio(nome_arquivo)
+                
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao gerar relatório: {str(e)}")
+    
+    def gerar_relatorio_especifico(self, tipo):
+        """Relatório só com as seções do tipo (antropometrico, clinico ou alimentar)."""
+        if self.relatorio_em_geracao():
+            return
+        try:
+            nome_paciente = self.dados_paciente.get('nome', 'paciente').replace(' ', '_')
+            nome_arquivo = filedialog.asksaveasfilename(
+                initialfile=f"relatorio_{tipo}_{nome_paciente}.pdf",
+                defaultextension=".pdf",
+                filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
+                title=f"Salvar Relatório {tipo.capitalize()}"
+            )
+            
+            if nome_arquivo:
+                self.iniciar_relatorio(nome_arquivo, tipo)
                 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao gerar relatório: {str(e)}")
     
-    def criar_pdf_completo(self, nome_arquivo):
+    def iniciar_relatorio(self, nome_arquivo, tipo='completo'):
         """
-        Gera o PDF completo com todas as avaliações: identificação, antropometria, clínica e alimentar.
+        Gera o PDF numa thread própria a partir de um instantâneo dos dados:
+        a janela continua respondendo, a barra mostra os flowables já
+        diagramados e o botão Cancelar interrompe a geração.
         """
-        doc = SimpleDocTemplate(nome_arquivo, pagesize=A4)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=20,
-            alignment=1  # Centralizado
-        )
-        story.append(Paragraph("RELATÓRIO DE AVALIAÇÃO NUTRICIONAL - IDOSOS", title_style))
-        story.append(Spacer(1, 12))
-        
-        # Seção: Dados Pessoais
-        if self.dados_paciente:
-            story.append(Paragraph("DADOS PESSOAIS", styles['Heading2']))
-            dados_table = []
-            for rotulo, key in [
-                ("Nome:", 'nome'),
-                ("Data de Nascimento:", 'data_nascimento'),
-                ("Idade:", 'idade'),
-                ("Sexo:", 'sexo'),
-                ("Nº de Registro:", 'registro'),
-                ("Telefone:", 'telefone'),
-                ("Email:", 'email'),
-                ("Endereço:", 'endereco'),
-                ("Contato de Emergência:", 'contato_emergencia'),
-                ("Telefone de Emergência:", 'telefone_emergencia'),
-                ("Data da Admissão:", 'data_admissao'),
-            ]:
-                dados_table.append([rotulo, self.dados_paciente.get(key, '')])
-            table = Table(dados_table, colWidths=[2*inch, 4*inch], hAlign='LEFT')
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('BOX', (0,0), (-1,-1), 1, colors.black),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('VALIGN',(0,0),(-1,-1),'MIDDLE')
-            ]))
-            story.append(table)
-            story.append(Spacer(1, 12))
-        
-        # Seção: Avaliação Antropométrica
-        if self.dados_antropometricos:
-            story.append(Paragraph("AVALIAÇÃO ANTROPOMÉTRICA", styles['Heading2']))
-            antro_table = []
-            for rotulo, key in [
-                ("IMC:", 'imc'),
-                ("Classificação IMC:", 'classificacao_imc'),
-                ("RCQ:", 'rcq'),
-                ("Classificação RCQ:", 'classificacao_rcq'),
-                ("Perda de Peso (%):", 'perda_peso_perc'),
-                ("CMB (cm):", 'cmb'),
-                ("AMB (cm²):", 'amb')
-            ]:
-                antro_table.append([rotulo, f"{self.dados_antropometricos.get(key, '')}"])
-            table2 = Table(antro_table, colWidths=[2*inch, 4*inch], hAlign='LEFT')
-            table2.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('BOX', (0,0), (-1,-1), 1, colors.black),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('VALIGN',(0,0),(-1,-1),'MIDDLE')
-            ]))
-            story.append(table2)
-            story.append(Spacer(1, 12))
-        
-        # Seção: Avaliação Clínica
-        if self.dados_clinicos:
-            story.append(Paragraph("AVALIAÇÃO CLÍNICA", styles['Heading2']))
-            # Doenças e condições
-            doencas = self.dados_clinicos.get('doencas', [])
-            story.append(Paragraph(f"<b>Doenças/Condições:</b> {', '.join(doencas)}", styles['Normal']))
-            story.append(Spacer(1, 6))
-            # Medicamentos
-            meds = self.dados_clinicos.get('medicamentos', '')
-            story.append(Paragraph(f"<b>Medicamentos:</b> {meds}", styles['Normal']))
-            story.append(Spacer(1, 6))
-            # Exames laboratoriais
-            lab_items = []
-            for rotulo, key in [
-                ("Glicemia (mg/dL):", 'glicemia'),
-                ("Hemoglobina (g/dL):", 'hemoglobina'),
-                ("Colesterol Total (mg/dL):", 'colesterol_total'),
-                ("HDL (mg/dL):", 'hdl'),
-                ("LDL (mg/dL):", 'ldl'),
-                ("Triglicerídeos (mg/dL):", 'triglicerideos')
-            ]:
-                val = self.dados_clinicos.get(key, '')
-                lab_items.append([rotulo, val])
-            table3 = Table(lab_items, colWidths=[2*inch, 4*inch], hAlign='LEFT')
-            table3.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('BOX', (0,0), (-1,-1), 1, colors.black),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('VALIGN',(0,0),(-1,-1),'MIDDLE')
-            ]))
-            story.append(table3)
-            story.append(Spacer(1, 12))
-        
-        # Seção: Avaliação Alimentar
-        if self.dados_alimentares:
-            story.append(Paragraph("AVALIAÇÃO ALIMENTAR", styles['Heading2']))
-            # Recordatório
-            record = self.dados_alimentares.get('recordatorio', {})
-            for refeicao, texto in record.items():
-                story.append(Paragraph(f"<b>{refeicao}:</b> {texto}", styles['Normal']))
-                story.append(Spacer(1, 4))
-            story.append(Spacer(1, 6))
-            # Frequência alimentar
-            freq = self.dados_alimentares.get('frequencia', {})
-            freq_table = [[rotulo, freq.get(rotulo, '')] for rotulo in freq]
-            if freq_table:
-                table4 = Table(freq_table, colWidths=[3*inch, 3*inch], hAlign='LEFT')
-                table4.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                    ('BOX', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                    ('VALIGN',(0,0),(-1,-1),'MIDDLE')
-                ]))
-                story.append(table4)
-                story.append(Spacer(1, 12))
-        
-        # Seção: Intervenção Nutricional
-        if self.dados_intervencao:
-            story.append(Paragraph("INTERVENÇÃO NUTRICIONAL", styles['Heading2']))
-            story.append(Spacer(1, 12))
-
-            interven = self.dados_intervencao
-            # Objetivos
-            story.append(Paragraph(f"<b>Objetivos:</b> {interven.get('objetivos', '')}", styles['Normal']))
-            story.append(Spacer(1, 6))
-            # Dieta
-            story.append(Paragraph(f"<b>Dieta:</b> {interven.get('dieta', '')}", styles['Normal']))
-            story.append(Spacer(1, 6))
-            # Suplementação
-            story.append(Paragraph(f"<b>Suplementação:</b> {interven.get('suplementacao', '')}", styles['Normal']))
-            story.append(Spacer(1, 6))
-            # Recomendações
-            story.append(Paragraph(f"<b>Recomendações:</b> {interven.get('recomendacoes', '')}", styles['Normal']))
-            story.append(Spacer(1, 12))
-
-        # Seção: Evolução Nutricional
-        if self.dados_evolucao:
-            story.append(Paragraph("EVOLUÇÃO NUTRICIONAL", styles['Heading2']))
-            evo_table = []
-            for rotulo, chave in [
-                ("Peso (kg):", 'peso_evo'),
-                ("IMC (kg/m²):", 'imc_evo'),
-                ('Estado Nutricional:', 'estado_nutri_evo'),
-                ('Adesão à Dieta:', 'adesao_dieta_evo'),
-                ('Apetite:', 'apetite_evo'),
-                ('Evolução Clínica:', 'evolucao_clinica_evo'),
-                ('Circunferência do Braço (cm):', 'circ_braco_evo'),
-                ('Circunferência Muscular do Braço (cm):', 'circ_musc_braco_evo'),
-                ('Circunferência da Panturrilha (cm):', 'circ_panturrilha_evo'),
-                ('Circunferência da Cintura (cm):', 'circ_cintura_evo'),
-                ('Circunferência do Quadril (cm):', 'circ_quadril_evo'),
-                ('Circunferência Abdominal (cm):', 'circ_abdominal_evo'),
-                ('Dobra Cutânea Tricipital (mm):', 'dobra_triceps_evo'),
-                ('Dobra Cutânea Bicipital (mm):', 'dobra_biceps_evo'),
-                ('Dobra Cutânea Subescapular (mm):', 'dobra_subescapular_evo'),
-                ('Dobra Cutânea Suprailiaca (mm):', 'dobra_suprailiaca_evo'),
-                ('Dobra Cutânea Abdominal (mm):', 'dobra_abdominal_evo'),
-                ('Dobra Cutânea Peitoral (mm):', 'dobra_peitoral_evo'),
-                ('Dobra Cutânea Axilar (mm):', 'dobra_axilar_evo'),
-                ("Avaliador:", 'nome_avaliador_evo')
-            ]:
-                evo_table.append([rotulo, self.dados_evolucao.get(chave, '')])
-            table_evo = Table(evo_table, colWidths=[3*inch, 4*inch], hAlign='LEFT')
-            table_evo.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (0,-1), colors.lightgrey),
-                ('BOX', (0,0), (-1,-1), 1, colors.black),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('FONTSIZE', (0,0), (-1,-1), 10),
-                ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
-            ]))
-            story.append(table_evo)
-            story.append(Spacer(1, 12))
-        
-        # --- Nova seção: Dashboard Nutricional ---
-        story.append(Paragraph("DASHBOARD NUTRICIONAL", styles['Heading2']))
-        story.append(Spacer(1, 12))
+        import relatorios
+        if self.relatorio_em_geracao():
+            return
+        if self.trabalhador_relatorios is None:
+            self.trabalhador_relatorios = TrabalhadorES(self.root)
+        dados, historico = self.instantaneo_relatorio()
+        self.relatorio_cancelar = threading.Event()
+        self.relatorio_progresso = (0, 0)
+        
+        def ao_progresso(feitos, total):
+            # Chamada na thread do relatório: só guarda o valor para a interface ler
+            self.relatorio_progresso = (feitos, total)
+        
+        tempos = {}  # Segundos por seção, preenchidos pela thread do relatório
+        self.trabalhador_relatorios.enviar(
+            relatorios.gerar_pdf, nome_arquivo, dados, historico, self.cores,
+            ao_progresso, self.relatorio_cancelar.is_set, tipo, tempos,
+            ao_concluir=lambda _: self.ao_concluir_relatorio(nome_arquivo, tempos),
+            ao_falhar=self.ao_falhar_relatorio)
+        self.definir_status("Gerando relatório...", 'pendente')
+        for botao in self.botoes_relatorio:
+            botao.config(state='disabled')
+        self.botao_cancelar_pdf.config(state='normal')
+        self.acompanhar_relatorio()
+    
+    def acompanhar_relatorio(self):
+        if self.relatorio_cancelar is None:
+            return
+        feitos, total = self.relatorio_progresso
+        self.barra_relatorio.config(maximum=max(total, 1), value=feitos)
+        if total:
+            self.definir_status(f"Gerando relatório... {feitos * 100 // total}%", 'pendente')
+        self.root.after(100, self.acompanhar_relatorio)
+    
+    def relatorio_em_geracao(self):
+        """True (e avisa no header) se já há um relatório sendo gerado."""
+        if self.relatorio_cancelar is None:
+            return False
+        self.definir_status("Já há um relatório em geração", 'pendente')
+        return True
+    
+    def cancelar_relatorio(self):
+        if self.relatorio_cancelar is not None:
+            self.relatorio_cancelar.set()
+            self.definir_status("Cancelando relatório...", 'pendente')
+    
+    def encerrar_relatorio(self):
+        self.relatorio_cancelar = None
+        self.barra_relatorio.config(value=0)
+        for botao in self.botoes_relatorio:
+            botao.config(state='normal')
+        self.botao_cancelar_pdf.config(state='disabled')
+    
+    def ao_concluir_relatorio(self, nome_arquivo, tempos):
+        from relatorios import resumo_tempos
+        self.encerrar_relatorio()
+        self.definir_status(f"Relatório salvo em: {os.path.basename(nome_arquivo)} "
+                            f"- {resumo_tempos(tempos)}", 'sucesso')
+    
+    def ao_falhar_relatorio(self, erro):
+        from relatorios import RelatorioCancelado
+        self.encerrar_relatorio()
+        if isinstance(erro, RelatorioCancelado):
+            self.definir_status("Relatório cancelado", 'info')
+            return
+        self.definir_status("Falha ao gerar relatório", 'perigo')
+        messagebox.showerror("Erro", f"Erro ao gerar relatório: {str(erro)}")
 
-        status = self.determinar_status_nutricional()
-        risco  = self.determinar_risco_nutricional()
-        story.append(Paragraph(f"<b>Status Nutricional:</b> {status}", styles['Normal']))
-        story.append(Paragraph(f"<b>Risco Nutricional:</b> {risco}", styles['Normal']))
-        story.append(Spacer(1, 12))
-
-        # Salva o gráfico em buffer
-        buf = io.BytesIO()
-        self.fig.savefig(buf, format='PNG', dpi=150, bbox_inches='tight')
-        buf.seek(0)
-
-        # Abre a imagem com PIL para calcular proporções reais
-        pil_img = PILImage.open(buf)
-        img_width, img_height = pil_img.size
-
-        # Define a largura no PDF (ex: 6.5 polegadas) e calcula altura proporcional
-        max_width = 6.5 * inch
-        scale = max_width / img_width
-        pdf_width = img_width * scale
-        pdf_height = img_height * scale
-
-        # Reposiciona o ponteiro e cria imagem no PDF com proporção preservada
-        buf.seek(0)
-        img = Image(buf, width=pdf_width, height=pdf_height)
-        story.append(img)
-        story.append(Spacer(1, 12))
-
-        # Histórico de Consultas
-        if self.historico_consultas:
-            story.append(Paragraph("HISTÓRICO DE CONSULTAS", styles['Heading2']))
-            hist_table = [[consulta.get('data', ''), consulta.get('peso', '')] for consulta in self.historico_consultas]
-            if hist_table:
-                table5 = Table([["Data", "Peso (kg)"]] + hist_table, colWidths=[3*inch, 3*inch], hAlign='LEFT')
-                table5.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0,0),(-1,0), colors.whitesmoke),
-                    ('BOX', (0,0), (-1,-1), 1, colors.black),
-                    ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                    ('FONTSIZE', (0,0), (-1,-1), 10),
-                    ('VALIGN',(0,0),(-1,-1),'MIDDLE')
-                ]))
-                story.append(table5)
-                story.append(Spacer(1, 12))
-
-        # Construir documento
-        doc.build(story)
+    def instantaneo_relatorio(self):
+        """Cópia dos dados atuais (inclusive o que ainda está só na tela) e do histórico."""
+        import copy
+        dados = copy.deepcopy(self.dados_completos())
+        dados['alimentares'] = dict(dados.get('alimentares') or {},
+                                    frequencia=self.frequencia_atual(),
+                                    recordatorio=self.recordatorio_atual())
+        return dados, self.historico.copia()
 
     def carregar_dados(self):
         """
-        Abre um diálogo para o usuário selecionar o arquivo JSON salvo
-        e popula todos os campos da interface com os dados carregados.
+        Abre o seletor de pacientes; o paciente escolhido é carregado e
+        todos os campos da interface são populados com os seus dados.
         """
-        nome_arquivo = filedialog.askopenfilename(
-            title="Abrir avaliação",
-            filetypes=[("Arquivos JSON", "*.json")]
+        try:
+            self.abrir_seletor_pacientes()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao abrir o seletor de pacientes: {e}")
+
+    def buscar_pacientes(self, termo):
+        """Busca no catálogo (JSON) ou no banco indexado (SQLite)."""
+        if self.armazenamento.tipo == 'sqlite':
+            encontrados = self.armazenamento.buscar(termo, limite=200)
+            return encontrados, len(encontrados)
+        return self.garantir_catalogo().buscar(termo)
+
+    def garantir_catalogo(self):
+        """Catálogo dos arquivos JSON, criado (e lido do índice) no primeiro uso."""
+        if self.catalogo is None:
+            from catalogo import CatalogoPacientes
+            self.catalogo = CatalogoPacientes(self.pasta_pacientes, self.pasta_evolucoes)
+        return self.catalogo
+
+    def abrir_seletor_pacientes(self):
+        # Antes de buscar, relê só o que mudou em pacientes/ desde a última vez
+        if self.armazenamento.tipo == 'json':
+            self.garantir_catalogo().atualizar()
+            self.catalogo.salvar_indice()
+
+        janela = tk.Toplevel(self.root)
+        janela.title("Abrir avaliação")
+        janela.geometry("760x480")
+        janela.configure(bg=self.cores['fundo'])
+        janela.transient(self.root)
+
+        busca_frame = tk.Frame(janela, bg=self.cores['fundo'])
+        busca_frame.pack(fill='x', padx=10, pady=10)
+        tk.Label(busca_frame, text="Buscar (nome ou nº de registro):",
+                 font=('Arial', 10, 'bold'),
+                 bg=self.cores['fundo']).pack(side='left', padx=(0, 10))
+        termo_var = tk.StringVar()
+        entrada_busca = tk.Entry(busca_frame, textvariable=termo_var, width=40)
+        entrada_busca.pack(side='left', fill='x', expand=True)
+
+        colunas = [('nome', 'Nome', 260), ('registro', 'Registro', 100), ('sexo', 'Sexo', 90),
+                   ('imc', 'IMC', 60), ('risco', 'Risco', 120), ('evolucoes', 'Evoluções', 80)]
+        lista_frame = tk.Frame(janela, bg=self.cores['fundo'])
+        lista_frame.pack(fill='both', expand=True, padx=10)
+        arvore = ttk.Treeview(lista_frame, columns=[c for c, _, _ in colunas],
+                              show='headings', selectmode='browse')
+        for coluna, titulo, largura in colunas:
+            arvore.heading(coluna, text=titulo)
+            arvore.column(coluna, width=largura, anchor='w')
+        barra = ttk.Scrollbar(lista_frame, orient='vertical', command=arvore.yview)
+        arvore.configure(yscrollcommand=barra.set)
+        arvore.pack(side='left', fill='both', expand=True)
+        barra.pack(side='right', fill='y')
+
+        rodape = tk.Frame(janela, bg=self.cores['fundo'])
+        rodape.pack(fill='x', padx=10, pady=10)
+        total_label = tk.Label(rodape, text="", font=('Arial', 9),
+                               bg=self.cores['fundo'], fg=self.cores['texto_secundario'])
+        total_label.pack(side='left')
+
+        resultados = {}
+        agendado = [None]
+
+        def preencher():
+            agendado[0] = None
+            encontrados, total = self.buscar_pacientes(termo_var.get())
+            arvore.delete(*arvore.get_children())
+            resultados.clear()
+            for paciente in encontrados:
+                imc = paciente.get('imc')
+                item = arvore.insert('', 'end', values=(
+                    paciente.get('nome', ''), paciente.get('registro', ''),
+                    paciente.get('sexo', ''), f"{imc:.1f}" if imc else '',
+                    paciente.get('risco', ''), paciente.get('evolucoes', '')))
+                resultados[item] = paciente
+            if total > len(encontrados):
+                total_label.config(text=f"{total} pacientes (mostrando {len(encontrados)})")
+            else:
+                total_label.config(text=f"{total} pacientes")
+
+        def ao_digitar(*_):
+            # Agrupa as teclas digitadas em uma única busca
+            if agendado[0] is not None:
+                janela.after_cancel(agendado[0])
+            agendado[0] = janela.after(120, preencher)
+
+        def abrir(event=None):
+            selecionado = arvore.focus() or (arvore.get_children() or [None])[0]
+            if selecionado is None:
+                return
+            paciente = resultados[selecionado]
+            janela.destroy()
+            self.abrir_paciente(paciente)
+
+        def procurar_arquivo():
+            nome_arquivo = filedialog.askopenfilename(
+                parent=janela,
+                title="Abrir avaliação",
+                filetypes=[("Arquivos JSON", "*.json")]
+            )
+            if nome_arquivo:
+                janela.destroy()
+                self.abrir_paciente({'arquivo': nome_arquivo})
+
+        tk.Button(rodape, text="Abrir",
+                  bg=self.cores['sucesso'], fg='white',
+                  font=('Arial', 10, 'bold'),
+                  command=abrir).pack(side='right')
+        tk.Button(rodape, text="Procurar arquivo...",
+                  bg=self.cores['info'], fg='white',
+                  font=('Arial', 10, 'bold'),
+                  command=procurar_arquivo).pack(side='right', padx=10)
+
+        termo_var.trace_add('write', ao_digitar)
+        arvore.bind('<Double-1>', abrir)
+        arvore.bind('<Return>', abrir)
+        entrada_busca.bind('<Return>', abrir)
+        preencher()
+        entrada_busca.focus_set()
+
+    def importar_planilha(self):
+        """
+        Importa um CSV de admissões numa thread própria (depois das gravações
+        já pendentes); o progresso aparece no indicador do header e o botão
+        passa a cancelar a importação.
+        """
+        if self.importacao is not None:
+            self.cancelar_importacao()
+            return
+        caminho = filedialog.askopenfilename(
+            title="Importar planilha",
+            filetypes=[("Planilhas CSV", "*.csv"), ("Todos os arquivos", "*.*")]
         )
-        if not nome_arquivo:
+        if not caminho:
             return
+        from importacao import importar_csv
+        # A importação lê os pacientes existentes: as alterações da tela
+        # precisam estar gravadas antes
+        self.persistencia.gravar_agora()
+        self.trabalhador.aguardar()
+        if self.trabalhador_importacao is None:
+            self.trabalhador_importacao = TrabalhadorES(self.root, intervalo_ms=100)
 
-        try:
-            with open(nome_arquivo, 'r', encoding='utf-8') as f:
-                dados = json.load(f)
-
-            # Carrega dicionários internos
-            self.dados_paciente       = dados.get('paciente', {})
-            self.dados_antropometricos = dados.get('antropometricos', {})
-            self.dados_clinicos       = dados.get('clinicos', {})
-            self.dados_alimentares    = dados.get('alimentares', {})
-            self.dados_intervencao    = dados.get('intervencao', {})
-            self.dados_evolucao    = dados.get('evolucao', {})
-            self.historico_consultas  = dados.get('historico', [])
-
-            # Preenche aba Identificação
-            for campo, widget in self.campos_identificacao.items():
-                valor = self.dados_paciente.get(campo, '')
-                widget.delete(0, tk.END)
-                widget.insert(0, valor)
+        def ao_progresso(resumo):
+            # Chamada na thread da importação: só guarda o valor para a interface ler
+            self.importacao = resumo
 
-            # Preenche aba Anamnese
-            for campo, widget in self.campos_anamnese.items():
-                valor = self.dados_paciente.get('anamnese', {}).get(campo, '')
-                if isinstance(widget, tk.Text):
-                    widget.delete(1.0, tk.END)
-                    widget.insert(tk.END, valor)
-                else:
-                    widget.delete(0, tk.END)
-                    widget.insert(0, valor)
+        self.importacao = False
+        self.importacao_cancelar = threading.Event()
+        self.trabalhador_importacao.enviar(
+            lambda: importar_csv(caminho, self.armazenamento, self.pasta_pacientes,
+                                 ao_progresso=ao_progresso,
+                                 cancelado=self.importacao_cancelar.is_set),
+            ao_concluir=self.ao_concluir_importacao,
+            ao_falhar=self.ao_falhar_importacao)
+        self.botao_importar.config(text="Cancelar Importação")
+        self.definir_status("Importando planilha...", 'pendente')
+        self.acompanhar_importacao()
 
-            # Preenche aba Antropometria (e já dispara cálculo para sincronizar labels)
-            for campo, widget in self.campos_antropometria.items():
-                valor = self.dados_antropometricos.get(campo, '')
-                widget.delete(0, tk.END)
-                widget.insert(0, valor)
-            self.calcular_antropometria()
+    def cancelar_importacao(self):
+        if self.importacao_cancelar is not None:
+            self.importacao_cancelar.set()
+            self.definir_status("Cancelando importação...", 'pendente')
 
-            # Preenche aba Clínica
-            for doenca, var in self.doencas_vars.items():
-                var.set(doenca in self.dados_clinicos.get('doencas', []))
-            self.medicamentos_text.delete(1.0, tk.END)
-            self.medicamentos_text.insert(tk.END, self.dados_clinicos.get('medicamentos', ''))
-            for campo, widget in self.campos_exames.items():
-                valor = self.dados_clinicos.get(campo, '')
-                widget.delete(0, tk.END)
-                widget.insert(0, valor)
+    def encerrar_importacao(self):
+        self.importacao = None
+        self.importacao_cancelar = None
+        self.botao_importar.config(text="Importar Planilha (CSV)")
 
-            # Preenche aba Alimentar
-            for refeicao, widget in self.refeicoes.items():
-                texto = self.dados_alimentares.get('recordatorio', {}).get(refeicao, '')
-                widget.delete(1.0, tk.END)
-                widget.insert(tk.END, texto)
-            for grupo, widget in self.frequencia_vars.items():
-                widget.set(self.dados_alimentares.get('frequencia', {}).get(grupo, ''))
-            for campo, widget in self.campos_habitos.items():
-                widget_val = self.dados_alimentares.get('habitos', {}).get(campo, '')
-                if isinstance(widget, ttk.Combobox):
-                    widget.set(widget_val)
-                else:
-                    widget.delete(0, tk.END)
-                    widget.insert(0, widget_val)
-
-            # Preenche aba Intervenção
-            self.objetivos_text.delete(1.0, tk.END)
-            self.objetivos_text.insert(tk.END, self.dados_intervencao.get('objetivos', ''))
-            self.dieta_text.delete(1.0, tk.END)
-            self.dieta_text.insert(tk.END, self.dados_intervencao.get('dieta', ''))
-            self.suplemento_text.delete(1.0, tk.END)
-            self.suplemento_text.insert(tk.END, self.dados_intervencao.get('suplementacao', ''))
-            self.recomendacoes_text.delete(1.0, tk.END)
-            self.recomendacoes_text.insert(tk.END, self.dados_intervencao.get('recomendacoes', ''))
-
-            # Preenche aba Evolução
-            for chave, entry in self.campos_evolucao.items():
-                valor = self.dados_evolucao.get(chave, '')
-                entry.delete(0, tk.END)
-                entry.insert(0, valor)
-
-            # Atualiza dashboard
-            self.atualizar_dashboard()
-
-            messagebox.showinfo("Sucesso", "Dados carregados com sucesso!")
+    def acompanhar_importacao(self):
+        if self.importacao is None:
+            return
+        if self.importacao:
+            self.definir_status(f"Importando planilha... {self.importacao.lidas} linhas",
+                                'pendente')
+        self.root.after(200, self.acompanhar_importacao)
+
+    def ao_concluir_importacao(self, resumo):
+        self.encerrar_importacao()
+        # Pacientes importados: cópias em memória e agregados ficam desatualizados
+        for chave in resumo.chaves:
+            self.sessao.remover(chave)
+        self.observador.registrar(*resumo.chaves)
+        if self.catalogo is not None and self.armazenamento.tipo == 'json':
+            self.catalogo.atualizar()
+            self.catalogo.salvar_indice()
+        if self.coorte is not None:
+            self.varrer_coorte()
+        if self.chave_sessao is not None and self.chave_sessao in resumo.chaves:
+            # O paciente aberto recebeu linhas da planilha
+            if self.persistencia.pendente:
+                self.avisar_alteracao_externa("pela importação da planilha")
+            else:
+                self.recarregar_paciente()
+        self.definir_status(f"Importação: {resumo}", 'perigo' if resumo.rejeitadas else 'sucesso')
+        if resumo.rejeitadas and not resumo.cancelada:
+            linhas = "\n".join(f"Linha {numero}: {'; '.join(erros)}"
+                               for numero, erros in resumo.erros[:15])
+            messagebox.showwarning("Importação",
+                                   f"{resumo.rejeitadas} linhas não foram importadas:\n\n{linhas}")
 
+    def ao_falhar_importacao(self, erro):
+        self.encerrar_importacao()
+        self.definir_status("Importação não concluída", 'perigo')
+        messagebox.showerror("Erro", f"Falha ao importar a planilha: {erro}")
+
+    def abrir_paciente(self, paciente):
+        """
+        Carrega o paciente escolhido no seletor (arquivo JSON ou banco), sem
+        janelas de confirmação: o tempo até a tela estar pronta para uso
+        aparece no indicador do header.
+        """
+        try:
+            inicio = time.perf_counter()
+            chave = self.chave_sessao_de(paciente)
+            modelo = None
+            if chave is not None and chave != self.chave_sessao:
+                modelo = self.sessao.retirar(chave)
+            if modelo is not None:
+                dados = modelo.dados
+                origem = "cache"
+            else:
+                if paciente.get('arquivo'):
+                    dados = self.armazenamento.carregar_arquivo(paciente['arquivo'])
+                else:
+                    dados = self.armazenamento.carregar(paciente['nome'])
+                origem = f"leitura {(time.perf_counter() - inicio) * 1000:.0f} ms"
+                if chave is not None:
+                    self.observador.registrar((dados.get('paciente') or {}).get('nome') or chave)
+            campos = self.aplicar_dados(dados, chave, modelo)
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao carregar dados: {e}")
+            return
 
-    # Stubs para outras funções de relatório
-    def gerar_relatorio_especifico(self, tipo):
-        messagebox.showinfo("Info", f"Função de relatório específico ({tipo}) em desenvolvimento.")
+        def pronto():
+            # after_idle roda depois dos redesenhos já pendentes dos campos
+            total = time.perf_counter() - inicio
+            self.definir_status(
+                f"{self.dados_paciente.get('nome') or 'Paciente'} aberto em {total * 1000:.0f} ms "
+                f"({origem}, {campos} campos)", 'sucesso')
+        self.root.after_idle(pronto)
+
+    def chave_sessao_de(self, paciente):
+        """Chave do paciente no cache de sessão; None para avaliações fora de pacientes/."""
+        if paciente.get('chave'):
+            return paciente['chave']
+        arquivo = paciente.get('arquivo')
+        if not arquivo:
+            return chave_paciente(paciente.get('nome'))
+        pasta, nome_arquivo = os.path.split(os.path.abspath(arquivo))
+        if (pasta == os.path.abspath(self.pasta_pacientes)
+                and nome_arquivo.startswith('avaliacao_') and nome_arquivo.endswith('.json')):
+            return nome_arquivo[len('avaliacao_'):-len('.json')]
+        return None
+
+    def guardar_sessao(self):
+        """Devolve o paciente atual (já gravado) ao cache de sessão."""
+        if self.chave_sessao is None:
+            return
+        self.sessao.guardar(self.chave_sessao,
+                            ModeloPaciente(self.dados_paciente.get('nome') or self.chave_sessao,
+                                           self.dados_completos(), self.historico,
+                                           self.linha_tempo))
 
+    def atualizar_menu_recentes(self):
+        self.menu_recentes.delete(0, tk.END)
+        for chave, nome in self.sessao.recentes():
+            self.menu_recentes.add_command(
+                label=nome, command=lambda c=chave, n=nome: self.abrir_paciente({'chave': c,
+                                                                                'nome': n}))
+        if not len(self.sessao):
+            self.menu_recentes.add_command(label="Nenhum paciente recente", state='disabled')
+        self.menu_recentes.add_separator()
+        self.menu_recentes.add_command(label=self.sessao.resumo(), state='disabled')
+
+    def aplicar_dados(self, dados, chave=None, modelo=None):
+        """
+        Popula os dicionários internos e os campos da interface. Retorna
+        quantos campos já construídos foram atualizados.
+
+        chave: chave do paciente no cache de sessão (None se não veio do
+        armazenamento); modelo: o ModeloPaciente, quando veio do cache.
+        """
+        # Alterações ainda não gravadas pertencem ao paciente anterior, que
+        # volta ao cache de sessão já gravado
+        self.persistencia.gravar_agora()
+        if self.chave_sessao != chave:
+            self.guardar_sessao()
+        self.chave_sessao = chave
+        from serie_historica import carregar_historico, pasta_serie
+
+        # Carrega dicionários internos
+        self.dados_paciente       = dados.get('paciente', {})
+        self.dados_antropometricos = dados.get('antropometricos', {})
+        self.dados_clinicos       = dados.get('clinicos', {})
+        self.dados_alimentares    = dados.get('alimentares', {})
+        self.dados_intervencao    = dados.get('intervencao', {})
+        self.dados_evolucao    = dados.get('evolucao', {})
+        if modelo is not None:
+            self.historico = modelo.historico
+            self.linha_tempo = modelo.linha_tempo
+        else:
+            self.historico = carregar_historico(dados.get('historico'), self.pasta_pacientes)
+            self.linha_tempo = None
+        self.historico_gravado = None
+        if isinstance(dados.get('historico'), dict):
+            self.historico_gravado = (pasta_serie(self.pasta_pacientes, self.chave_atual()),
+                                      len(self.historico))
+        elif len(self.historico):
+            # Formato antigo (lista no JSON): grava a série em .npy já na abertura,
+            # antes que qualquer gravação passe a referenciá-la
+            self.salvar_historico()
+
+        # Índices derivados (IMC, RCQ...) a partir das medidas carregadas
+        self.recalcular_antropometria()
+
+        # Campos das abas já construídas recebem os novos valores de uma vez;
+        # as demais abas os leem quando forem abertas
+        campos = self.formulario.carregar()
+        for preencher in self.abas_construidas:
+            preencher()
+
+        # Atualiza dashboard
+        self.dados_alterados()
+        self.atualizar_dashboard()
+        return campos
+
+    # Valores calculados a partir dos dicionários dados_* (os campos em si
+    # vêm de self.formulario)
+    def dados_formulario(self):
+        return {
+            'paciente': self.dados_paciente,
+            'antropometricos': self.dados_antropometricos,
+            'clinicos': self.dados_clinicos,
+            'alimentares': self.dados_alimentares,
+            'intervencao': self.dados_intervencao,
+            'evolucao': self.dados_evolucao,
+        }
+
+    def preencher_antropometria(self):
+        self.atualizar_resultados_antropometria()
+
+    def preencher_alimentar(self):
+        self.atualizar_totais_recordatorio()
+
+    # Stubs para outras funções de relatório
     def visualizar_relatorio(self):
         messagebox.showinfo("Info", "Visualização de PDF não implementada.")
 
@@ -1893,14 +2368,186 @@ class AvaliacaoNutricionalIdosos:
         messagebox.showinfo("Info", "Salvar gráficos em desenvolvimento.")
 
 
-def on_closing(root):
+def perfil_importacoes():
+    """
+    Tempo de importação de app.py e de cada módulo importado diretamente por
+    ele, medido num processo novo com python -X importtime.
+    Retorna (total em ms, [(ms, módulo), ...] do mais lento ao mais rápido).
+    """
+    import subprocess
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                           cwd=pasta, capture_output=True, text=True).stderr
+    diretos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        if not acumulado.strip().isdigit():
+            continue  # cabeçalho
+        # Cada nível de importação aninhada acrescenta dois espaços ao nome
+        profundidade = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if profundidade == 1:
+            diretos.append((int(acumulado) / 1000, nome.strip()))
+        elif profundidade == 0:
+            if nome.strip() == 'app':
+                return int(acumulado) / 1000, sorted(diretos, reverse=True)
+            diretos = []
+    return 0.0, []
+
+def contar_widgets(widget):
+    return 1 + sum(contar_widgets(filho) for filho in widget.winfo_children())
+
+def on_closing(root, app):
     if messagebox.askokcancel("Sair", "Você tem certeza que deseja sair?"):
+        if app.importacao is not None:
+            # A importação para depois do lote em gravação
+            app.cancelar_importacao()
+            app.trabalhador_importacao.aguardar()
+        app.persistencia.gravar_agora()
+        app.trabalhador.aguardar()
+        if app.persistencia.pendente and not messagebox.askyesno(
+                "Sair",
+                "Algumas alterações não puderam ser salvas e serão perdidas.\n\n"
+                "Sair mesmo assim?"):
+            return  # A persistência continua tentando gravar
         root.destroy()
         sys.exit(0)  # Garante que o programa encerre completamente
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema de Avaliação Nutricional - Idosos")
+    parser.add_argument('--compactar-evolucoes', action='store_true',
+                        help="incorpora os arquivos evolucao_*.json avulsos aos diários "
+                             "de evolução de cada paciente e sai")
+    parser.add_argument('--relatorios-lote', metavar='PASTA_SAIDA',
+                        help="gera o relatório completo em PDF de cada paciente de "
+                             "pacientes/ em PASTA_SAIDA e sai")
+    parser.add_argument('--importar-csv', metavar='ARQUIVO',
+                        help="importa os pacientes e medidas de uma planilha CSV para "
+                             "pacientes/ e sai")
+    parser.add_argument('--mapa-colunas', metavar='COLUNA=campo', action='append', default=[],
+                        help="associa uma coluna do CSV a um campo em --importar-csv "
+                             "(pode ser repetido)")
+    parser.add_argument('--exportar-coorte', metavar='PASTA_SAIDA',
+                        help="exporta todos os pacientes para PASTA_SAIDA/coorte.csv e "
+                             "coorte.npz (só relê os alterados desde a última exportação) e sai")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="processos usados em --relatorios-lote, --importar-csv e "
+                             "--exportar-coorte (padrão: nº de CPUs)")
+    parser.add_argument('--perfil', action='store_true',
+                        help="mede o tempo de abertura da janela, mostra o resultado e sai")
+    args = parser.parse_args(argv)
+
+    if args.compactar_evolucoes:
+        from diario_evolucao import compactar_pasta
+        evol_dir = os.path.join(os.getcwd(), "evoluções")
+        if not os.path.isdir(evol_dir):
+            print(f"Pasta não encontrada: {evol_dir}")
+            return 1
+        incorporados, pacientes, ignorados = compactar_pasta(evol_dir)
+        print(f"{incorporados} evoluções incorporadas aos diários de {pacientes} pacientes.")
+        for nome in ignorados:
+            print(f"Ignorado (nome ou conteúdo inválido): {nome}")
+        return 0
+
+    if args.relatorios_lote:
+        pasta_pacientes = os.path.join(os.getcwd(), "pacientes")
+        if not os.path.isdir(pasta_pacientes):
+            print(f"Pasta não encontrada: {pasta_pacientes}")
+            return 1
+
+        def progresso(feitos, total, chave, resultado, erro):
+            if erro is None:
+                print(f"[{feitos}/{total}] {chave} -> {os.path.basename(resultado[0])} "
+                      f"({resultado[1]:.2f} s)")
+            else:
+                print(f"[{feitos}/{total}] {chave}: FALHA ({erro})")
+
+        from relatorios import gerar_lote
+        armazenamento = criar_armazenamento(pasta=pasta_pacientes)
+        inicio = datetime.now()
+        gerados, falhas = gerar_lote(armazenamento, pasta_pacientes, args.relatorios_lote, CORES,
+                                     processos=args.processos, ao_progresso=progresso)
+        duracao = (datetime.now() - inicio).total_seconds()
+        print(f"{len(gerados)} relatórios gerados em {duracao:.1f} s, {len(falhas)} falhas.")
+        return 1 if falhas else 0
+
+    if args.importar_csv:
+        from importacao import importar_csv
+        if any('=' not in item for item in args.mapa_colunas):
+            parser.error("--mapa-colunas espera COLUNA=campo")
+        mapa = dict(item.split('=', 1) for item in args.mapa_colunas)
+        pasta_pacientes = os.path.join(os.getcwd(), "pacientes")
+        armazenamento = criar_armazenamento(pasta=pasta_pacientes)
+        os.makedirs(pasta_pacientes, exist_ok=True)
+
+        def progresso(resumo):
+            print(f"\r{resumo.lidas} linhas lidas, {resumo.rejeitadas} rejeitadas",
+                  end='', flush=True)
+
+        try:
+            resumo = importar_csv(args.importar_csv, armazenamento, pasta_pacientes, mapa=mapa,
+                                  processos=args.processos, ao_progresso=progresso)
+        except (OSError, ValueError) as e:
+            print(f"Falha ao importar: {e}")
+            return 1
+        print()
+        print(f"Colunas: {', '.join(f'{c} -> {f}' for c, f in resumo.colunas.items())}")
+        if resumo.ignoradas:
+            print(f"Colunas ignoradas: {', '.join(resumo.ignoradas)}")
+        for numero, erros in resumo.erros:
+            print(f"Linha {numero}: {'; '.join(erros)}")
+        print(resumo)
+        return 1 if resumo.rejeitadas else 0
+
+    if args.exportar_coorte:
+        pasta_pacientes = os.path.join(os.getcwd(), "pacientes")
+        if not os.path.isdir(pasta_pacientes):
+            print(f"Pasta não encontrada: {pasta_pacientes}")
+            return 1
+
+        def progresso(feitos, total):
+            print(f"\r{feitos}/{total} pacientes lidos", end='', flush=True)
+
+        from exportacao import exportar_coorte
+        resumo = exportar_coorte(criar_armazenamento(pasta=pasta_pacientes), pasta_pacientes,
+                                 args.exportar_coorte, processos=args.processos,
+                                 ao_progresso=progresso)
+        if resumo.lidos or resumo.falhas:
+            print()
+        for chave, erro in resumo.falhas:
+            print(f"{chave}: FALHA ({erro})")
+        print(resumo)
+        return 1 if resumo.falhas else 0
+
+    if args.perfil:
+        total, modulos = perfil_importacoes()
+        print(f"Importação de app.py: {total:8.1f} ms (python -X importtime)")
+        for ms, nome in modulos[:12]:
+            print(f"  {nome:<28} {ms:8.1f} ms")
+        print()
+
+    inicio_interface = time.perf_counter()
     root = tk.Tk()
     app = AvaliacaoNutricionalIdosos(root)
+    if args.perfil:
+        interface = time.perf_counter()
+        root.update()  # primeira pintura da janela
+        pronta = time.perf_counter()
+        print(f"Importações:      {(inicio_interface - INICIO) * 1000:8.1f} ms")
+        print(f"Montagem da tela: {(interface - inicio_interface) * 1000:8.1f} ms")
+        print(f"Primeira pintura: {(pronta - interface) * 1000:8.1f} ms")
+        print(f"Total:            {(pronta - INICIO) * 1000:8.1f} ms "
+              f"({contar_widgets(root)} widgets, "
+              f"{len(app.abas_pendentes)} abas ainda não construídas)")
+        carregados = [nome for nome in PESADOS if nome in sys.modules]
+        print(f"Módulos pesados carregados na abertura: {', '.join(carregados) or 'nenhum'}")
+        root.destroy()
+        return 0
     # Aqui vinculamos o fechamento à janela principal:
-    root.protocol("WM_DELETE_WINDOW", lambda: on_closing(root))
+    root.protocol("WM_DELETE_WINDOW", lambda: on_closing(root, app))
     root.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
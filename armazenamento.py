@@ -0,0 +1,285 @@
+"""
+Mecanismos de armazenamento dos dados dos pacientes.
+
+ArmazenamentoJSON mantém o formato original (um avaliacao_<nome>.json por
+paciente em pacientes/). ArmazenamentoSQLite guarda cada seção da avaliação
+numa tabela indexada: salvar uma seção grava só essa seção e a busca por
+nome ou nº de registro é uma consulta indexada, sem percorrer diretórios.
+"""
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+
+from persistencia import gravar_atomico
+
+# Seções que compõem uma avaliação (mesmas chaves do JSON do paciente)
+SECOES = ('paciente', 'antropometricos', 'clinicos', 'alimentares',
+          'intervencao', 'evolucao', 'historico')
+
+
+def chave_paciente(nome):
+    """Chave usada nos nomes de arquivo: avaliacao_<chave>.json"""
+    return (nome or 'paciente').replace(' ', '_')
+
+
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos, para buscas por nome."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def secoes_vazias():
+    dados = {secao: {} for secao in SECOES}
+    dados['historico'] = []
+    return dados
+
+
+class ArmazenamentoJSON:
+    """Um documento JSON por paciente, reescrito por completo a cada gravação."""
+
+    tipo = 'json'
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta, f"avaliacao_{chave_paciente(nome)}.json")
+
+    def preparar(self, dados, secoes=None):
+        """
+        Serializa o documento inteiro ('secoes' só interessa ao SQLite). O
+        resultado é um instantâneo que pode ser gravado em outra thread.
+        """
+        documento = {secao: dados.get(secao, {}) for secao in SECOES}
+        documento['ultima_atualizacao'] = datetime.now().isoformat()
+        conteudo = json.dumps(documento, ensure_ascii=False, indent=2).encode('utf-8')
+        return self.caminho(dados.get('paciente', {}).get('nome')), conteudo
+
+    def gravar(self, lote):
+        """Grava um instantâneo de forma atômica. Retorna (caminho, bytes gravados)."""
+        file_path, conteudo = lote
+        return file_path, gravar_atomico(file_path, conteudo)
+
+    def salvar(self, dados, secoes=None):
+        return self.gravar(self.preparar(dados, secoes))
+
+    def carregar_arquivo(self, caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def carregar(self, nome):
+        return self.carregar_arquivo(self.caminho(nome))
+
+    def versoes(self):
+        """chave -> marca que muda a cada gravação do paciente (mtime e tamanho do arquivo)."""
+        versoes = {}
+        for entrada in os.scandir(self.pasta):
+            if entrada.name.startswith('avaliacao_') and entrada.name.endswith('.json'):
+                st = entrada.stat()
+                versoes[entrada.name[len('avaliacao_'):-len('.json')]] = \
+                    f"{st.st_mtime_ns}:{st.st_size}"
+        return versoes
+
+    def versao(self, nome):
+        """Marca de versao() de um paciente; None se ele não estiver gravado."""
+        try:
+            st = os.stat(self.caminho(nome))
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+class ArmazenamentoSQLite:
+    """
+    Pacientes e seções em tabelas indexadas de um banco SQLite.
+
+    A conexão é compartilhada entre threads e protegida por um lock, para que
+    a gravação possa ser feita fora da thread da interface.
+    """
+
+    tipo = 'sqlite'
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS pacientes (
+            id INTEGER PRIMARY KEY,
+            chave TEXT NOT NULL UNIQUE,
+            nome TEXT NOT NULL DEFAULT '',
+            nome_busca TEXT NOT NULL DEFAULT '',
+            registro TEXT NOT NULL DEFAULT '',
+            ultima_atualizacao TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_pacientes_nome_busca ON pacientes(nome_busca);
+        CREATE INDEX IF NOT EXISTS idx_pacientes_registro ON pacientes(registro);
+        CREATE TABLE IF NOT EXISTS secoes (
+            paciente_id INTEGER NOT NULL REFERENCES pacientes(id) ON DELETE CASCADE,
+            secao TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            PRIMARY KEY (paciente_id, secao)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, caminho_db):
+        self.caminho_db = caminho_db
+        pasta = os.path.dirname(caminho_db)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho_db, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.ESQUEMA)
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+    def preparar(self, dados, secoes=None):
+        """
+        Serializa apenas as seções indicadas (todas, se 'secoes' for None).
+        O resultado é um instantâneo que pode ser gravado em outra thread.
+        """
+        secoes = SECOES if secoes is None else secoes
+        paciente = dados.get('paciente', {})
+        linhas = [(secao, json.dumps(dados.get(secao, {}), ensure_ascii=False,
+                                     separators=(',', ':')))
+                  for secao in secoes]
+        return (paciente.get('nome', ''), str(paciente.get('registro', '')).strip(), linhas)
+
+    def salvar(self, dados, secoes=None):
+        return self.gravar(self.preparar(dados, secoes))
+
+    def gravar(self, lote):
+        """Grava um instantâneo. Retorna (caminho do banco, bytes de dados gravados)."""
+        nome, registro, linhas = lote
+        agora = datetime.now().isoformat()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO pacientes (chave, nome, nome_busca, registro, ultima_atualizacao)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(chave) DO UPDATE SET
+                    nome = excluded.nome,
+                    nome_busca = excluded.nome_busca,
+                    registro = excluded.registro,
+                    ultima_atualizacao = excluded.ultima_atualizacao
+                """,
+                (chave_paciente(nome), nome, normalizar_texto(nome), registro, agora))
+            paciente_id = self._conn.execute(
+                "SELECT id FROM pacientes WHERE chave = ?", (chave_paciente(nome),)).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO secoes (paciente_id, secao, dados, atualizado_em) "
+                "VALUES (?, ?, ?, ?)",
+                [(paciente_id, secao, texto, agora) for secao, texto in linhas])
+        return self.caminho_db, sum(len(texto.encode('utf-8')) for _, texto in linhas)
+
+    def carregar(self, nome):
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT id, ultima_atualizacao FROM pacientes WHERE chave = ?",
+                (chave_paciente(nome),)).fetchone()
+            if linha is None:
+                raise KeyError(f"Paciente não encontrado: {nome}")
+            secoes = self._conn.execute(
+                "SELECT secao, dados FROM secoes WHERE paciente_id = ?", (linha[0],)).fetchall()
+
+        dados = secoes_vazias()
+        for secao, texto in secoes:
+            dados[secao] = json.loads(texto)
+        dados['ultima_atualizacao'] = linha[1]
+        return dados
+
+    def carregar_arquivo(self, caminho):
+        # Avaliações JSON avulsas continuam podendo ser abertas com o banco ativo
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def buscar(self, termo, limite=50):
+        """
+        Busca por nº de registro (igualdade) ou prefixo do nome, sem acentos.
+        Retorna uma lista de dicionários com nome, registro e ultima_atualizacao.
+        """
+        termo = (termo or '').strip()
+        prefixo = normalizar_texto(termo)
+        with self._lock:
+            linhas = self._conn.execute(
+                """
+                SELECT nome, registro, ultima_atualizacao FROM pacientes WHERE registro = ?
+                UNION
+                SELECT nome, registro, ultima_atualizacao FROM pacientes
+                 WHERE nome_busca >= ? AND nome_busca < ?
+                ORDER BY nome
+                LIMIT ?
+                """,
+                (termo, prefixo, prefixo + '\uffff', limite)).fetchall()
+        return [{'nome': nome, 'registro': registro, 'ultima_atualizacao': atualizado}
+                for nome, registro, atualizado in linhas]
+
+    def versoes(self):
+        """chave -> data da última gravação do paciente."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT chave, ultima_atualizacao FROM pacientes"))
+
+    def versao(self, nome):
+        with self._lock:
+            linha = self._conn.execute("SELECT ultima_atualizacao FROM pacientes WHERE chave = ?",
+                                       (chave_paciente(nome),)).fetchone()
+        return linha[0] if linha else None
+
+    def percorrer(self, secoes=SECOES, lote=500):
+        """
+        Gera (chave, dados) de todos os pacientes, lendo só as seções pedidas,
+        em lotes de 'lote' pacientes (o lock é liberado entre os lotes).
+        """
+        ultimo = 0
+        marcadores = ','.join('?' * len(secoes))
+        while True:
+            with self._lock:
+                pacientes = self._conn.execute(
+                    "SELECT id, chave FROM pacientes WHERE id > ? ORDER BY id LIMIT ?",
+                    (ultimo, lote)).fetchall()
+                if not pacientes:
+                    return
+                linhas = self._conn.execute(
+                    f"SELECT paciente_id, secao, dados FROM secoes "
+                    f"WHERE paciente_id BETWEEN ? AND ? AND secao IN ({marcadores})",
+                    (pacientes[0][0], pacientes[-1][0], *secoes)).fetchall()
+            por_paciente = {}
+            for paciente_id, secao, texto in linhas:
+                por_paciente.setdefault(paciente_id, {})[secao] = json.loads(texto)
+            for paciente_id, chave in pacientes:
+                yield chave, por_paciente.get(paciente_id, {})
+            ultimo = pacientes[-1][0]
+
+    def importar_json(self, pasta):
+        """Copia para o banco todos os avaliacao_*.json de uma pasta."""
+        total = 0
+        for entrada in os.scandir(pasta):
+            if entrada.name.startswith('avaliacao_') and entrada.name.endswith('.json'):
+                with open(entrada.path, 'r', encoding='utf-8') as f:
+                    self.salvar(json.load(f))
+                total += 1
+        return total
+
+
+def criar_armazenamento(tipo=None, pasta=None):
+    """
+    Cria o armazenamento configurado. O tipo vem do parâmetro ou da variável
+    de ambiente NUTRI_ARMAZENAMENTO ('json', padrão, ou 'sqlite').
+    """
+    tipo = (tipo or os.environ.get('NUTRI_ARMAZENAMENTO') or 'json').lower()
+    pasta = pasta or os.path.join(os.getcwd(), "pacientes")
+    if tipo == 'sqlite':
+        caminho_db = os.path.join(pasta, "pacientes.db")
+        novo = not os.path.exists(caminho_db)
+        armazenamento = ArmazenamentoSQLite(caminho_db)
+        if novo and os.path.isdir(pasta):
+            # Primeira execução com SQLite: traz as avaliações em JSON já existentes
+            armazenamento.importar_json(pasta)
+        return armazenamento
+    return ArmazenamentoJSON(pasta)
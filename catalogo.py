@@ -0,0 +1,195 @@
+"""
+Catálogo persistente dos pacientes salvos em pacientes/ e evoluções/.
+
+O índice guarda, para cada avaliacao_<nome>.json, um resumo compacto (nome,
+registro, sexo, último IMC, risco, doenças) junto com o mtime e o tamanho do
+arquivo. O mesmo resumo alimenta os indicadores da coorte (coorte.py).
+A atualização é incremental: só os arquivos cujo mtime ou tamanho mudou são
+lidos novamente, de modo que abrir o seletor de pacientes não exige abrir
+todos os JSON.
+"""
+import heapq
+import json
+import os
+
+from armazenamento import normalizar_texto
+from diario_evolucao import REGISTRO_INDICE
+from nutricao import avaliar
+from persistencia import gravar_atomico
+
+# Posições das colunas de cada entrada no índice salvo em disco
+NOME, REGISTRO, SEXO, IMC, RISCO, DOENCAS, MTIME, TAMANHO = range(8)
+
+
+def chave_evolucao(nome_arquivo):
+    """
+    evolucao_<chave>_<AAAAMMDD>_<HHMMSS>.json (avulso) ou <chave>.idx (índice
+    do diário) -> <chave>
+    """
+    if nome_arquivo.endswith('.idx'):
+        return nome_arquivo[:-len('.idx')]
+    base = nome_arquivo[len('evolucao_'):-len('.json')]
+    partes = base.rsplit('_', 2)
+    return partes[0] if len(partes) == 3 else base
+
+
+def chave_arquivo(nome_arquivo):
+    """avaliacao_<chave>.json -> <chave>"""
+    return nome_arquivo[len('avaliacao_'):-len('.json')]
+
+
+def eh_arquivo_evolucao(nome_arquivo):
+    return (nome_arquivo.endswith('.idx')
+            or (nome_arquivo.startswith('evolucao_') and nome_arquivo.endswith('.json')))
+
+
+class CatalogoPacientes:
+    VERSAO = 3
+
+    def __init__(self, pasta_pacientes, pasta_evolucoes, caminho_indice=None):
+        self.pasta_pacientes = pasta_pacientes
+        self.pasta_evolucoes = pasta_evolucoes
+        self.caminho_indice = caminho_indice or os.path.join(pasta_pacientes, '.catalogo.json')
+        self.pacientes = {}   # nome do arquivo -> [nome, registro, sexo, imc, risco, doenças, mtime, tamanho]
+        self.evolucoes = {}   # nome do arquivo -> [chave, mtime, tamanho]
+        self._busca = {}      # nome do arquivo -> texto normalizado para busca
+        self._contagem_evolucoes = None
+        self._alterado = False
+        self.carregar_indice()
+
+    # Índice em disco
+    def carregar_indice(self):
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return
+        if indice.get('versao') != self.VERSAO:
+            return
+        self.pacientes = indice.get('pacientes', {})
+        self.evolucoes = indice.get('evolucoes', {})
+        self._busca = {arquivo: self._texto_busca(entrada)
+                       for arquivo, entrada in self.pacientes.items()}
+
+    def salvar_indice(self):
+        if not self._alterado:
+            return
+        indice = {'versao': self.VERSAO, 'pacientes': self.pacientes, 'evolucoes': self.evolucoes}
+        gravar_atomico(self.caminho_indice,
+                       json.dumps(indice, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self._alterado = False
+
+    # Atualização incremental
+    def atualizar(self):
+        """
+        Relê só os arquivos novos ou alterados e remove os que sumiram.
+        Retorna (quantidade relida, quantidade removida).
+        """
+        relidos = removidos = 0
+
+        vistos = set()
+        for entrada in self._listar(self.pasta_pacientes,
+                                    lambda nome: nome.startswith('avaliacao_') and nome.endswith('.json')):
+            vistos.add(entrada.name)
+            st = entrada.stat()
+            atual = self.pacientes.get(entrada.name)
+            if atual is None or atual[MTIME] != st.st_mtime_ns or atual[TAMANHO] != st.st_size:
+                if self._indexar_paciente(entrada.path, entrada.name, st):
+                    relidos += 1
+        for arquivo in set(self.pacientes) - vistos:
+            del self.pacientes[arquivo]
+            self._busca.pop(arquivo, None)
+            removidos += 1
+
+        vistos = set()
+        for entrada in self._listar(self.pasta_evolucoes, eh_arquivo_evolucao):
+            vistos.add(entrada.name)
+            st = entrada.stat()
+            atual = self.evolucoes.get(entrada.name)
+            if atual is None or atual[1] != st.st_mtime_ns or atual[2] != st.st_size:
+                self.evolucoes[entrada.name] = [chave_evolucao(entrada.name),
+                                                st.st_mtime_ns, st.st_size]
+                relidos += 1
+        for arquivo in set(self.evolucoes) - vistos:
+            del self.evolucoes[arquivo]
+            removidos += 1
+
+        if relidos or removidos:
+            self._alterado = True
+            self._contagem_evolucoes = None
+        return relidos, removidos
+
+    def atualizar_arquivo(self, caminho):
+        """Reindexa um único arquivo de paciente (ex.: logo após salvá-lo)."""
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            return
+        if self._indexar_paciente(caminho, os.path.basename(caminho), st):
+            self._alterado = True
+
+    def _listar(self, pasta, aceitar):
+        try:
+            with os.scandir(pasta) as it:
+                for entrada in it:
+                    if aceitar(entrada.name):
+                        yield entrada
+        except FileNotFoundError:
+            return
+
+    def _indexar_paciente(self, caminho, arquivo, st):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            # Arquivo sendo gravado ou corrompido: tenta de novo na próxima varredura
+            return False
+        paciente = dados.get('paciente', {})
+        imc = dados.get('antropometricos', {}).get('imc')
+        _, risco = avaliar(dados)
+        entrada = [paciente.get('nome', ''), str(paciente.get('registro', '')),
+                   paciente.get('sexo', ''), round(imc, 1) if imc else None,
+                   risco, list(dados.get('clinicos', {}).get('doencas', [])),
+                   st.st_mtime_ns, st.st_size]
+        self.pacientes[arquivo] = entrada
+        self._busca[arquivo] = self._texto_busca(entrada)
+        return True
+
+    def _texto_busca(self, entrada):
+        return f"{normalizar_texto(entrada[NOME])} {entrada[REGISTRO]}"
+
+    # Consultas
+    def contar_evolucoes(self):
+        if self._contagem_evolucoes is None:
+            contagem = {}
+            for arquivo, (chave, _, tamanho) in self.evolucoes.items():
+                # Um .idx tem um registro de tamanho fixo por evolução do diário
+                quantidade = tamanho // REGISTRO_INDICE.size if arquivo.endswith('.idx') else 1
+                contagem[chave] = contagem.get(chave, 0) + quantidade
+            self._contagem_evolucoes = contagem
+        return self._contagem_evolucoes
+
+    def buscar(self, termo='', limite=200):
+        """
+        Pacientes cujo nome (sem acentos) ou registro contém o termo, em ordem
+        alfabética. Retorna no máximo 'limite' resultados e o total encontrado.
+        """
+        termo = normalizar_texto(termo)
+        encontrados = [arquivo for arquivo, texto in self._busca.items() if termo in texto]
+        primeiros = heapq.nsmallest(limite, encontrados, key=self._busca.__getitem__)
+
+        evolucoes = self.contar_evolucoes()
+        resultado = []
+        for arquivo in primeiros:
+            entrada = self.pacientes[arquivo]
+            chave = chave_arquivo(arquivo)
+            resultado.append({
+                'arquivo': os.path.join(self.pasta_pacientes, arquivo),
+                'nome': entrada[NOME],
+                'registro': entrada[REGISTRO],
+                'sexo': entrada[SEXO],
+                'imc': entrada[IMC],
+                'risco': entrada[RISCO],
+                'evolucoes': evolucoes.get(chave, 0),
+            })
+        return resultado, len(encontrados)
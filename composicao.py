@@ -0,0 +1,265 @@
+"""
+Composição de alimentos e análise do recordatório 24h.
+
+A tabela (dados/taco.csv, no formato da TACO: energia e macronutrientes por
+100 g, mais uma porção padrão em gramas) é carregada uma vez em arrays
+NumPy, com um índice de trigramas dos nomes normalizados (sem acentos, em
+minúsculas). Cada item do recordatório ("2 fatias de pão de forma",
+"1 concha de feijão", "200 ml de leite") é separado em quantidade, medida
+caseira e alimento; o alimento é o nome da tabela que contém mais
+trigramas do trecho, de preferência começando pela mesma palavra (em caso
+de empate vale a ordem da tabela, com o preparo mais comum primeiro).
+Itens já analisados ficam num cache LRU (até LIMITE_ITENS), então
+recalcular o recordatório inteiro a cada tecla só analisa o trecho que
+mudou.
+
+Benchmark: python composicao.py --benchmark [quantidade]
+"""
+import csv
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+ARQUIVO_TABELA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados', 'taco.csv')
+
+NUTRIENTES = ('kcal', 'cho', 'ptn', 'lip')
+COLUNAS = ('energia_kcal', 'carboidrato_g', 'proteina_g', 'lipidio_g')
+KCAL_POR_GRAMA = np.array([4, 4, 9])  # CHO, PTN, LIP
+COBERTURA_MINIMA = 0.5  # Fração dos trigramas do trecho; abaixo disso fica sem alimento
+LIMITE_ITENS = 2048  # Itens analisados guardados; os menos usados recentemente saem primeiro
+
+# Medidas caseiras -> gramas (ml tratado como g)
+MEDIDAS = {
+    'g': 1, 'gr': 1, 'grama': 1, 'gramas': 1, 'ml': 1, 'kg': 1000, 'l': 1000,
+    'litro': 1000, 'litros': 1000,
+    'colher de sopa': 15, 'colheres de sopa': 15,
+    'colher de sobremesa': 10, 'colheres de sobremesa': 10,
+    'colher de cha': 5, 'colheres de cha': 5,
+    'colher de servir': 45, 'colheres de servir': 45,
+    'colher': 15, 'colheres': 15,
+    'concha': 100, 'conchas': 100,
+    'escumadeira': 90, 'escumadeiras': 90,
+    'xicara': 160, 'xicaras': 160,
+    'copo': 200, 'copos': 200,
+    'fatia': 25, 'fatias': 25,
+    'pedaco': 50, 'pedacos': 50,
+    'prato': 250, 'pratos': 250,
+}
+# Medidas que valem a porção padrão do alimento
+PORCOES = ('unidade', 'unidades', 'porcao', 'porcoes')
+
+NUMEROS = {'um': 1, 'uma': 1, 'meio': 0.5, 'meia': 0.5, 'dois': 2, 'duas': 2,
+           'tres': 3, 'quatro': 4, 'cinco': 5, 'seis': 6}
+
+_SEPARADORES = re.compile(r',(?!\d)|[;+\n]|\s+e\s+|\s+com\s+')  # "1,5" não separa
+_ITEM = re.compile(
+    r'^(?P<qtd>\d+(?:[.,]\d+)?(?:/\d+)?|' + '|'.join(NUMEROS) + r')?\s*'
+    r'(?:(?P<medida>' + '|'.join(sorted((re.escape(m) for m in list(MEDIDAS) + list(PORCOES)),
+                                          key=len, reverse=True)) + r')\b)?\s*'
+    r'(?:\b(?:de|do|da|dos|das)\b\s*)?'
+    r'(?P<alimento>.*)$')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e só letras, números e espaços simples."""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'(?<!\d)[.,]|[.,](?!\d)', ' ', texto)  # Vírgula e ponto só em números
+    return ' '.join(re.sub(r'[^a-z0-9/.,]+', ' ', texto).split())
+
+
+def trigramas(texto):
+    trigramas = set()
+    for palavra in texto.split():
+        palavra = f' {palavra} '
+        trigramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return trigramas
+
+
+def _quantidade(texto):
+    """Quantidade do item; None se inválida (ex.: "1/0", ainda sendo digitada)."""
+    if not texto:
+        return 1.0
+    if texto in NUMEROS:
+        return float(NUMEROS[texto])
+    if '/' in texto:
+        numerador, denominador = texto.split('/')
+        if not float(denominador or 1):
+            return None
+        return float(numerador.replace(',', '.')) / float(denominador or 1)
+    return float(texto.replace(',', '.'))
+
+
+class TabelaComposicao:
+    """
+    Alimentos em arrays: nutrientes (n x 4, por 100 g, na ordem de
+    NUTRIENTES) e porcoes (g). Os índices levam cada trigrama, e cada
+    primeira palavra, aos alimentos que o contêm.
+    """
+
+    def __init__(self, nomes, nutrientes, porcoes):
+        self.nomes = list(nomes)
+        self.nutrientes = np.asarray(nutrientes, dtype=np.float32).reshape(-1, len(NUTRIENTES))
+        self.porcoes = np.asarray(porcoes, dtype=np.float32)
+        self._indice = {}
+        self._primeiras = {}
+        for i, nome in enumerate(self.nomes):
+            nome = normalizar(nome)
+            for tri in trigramas(nome):
+                self._indice.setdefault(tri, []).append(i)
+            self._primeiras.setdefault(nome.split(' ')[0], []).append(i)
+        self._indice = {tri: np.array(ids, dtype=np.int32) for tri, ids in self._indice.items()}
+        self._itens = OrderedDict()  # item normalizado -> (alimento ou -1, gramas), LRU
+
+    def __len__(self):
+        return len(self.nomes)
+
+    @classmethod
+    def carregar(cls, caminho=ARQUIVO_TABELA):
+        nomes, nutrientes, porcoes = [], [], []
+        with open(caminho, 'r', encoding='utf-8', newline='') as f:
+            for linha in csv.DictReader(f):
+                nomes.append(linha['alimento'])
+                nutrientes.append([float(linha[coluna] or 0) for coluna in COLUNAS])
+                porcoes.append(float(linha.get('porcao_g') or 100))
+        return cls(nomes, nutrientes, porcoes)
+
+    def buscar(self, termo, limite=5):
+        """Índices dos alimentos mais parecidos com termo, do mais ao menos parecido."""
+        termo = normalizar(termo)
+        tris = trigramas(termo)
+        listas = [self._indice[tri] for tri in tris if tri in self._indice]
+        if not listas:
+            return []
+        cobertura = np.bincount(np.concatenate(listas), minlength=len(self.nomes)) / len(tris)
+        pontos = cobertura.copy()
+        pontos[self._primeiras.get(termo.split(' ')[0], [])] += 0.5
+        melhores = np.argsort(-pontos, kind='stable')[:limite]
+        return [int(i) for i in melhores if cobertura[i] >= COBERTURA_MINIMA]
+
+    def analisar_item(self, item):
+        """(índice do alimento ou -1, gramas) de um item já normalizado."""
+        resultado = self._itens.get(item)
+        if resultado is not None:
+            self._itens.move_to_end(item)
+        else:
+            partes = _ITEM.match(item)
+            encontrados = self.buscar(partes['alimento']) if partes['alimento'] else []
+            quantidade = _quantidade(partes['qtd'])
+            if not encontrados or quantidade is None:
+                resultado = (-1, 0.0)
+            else:
+                alimento = encontrados[0]
+                medida = partes['medida']
+                if medida is None or medida in PORCOES:
+                    gramas = quantidade * float(self.porcoes[alimento])
+                else:
+                    gramas = quantidade * MEDIDAS[medida]
+                resultado = (alimento, gramas)
+            self._itens[item] = resultado
+            if len(self._itens) > LIMITE_ITENS:
+                self._itens.popitem(last=False)
+        return resultado
+
+    def analisar_refeicao(self, texto):
+        """
+        Totais (array com kcal, CHO, PTN e LIP) e itens de uma refeição;
+        itens é uma lista de (trecho, nome do alimento ou None, gramas).
+        """
+        totais = np.zeros(len(NUTRIENTES))
+        itens = []
+        for trecho in _SEPARADORES.split(texto.lower()):
+            trecho = normalizar(trecho)
+            if not trecho:
+                continue
+            alimento, gramas = self.analisar_item(trecho)
+            if alimento < 0:
+                itens.append((trecho, None, 0.0))
+                continue
+            totais += self.nutrientes[alimento] * (gramas / 100)
+            itens.append((trecho, self.nomes[alimento], gramas))
+        return totais, itens
+
+
+_tabela = None
+
+
+def tabela():
+    """Tabela padrão (dados/taco.csv), carregada no primeiro uso."""
+    global _tabela
+    if _tabela is None:
+        _tabela = TabelaComposicao.carregar()
+    return _tabela
+
+
+def analisar_recordatorio(recordatorio):
+    """
+    recordatorio: dict refeição -> texto. Retorna (dict refeição -> totais,
+    totais do dia), com os totais em arrays na ordem de NUTRIENTES.
+    """
+    por_refeicao = {refeicao: tabela().analisar_refeicao(texto or '')[0]
+                    for refeicao, texto in recordatorio.items()}
+    total = sum(por_refeicao.values(), np.zeros(len(NUTRIENTES)))
+    return por_refeicao, total
+
+
+def distribuicao_macros(totais):
+    """% da energia vinda de carboidratos, proteínas e lipídios; None se vazio."""
+    energia = np.asarray(totais[1:4], dtype=np.float64) * KCAL_POR_GRAMA
+    if energia.sum() <= 0:
+        return None
+    return (energia / energia.sum() * 100).tolist()
+
+
+def macros_recordatorio(recordatorio):
+    return distribuicao_macros(analisar_recordatorio(recordatorio)[1])
+
+
+def formatar_totais(totais):
+    kcal, cho, ptn, lip = totais
+    return f"{kcal:.0f} kcal | CHO {cho:.1f} g | PTN {ptn:.1f} g | LIP {lip:.1f} g"
+
+
+RECORDATORIO_EXEMPLO = {
+    'Café da Manhã': "1 xícara de café com leite, 2 fatias de pão de forma com margarina, 1 banana",
+    'Lanche da Manhã': "1 maçã",
+    'Almoço': "4 colheres de sopa de arroz, 1 concha de feijão, 1 bife grelhado, alface e tomate",
+    'Lanche da Tarde': "1 copo de iogurte natural, 3 biscoitos maria",
+    'Jantar': "1 prato de sopa de legumes, 1 fatia de queijo minas",
+    'Ceia': "1 copo de leite desnatado",
+}
+
+
+def benchmark(n=10_000):
+    """Tempo de análise do recordatório, com e sem itens já analisados."""
+    t = tabela()
+    inicio = time.perf_counter()
+    for i in range(n):
+        t._itens.clear()
+        analisar_recordatorio(RECORDATORIO_EXEMPLO)
+    sem_cache = (time.perf_counter() - inicio) / n
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        analisar_recordatorio(RECORDATORIO_EXEMPLO)
+    com_cache = (time.perf_counter() - inicio) / n
+
+    por_refeicao, total = analisar_recordatorio(RECORDATORIO_EXEMPLO)
+    print(f"Alimentos na tabela: {len(t)}")
+    for refeicao, totais in por_refeicao.items():
+        print(f"{refeicao:16} {formatar_totais(totais)}")
+    print(f"{'Total':16} {formatar_totais(total)}")
+    print(f"Recordatório completo: {sem_cache * 1000:.2f} ms "
+          f"({com_cache * 1000:.3f} ms com os itens já analisados)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10_000)
+    else:
+        print(__doc__)
@@ -0,0 +1,137 @@
+"""
+Indicadores agregados de todos os pacientes (visão da enfermaria).
+
+AgregadosCoorte mantém contagens incrementais: histograma do IMC, pacientes
+por classificação do IMC e por risco nutricional e prevalência de cada
+doença. Cada paciente contribui com um resumo (IMC, risco, doenças); ao
+salvar um paciente só a contribuição dele é trocada, sem reler os demais.
+
+A leitura inicial (varrer) usa o catálogo de pacientes/, que só abre os
+arquivos novos ou alterados desde a última vez, ou percorre o banco SQLite
+em lotes. Ela é feita fora da thread da interface.
+"""
+import time
+
+import numpy as np
+
+from catalogo import DOENCAS, IMC, RISCO, CatalogoPacientes, chave_arquivo
+from nutricao import CLASSES_IMC, CLASSES_RISCO, avaliar, classificar_imc
+
+FAIXAS_IMC = np.arange(14, 46)  # Bordas das faixas de 1 kg/m²; extremos vão para a primeira/última
+
+
+def resumo_coorte(dados):
+    """(IMC arredondado ou None, risco, doenças) de uma avaliação completa."""
+    imc = (dados.get('antropometricos') or {}).get('imc')
+    _, risco = avaliar(dados)
+    return (round(imc, 1) if imc else None, risco,
+            tuple((dados.get('clinicos') or {}).get('doencas', [])))
+
+
+class AgregadosCoorte:
+
+    def __init__(self):
+        self.total = 0
+        self.sem_imc = 0
+        self.histograma_imc = np.zeros(len(FAIXAS_IMC) - 1, dtype=np.int64)
+        self.classes_imc = dict.fromkeys(CLASSES_IMC, 0)
+        self.riscos = dict.fromkeys(CLASSES_RISCO, 0)
+        self.doencas = {}
+        self.versao = 0  # Incrementada a cada mudança, para redesenhar só quando preciso
+        self.segundos_varredura = None
+        self._resumos = {}  # chave do paciente -> resumo contado
+
+    def __len__(self):
+        return self.total
+
+    def atualizar(self, chave, resumo):
+        """Troca a contribuição de um paciente. Retorna True se algo mudou."""
+        anterior = self._resumos.get(chave)
+        if anterior == resumo:
+            return False
+        if anterior is not None:
+            self._contar(anterior, -1)
+        self._resumos[chave] = resumo
+        self._contar(resumo, 1)
+        self.versao += 1
+        return True
+
+    def remover(self, chave):
+        anterior = self._resumos.pop(chave, None)
+        if anterior is not None:
+            self._contar(anterior, -1)
+            self.versao += 1
+
+    def _contar(self, resumo, sinal):
+        imc, risco, doencas = resumo
+        self.total += sinal
+        if imc:
+            faixa = np.searchsorted(FAIXAS_IMC, imc, side='right') - 1
+            self.histograma_imc[min(max(faixa, 0), len(self.histograma_imc) - 1)] += sinal
+            self.classes_imc[classificar_imc(imc)] += sinal
+        else:
+            self.sem_imc += sinal
+        if risco in self.riscos:
+            self.riscos[risco] += sinal
+        for doenca in doencas:
+            restantes = self.doencas.get(doenca, 0) + sinal
+            if restantes:
+                self.doencas[doenca] = restantes
+            else:
+                self.doencas.pop(doenca, None)
+
+    # Consultas
+    def percentual(self, quantidade):
+        return quantidade / self.total * 100 if self.total else 0.0
+
+    def prevalencias(self, limite=None):
+        """[(doença, pacientes, % da coorte)], da mais para a menos frequente."""
+        ordenadas = sorted(self.doencas.items(), key=lambda item: (-item[1], item[0]))
+        return [(doenca, quantidade, self.percentual(quantidade))
+                for doenca, quantidade in ordenadas[:limite]]
+
+    # Construção
+    @classmethod
+    def de_catalogo(cls, catalogo):
+        agregados = cls()
+        for arquivo, entrada in catalogo.pacientes.items():
+            agregados.atualizar(chave_arquivo(arquivo),
+                                (entrada[IMC], entrada[RISCO], tuple(entrada[DOENCAS])))
+        return agregados
+
+    @classmethod
+    def de_armazenamento(cls, armazenamento):
+        agregados = cls()
+        for chave, dados in armazenamento.percorrer(
+                ('paciente', 'antropometricos', 'clinicos', 'alimentares')):
+            agregados.atualizar(chave, resumo_coorte(dados))
+        return agregados
+
+
+def reler(armazenamento, chaves):
+    """
+    Resumos dos pacientes indicados, lidos de novo (ex.: alterados por outra
+    estação); None para os que não puderem ser lidos. Chamar fora da thread do Tk.
+    """
+    resumos = {}
+    for chave in chaves:
+        try:
+            resumos[chave] = resumo_coorte(armazenamento.carregar(chave))
+        except (OSError, KeyError, ValueError):
+            resumos[chave] = None
+    return resumos
+
+
+def varrer(armazenamento, pasta_pacientes, pasta_evolucoes):
+    """Agregados de todos os pacientes salvos (chamar fora da thread do Tk)."""
+    inicio = time.perf_counter()
+    if armazenamento.tipo == 'sqlite':
+        agregados = AgregadosCoorte.de_armazenamento(armazenamento)
+    else:
+        # Catálogo próprio desta thread: só relê o que mudou desde o índice salvo
+        catalogo = CatalogoPacientes(pasta_pacientes, pasta_evolucoes)
+        catalogo.atualizar()
+        catalogo.salvar_indice()
+        agregados = AgregadosCoorte.de_catalogo(catalogo)
+    agregados.segundos_varredura = time.perf_counter() - inicio
+    return agregados
@@ -0,0 +1,480 @@
+"""
+Diário de evoluções por paciente, somente de acréscimo.
+
+Cada paciente tem dois arquivos em evoluções/:
+
+    <chave>.jsonl   uma evolução por linha (JSON Lines)
+    <chave>.idx     um registro binário de 16 bytes por evolução:
+                    data (segundos desde a época) e posição da linha no .jsonl
+
+Acrescentar uma evolução é gravar uma linha no fim do .jsonl e 16 bytes no
+fim do .idx. Ler as últimas N visitas é ler os N últimos registros do índice
+e ir direto às linhas correspondentes, sem ler o diário inteiro.
+
+De uma visita para a outra quase tudo se repete (avaliador, circunferências,
+dobras), então só uma evolução a cada INTERVALO_COMPLETA é gravada por
+inteiro ({"data", "evolucao"}); as demais guardam apenas os campos que
+mudaram em relação à anterior ({"data", "mudou", "removidos"}), e o bit
+mais alto da posição no .idx as identifica. Para ler uma evolução, o diário
+volta até a última completa e aplica as diferenças seguintes; ler() sempre
+devolve evoluções completas. Diários antigos, só com evoluções completas,
+continuam válidos.
+
+Se o .idx não bate com o .jsonl (gravação interrompida, linha corrompida),
+ele é reconstruído ao abrir o diário; linhas ilegíveis são separadas em
+<chave>.corrompido em vez de impedir a abertura.
+
+LinhaTempoEvolucao usa as datas do índice para achar, por busca binária, as
+evoluções de uma janela de datas; só essas linhas (e as diferenças desde a
+última evolução completa) são lidas e decodificadas, e as já lidas ficam num
+cache LRU.
+
+Para medir o tamanho em disco e o volume gravado num ano sintético de visitas:
+
+    python diario_evolucao.py --benchmark [visitas]
+"""
+import bisect
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from armazenamento import chave_paciente
+from persistencia import gravar_atomico
+
+REGISTRO_INDICE = struct.Struct('<qQ')
+MARCA_DIFERENCA = 1 << 63  # Na posição do .idx: a linha guarda só o que mudou
+INTERVALO_COMPLETA = 16  # Uma evolução gravada por inteiro a cada 16
+
+
+def diferenca(anterior, atual):
+    """Entrada do diário com o que mudou de anterior para atual (sem a data)."""
+    entrada = {'mudou': {campo: valor for campo, valor in atual.items()
+                         if campo not in anterior or anterior[campo] != valor}}
+    removidos = [campo for campo in anterior if campo not in atual]
+    if removidos:
+        entrada['removidos'] = removidos
+    return entrada
+
+
+def aplicar(anterior, entrada):
+    """Evolução completa a partir da anterior e de uma linha do diário."""
+    if 'evolucao' in entrada:
+        return entrada['evolucao']
+    atual = dict(anterior)
+    atual.update(entrada.get('mudou') or {})
+    for campo in entrada.get('removidos') or ():
+        atual.pop(campo, None)
+    return atual
+
+
+class DiarioEvolucao:
+
+    intervalo_completa = INTERVALO_COMPLETA  # 1 grava todas por inteiro (formato anterior)
+
+    def __init__(self, pasta, nome):
+        self.pasta = pasta
+        self.chave = chave_paciente(nome)
+        self.caminho = os.path.join(pasta, f"{self.chave}.jsonl")
+        self.caminho_indice = os.path.join(pasta, f"{self.chave}.idx")
+        self.caminho_corrompido = os.path.join(pasta, f"{self.chave}.corrompido")
+        self.bytes_gravados = 0  # .jsonl + .idx acrescentados por este objeto
+        self.reconstrucoes = 0  # Vezes que o índice foi refeito (a numeração pode mudar)
+        self._ultima = None  # (número, dados) da última evolução anexada
+        self._verificar_indice()
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.caminho_indice) // REGISTRO_INDICE.size
+        except OSError:
+            return 0
+
+    # Escrita
+    def anexar(self, dados, quando=None):
+        """Acrescenta uma evolução e retorna o seu número (base 0)."""
+        quando = quando or datetime.now()
+        numero = len(self)
+        entrada = {'data': quando.isoformat(timespec='seconds')}
+        marca = 0
+        if numero % self.intervalo_completa:
+            if self._ultima is None or self._ultima[0] != numero - 1:
+                self._ultima = (numero - 1, self.ler(numero - 1)[0]['evolucao'])
+            entrada.update(diferenca(self._ultima[1], dados))
+            marca = MARCA_DIFERENCA
+        else:
+            entrada['evolucao'] = dados
+        linha = json.dumps(entrada, ensure_ascii=False, separators=(',', ':')) + '\n'
+        os.makedirs(self.pasta, exist_ok=True)
+        with open(self.caminho, 'ab') as f:
+            posicao = f.seek(0, os.SEEK_END)
+            f.write(linha.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        # O índice só é gravado depois da linha estar em disco; se faltar o
+        # registro de uma linha, _verificar_indice reconstrói na próxima abertura
+        with open(self.caminho_indice, 'ab') as f:
+            f.write(REGISTRO_INDICE.pack(int(quando.timestamp()), posicao | marca))
+        self.bytes_gravados += len(linha.encode('utf-8')) + REGISTRO_INDICE.size
+        self._ultima = (numero, dict(dados))
+        return numero
+
+    # Leitura
+    def indice(self, inicio=0, fim=None):
+        """Lista de (timestamp, posição) das evoluções [inicio, fim)."""
+        return [(quando, posicao & ~MARCA_DIFERENCA)
+                for quando, posicao in self._registros(inicio, fim)]
+
+    def _registros(self, inicio=0, fim=None):
+        # Registros do .idx como gravados (posição com MARCA_DIFERENCA)
+        total = len(self)
+        fim = total if fim is None else min(fim, total)
+        if inicio >= fim:
+            return []
+        with open(self.caminho_indice, 'rb') as f:
+            f.seek(inicio * REGISTRO_INDICE.size)
+            bruto = f.read((fim - inicio) * REGISTRO_INDICE.size)
+        return list(REGISTRO_INDICE.iter_unpack(bruto))
+
+    def ler(self, inicio=0, fim=None):
+        """
+        Lê as evoluções [inicio, fim), indo direto às linhas pelo índice e
+        voltando até a última evolução completa antes de inicio. Uma linha
+        ilegível no caminho faz o índice ser reconstruído (a linha vai para
+        .corrompido) e a leitura é refeita, já com a nova numeração.
+        """
+        try:
+            return self._ler(inicio, fim)
+        except (ValueError, KeyError, TypeError):
+            self.reconstruir_indice()
+            return self._ler(inicio, fim)
+
+    def _ler(self, inicio, fim):
+        registros = self._registros(inicio, fim)
+        if not registros:
+            return []
+        base = inicio
+        while registros[0][1] & MARCA_DIFERENCA and base > 0:
+            passo = min(base, INTERVALO_COMPLETA)
+            registros = self._registros(base - passo, base) + registros
+            base -= passo
+        # Começa da evolução completa mais próxima de inicio
+        completas = [k for k in range(inicio - base + 1) if not registros[k][1] & MARCA_DIFERENCA]
+        if completas:
+            registros = registros[completas[-1]:]
+            base += completas[-1]
+        with open(self.caminho, 'rb') as f:
+            f.seek(registros[0][1] & ~MARCA_DIFERENCA)
+            # As linhas do intervalo são contíguas no diário
+            entradas = [json.loads(f.readline()) for _ in registros]
+        evolucoes, atual = [], {}
+        for entrada in entradas:
+            atual = aplicar(atual, entrada)
+            evolucoes.append({'data': entrada['data'], 'evolucao': atual})
+        return evolucoes[inicio - base:]
+
+    def ultimos(self, n):
+        """As últimas n evoluções, da mais antiga para a mais recente."""
+        return self.ler(max(0, len(self) - n))
+
+    def todas(self):
+        return self.ler()
+
+    def reescrever(self, entradas):
+        """
+        Substitui o diário inteiro (usado ao intercalar evoluções antigas).
+        entradas: evoluções completas ({'data', 'evolucao'}), na nova ordem.
+        """
+        linhas, registros, posicao, anterior = [], [], 0, {}
+        for numero, entrada in enumerate(entradas):
+            gravada = {'data': entrada['data']}
+            marca = 0
+            if numero % self.intervalo_completa:
+                gravada.update(diferenca(anterior, entrada['evolucao']))
+                marca = MARCA_DIFERENCA
+            else:
+                gravada['evolucao'] = entrada['evolucao']
+            anterior = entrada['evolucao']
+            linha = (json.dumps(gravada, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            quando = datetime.fromisoformat(entrada['data'])
+            registros.append(REGISTRO_INDICE.pack(int(quando.timestamp()), posicao | marca))
+            linhas.append(linha)
+            posicao += len(linha)
+        gravar_atomico(self.caminho, b''.join(linhas))
+        gravar_atomico(self.caminho_indice, b''.join(registros))
+        self._ultima = None
+
+    # Consistência do índice
+    def _verificar_indice(self):
+        try:
+            tamanho = os.path.getsize(self.caminho)
+        except OSError:
+            return
+        registros = self.indice(len(self) - 1) if len(self) else []
+        if registros and registros[-1][1] < tamanho:
+            with open(self.caminho, 'rb') as f:
+                f.seek(registros[-1][1])
+                f.readline()
+                if f.tell() == tamanho:
+                    return
+        elif not registros and tamanho == 0:
+            return
+        self.reconstruir_indice()
+
+    def reconstruir_indice(self):
+        """
+        Refaz o .idx lendo o .jsonl do início ao fim. Linhas que não se
+        decodificam vão para <chave>.corrompido, junto com as diferenças
+        seguintes que dependiam delas (até a próxima evolução completa).
+        """
+        registros, validas, descartadas = [], [], []
+        posicao = 0
+        sem_base = False  # A evolução anterior foi descartada
+        with open(self.caminho, 'rb') as f:
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    break  # Linha incompleta (gravação interrompida): descarta
+                try:
+                    entrada = json.loads(linha)
+                    completa = 'evolucao' in entrada
+                    quando = int(datetime.fromisoformat(entrada['data']).timestamp())
+                except (ValueError, TypeError, KeyError):
+                    sem_base = True
+                    descartadas.append(linha)
+                    continue
+                if sem_base and not completa:
+                    descartadas.append(linha)
+                    continue
+                sem_base = False
+                marca = 0 if completa else MARCA_DIFERENCA
+                registros.append(REGISTRO_INDICE.pack(quando, posicao | marca))
+                validas.append(linha)
+                posicao += len(linha)
+            tamanho = f.tell()
+        if descartadas:
+            with open(self.caminho_corrompido, 'ab') as f:
+                f.write(b''.join(descartadas))
+            gravar_atomico(self.caminho, b''.join(validas))
+        elif posicao < tamanho:
+            with open(self.caminho, 'r+b') as f:
+                f.truncate(posicao)
+        gravar_atomico(self.caminho_indice, b''.join(registros))
+        self._ultima = None
+        self.reconstrucoes += 1
+
+
+def numero(valor):
+    """Valor digitado num campo de evolução ('70,5', '70.5', 70.5) -> float; NaN se vazio."""
+    try:
+        return float(str(valor).replace(',', '.'))
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class LinhaTempoEvolucao:
+    """
+    Evoluções de um paciente ordenadas por data, lidas sob demanda.
+
+    As datas vêm do .idx (lido uma vez, 16 bytes por visita); as evoluções
+    decodificadas ficam num cache LRU de até limite entradas. lidas conta as
+    linhas lidas do .jsonl, para medir o cache.
+    """
+
+    def __init__(self, diario, limite=256):
+        self.diario = diario
+        self.limite = limite
+        self.lidas = 0
+        self._cache = OrderedDict()  # número da evolução no diário -> dados
+        self.recarregar()
+
+    def __len__(self):
+        return len(self.datas)
+
+    def recarregar(self):
+        """Relê o índice (depois de anexar uma evolução); o cache continua válido."""
+        datas = [quando for quando, _ in self.diario.indice()]
+        # Normalmente o diário já está em ordem cronológica; se não estiver
+        # (relógio ajustado entre duas visitas), ordem leva da posição
+        # ordenada ao número da evolução no diário
+        self.ordem = sorted(range(len(datas)), key=datas.__getitem__)
+        self.datas = [datas[i] for i in self.ordem]
+
+    def intervalo(self, inicio=None, fim=None):
+        """Posições [i, j) das evoluções com inicio <= data <= fim (timestamps)."""
+        i = 0 if inicio is None else bisect.bisect_left(self.datas, inicio)
+        j = len(self.datas) if fim is None else bisect.bisect_right(self.datas, fim)
+        return i, max(i, j)
+
+    def evolucoes(self, inicio=None, fim=None):
+        """[(timestamp, dados da evolução)] da janela, da mais antiga à mais recente."""
+        i, j = self.intervalo(inicio, fim)
+        numeros = self.ordem[i:j]
+        reconstrucoes = self.diario.reconstrucoes
+        lidas = {}
+        faltando = sorted(n for n in numeros if n not in self._cache)
+        # Trechos contíguos do diário são lidos de uma vez
+        while faltando:
+            k = 1
+            while k < len(faltando) and faltando[k] == faltando[0] + k:
+                k += 1
+            for n, entrada in enumerate(self.diario.ler(faltando[0], faltando[0] + k),
+                                        faltando[0]):
+                lidas[n] = entrada.get('evolucao') or {}
+            self.lidas += k
+            faltando = faltando[k:]
+        if self.diario.reconstrucoes != reconstrucoes:
+            # Linhas corrompidas foram separadas e a numeração mudou: relê tudo
+            self._cache.clear()
+            self.recarregar()
+            return self.evolucoes(inicio, fim)
+
+        resultado = []
+        for quando, n in zip(self.datas[i:j], numeros):
+            if n in lidas:
+                dados = self._cache[n] = lidas[n]
+            else:
+                dados = self._cache[n]
+                self._cache.move_to_end(n)
+            resultado.append((quando, dados))
+        while len(self._cache) > self.limite:
+            self._cache.popitem(last=False)
+        return resultado
+
+    def serie(self, campos, inicio=None, fim=None):
+        """(timestamps, {campo: [valor ou NaN, ...]}) dos campos numéricos da janela."""
+        evolucoes = self.evolucoes(inicio, fim)
+        return ([quando for quando, _ in evolucoes],
+                {campo: [numero(dados.get(campo)) for _, dados in evolucoes] for campo in campos})
+
+
+def data_do_arquivo(nome_arquivo):
+    """evolucao_<chave>_<AAAAMMDD>_<HHMMSS>.json -> (chave, datetime)"""
+    base = nome_arquivo[len('evolucao_'):-len('.json')]
+    chave, dia, hora = base.rsplit('_', 2)
+    return chave, datetime.strptime(f"{dia}_{hora}", "%Y%m%d_%H%M%S")
+
+
+def compactar_pasta(pasta):
+    """
+    Incorpora os arquivos avulsos evolucao_<nome>_<data>.json aos diários de
+    cada paciente, em ordem cronológica, e apaga os avulsos incorporados.
+    Retorna (arquivos incorporados, pacientes, arquivos ignorados).
+    """
+    por_paciente = {}
+    ignorados = []
+    for entrada in os.scandir(pasta):
+        if not (entrada.name.startswith('evolucao_') and entrada.name.endswith('.json')):
+            continue
+        try:
+            chave, quando = data_do_arquivo(entrada.name)
+        except ValueError:
+            ignorados.append(entrada.name)
+            continue
+        por_paciente.setdefault(chave, []).append((quando, entrada.path))
+
+    incorporados = 0
+    for chave, arquivos in por_paciente.items():
+        diario = DiarioEvolucao(pasta, chave)
+        novas, lidos = [], []
+        for quando, caminho in sorted(arquivos):
+            try:
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    dados = json.load(f)
+            except (OSError, ValueError):
+                ignorados.append(os.path.basename(caminho))
+                continue
+            novas.append({'data': quando.isoformat(timespec='seconds'), 'evolucao': dados})
+            lidos.append(caminho)
+        if not novas:
+            continue
+
+        ultimo = diario.indice(len(diario) - 1) if len(diario) else []
+        if ultimo and datetime.fromisoformat(novas[0]['data']).timestamp() < ultimo[0][0]:
+            # Há evoluções avulsas mais antigas que o diário: intercala por data
+            diario.reescrever(sorted(diario.todas() + novas, key=lambda e: e['data']))
+        else:
+            for entrada in novas:
+                diario.anexar(entrada['evolucao'], datetime.fromisoformat(entrada['data']))
+        for caminho in lidos:
+            os.remove(caminho)
+        incorporados += len(lidos)
+    return incorporados, len(por_paciente), ignorados
+
+
+def _visitas_sinteticas(n, semente=0):
+    """Um ano de evoluções de um residente: o peso muda quase todo dia, o resto raramente."""
+    import random
+    gerador = random.Random(semente)
+    notas = ["Aceitou bem a dieta, sem queixas.", "Refere plenitude gástrica após o almoço.",
+             "Recusou parte do jantar; reforçar oferta de lanches.",
+             "Boa aceitação do suplemento oral.", "Edema discreto em membros inferiores."]
+    peso, altura = 64.0, 1.60
+    medidas = {'circ_braco_evo': 27.0, 'circ_musc_braco_evo': 22.5, 'circ_panturrilha_evo': 32.0,
+               'circ_cintura_evo': 88.0, 'circ_quadril_evo': 99.0, 'circ_abdominal_evo': 92.0,
+               'dobra_triceps_evo': 14.0, 'dobra_biceps_evo': 7.0, 'dobra_subescapular_evo': 15.0,
+               'dobra_suprailiaca_evo': 13.0, 'dobra_abdominal_evo': 20.0,
+               'dobra_peitoral_evo': 10.0, 'dobra_axilar_evo': 11.0}
+    visitas = []
+    for dia in range(n):
+        peso = round(peso + gerador.gauss(0, 0.15), 1)
+        if dia % 30 == 0:  # Reavaliação antropométrica mensal
+            medidas = {campo: round(valor + gerador.gauss(0, 0.3), 1)
+                       for campo, valor in medidas.items()}
+        visita = {
+            'peso_evo': f"{peso:.1f}".replace('.', ','),
+            'imc_evo': f"{peso / altura ** 2:.1f}".replace('.', ','),
+            'estado_nutri_evo': "Eutrofia" if peso > 60 else "Risco nutricional",
+            'adesao_dieta_evo': "Boa" if dia % 45 < 40 else "Regular",
+            'apetite_evo': "Preservado" if dia % 60 < 50 else "Diminuído",
+            'evolucao_clinica_evo': notas[dia // 7 % len(notas)],
+            'nome_avaliador_evo': "Ana Paula" if dia // 7 % 2 else "Carlos Lima",
+        }
+        visita.update({campo: f"{valor:.1f}".replace('.', ',') for campo, valor in medidas.items()})
+        visitas.append(visita)
+    return visitas
+
+
+def benchmark(visitas=365):
+    """Tamanho em disco, volume gravado e tempo de leitura de um ano de visitas diárias."""
+    from datetime import timedelta
+    dados = _visitas_sinteticas(visitas)
+    inicio_ano = datetime(2025, 1, 1, 9, 0)
+    print(f"{visitas} visitas diárias sintéticas, {len(dados[0])} campos por evolução")
+    with tempfile.TemporaryDirectory() as pasta:
+        for rotulo, intervalo in (("Todas completas (formato anterior)", 1),
+                                  (f"Diferenças, completa a cada {INTERVALO_COMPLETA}",
+                                   INTERVALO_COMPLETA)):
+            diario = DiarioEvolucao(pasta, f"benchmark_{intervalo}")
+            diario.intervalo_completa = intervalo
+            inicio = time.perf_counter()
+            for dia, visita in enumerate(dados):
+                diario.anexar(visita, inicio_ano + timedelta(days=dia))
+            escrita = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            ultima = diario.ultimos(1)[0]['evolucao']
+            leitura_ultima = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            todas = [entrada['evolucao'] for entrada in diario.todas()]
+            leitura_ano = time.perf_counter() - inicio
+            assert todas == dados and ultima == dados[-1]
+
+            disco = os.path.getsize(diario.caminho) + os.path.getsize(diario.caminho_indice)
+            print(f"\n{rotulo}:")
+            print(f"  em disco:        {disco / 1024:8.1f} KB (.jsonl + .idx)")
+            print(f"  gravado:         {diario.bytes_gravados / 1024:8.1f} KB "
+                  f"({diario.bytes_gravados / visitas:.0f} bytes por visita)")
+            print(f"  anexar:          {escrita / visitas * 1000:8.2f} ms por visita (com fsync)")
+            print(f"  ler a última:    {leitura_ultima * 1000:8.2f} ms")
+            print(f"  ler o ano todo:  {leitura_ano * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 365)
+    else:
+        print(__doc__)
@@ -0,0 +1,215 @@
+"""
+Exportação da coorte em colunas, para pesquisa e auditoria.
+
+Gera, numa pasta de saída, uma tabela larga com uma linha por paciente
+(identificação, medidas e indicadores antropométricos, exames laboratoriais,
+status, risco e doenças):
+
+    coorte.csv   # a tabela inteira, separada por ponto e vírgula
+    coorte.npz   # um array por coluna (float64 nas numéricas, NaN = vazio)
+
+A exportação é incremental: o estado (.exportacao.json) guarda a linha já
+extraída de cada paciente junto com a versão dele no armazenamento (mtime e
+tamanho do JSON, ou a data da última gravação no SQLite). Só os pacientes
+novos ou alterados desde a última exportação são lidos, em lotes distribuídos
+entre processos; os removidos saem da tabela.
+
+Uso: python app.py --exportar-coorte PASTA_SAIDA [--processos N]
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from armazenamento import criar_armazenamento
+from diario_evolucao import numero
+from formulario import CAMPOS_ANTROPOMETRIA, CAMPOS_EXAMES
+from persistencia import gravar_atomico
+
+VERSAO = 1
+TAMANHO_LOTE = 200
+ESTADO = '.exportacao.json'
+
+COLUNAS_TEXTO = ['chave', 'nome', 'registro', 'sexo', 'data_nascimento', 'data_admissao',
+                 'data_medicao', 'classificacao_imc', 'classificacao_rcq', 'status', 'risco',
+                 'doencas']
+MEDIDAS = [campo for _, campo in CAMPOS_ANTROPOMETRIA if campo != 'data_medicao']
+INDICADORES = ['imc', 'rcq', 'perda_peso_perc', 'cmb', 'amb']
+EXAMES = [campo for _, campo in CAMPOS_EXAMES]
+COLUNAS_NUMERICAS = MEDIDAS + INDICADORES + EXAMES + ['n_doencas']
+COLUNAS = COLUNAS_TEXTO + COLUNAS_NUMERICAS
+
+
+def linha_paciente(chave, dados):
+    """Valores de COLUNAS para uma avaliação (texto; float ou None nas numéricas)."""
+    from nutricao import avaliar
+    paciente = dados.get('paciente') or {}
+    antropometricos = dados.get('antropometricos') or {}
+    clinicos = dados.get('clinicos') or {}
+    doencas = clinicos.get('doencas') or []
+    status, risco = avaliar(dados)
+    texto = dict(paciente, **antropometricos, status=status, risco=risco,
+                 doencas='; '.join(doencas), chave=chave)
+    linha = [str(texto.get(coluna) or '') for coluna in COLUNAS_TEXTO]
+    for coluna in COLUNAS_NUMERICAS:
+        if coluna == 'n_doencas':
+            valor = float(len(doencas))
+        else:
+            valor = numero((clinicos if coluna in EXAMES else antropometricos).get(coluna))
+        linha.append(None if valor != valor else valor)  # NaN vira vazio no estado (JSON)
+    return linha
+
+
+def extrair(armazenamento, chaves):
+    """Lê e extrai um lote de pacientes. Retorna [(chave, linha ou None, erro ou None)]."""
+    extraidas = []
+    for chave in chaves:
+        try:
+            extraidas.append((chave, linha_paciente(chave, armazenamento.carregar(chave)), None))
+        except Exception as e:
+            extraidas.append((chave, None, f"{type(e).__name__}: {e}"))
+    return extraidas
+
+
+_armazenamentos = {}  # (tipo, pasta) -> armazenamento aberto por este processo
+
+
+def extrair_lote(tipo, pasta_pacientes, chaves):
+    """extrair() num processo de trabalho, que abre o próprio armazenamento."""
+    if (tipo, pasta_pacientes) not in _armazenamentos:
+        _armazenamentos[tipo, pasta_pacientes] = criar_armazenamento(tipo, pasta_pacientes)
+    return extrair(_armazenamentos[tipo, pasta_pacientes], chaves)
+
+
+class ResumoExportacao:
+
+    def __init__(self):
+        self.pacientes = 0
+        self.lidos = 0
+        self.removidos = 0
+        self.falhas = []  # (chave, erro)
+        self.segundos_leitura = 0.0
+        self.segundos = 0.0
+        self.bytes_gravados = 0
+
+    def __str__(self):
+        vazao = self.lidos / self.segundos_leitura if self.segundos_leitura else 0
+        texto = (f"{self.pacientes} pacientes exportados em {self.segundos:.2f} s: "
+                 f"{self.lidos} lidos ({vazao:.0f} pacientes/s), {self.removidos} removidos, "
+                 f"{len(self.falhas)} falhas")
+        if self.bytes_gravados:
+            mb = self.bytes_gravados / 1024 / 1024
+            texto += f" | {mb:.1f} MB gravados"
+        else:
+            texto += " | nada mudou, arquivos mantidos"
+        return texto
+
+
+def carregar_estado(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if estado.get('versao') != VERSAO or estado.get('colunas') != COLUNAS:
+        return {}  # Colunas mudaram: exporta tudo de novo
+    return estado.get('pacientes', {})
+
+
+def gravar_csv(caminho, linhas):
+    """Escreve o CSV linha a linha num temporário e o troca pelo anterior. Retorna os bytes."""
+    pasta = os.path.dirname(caminho)
+    descritor, temporario = tempfile.mkstemp(prefix='.tmp_', dir=pasta)
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f, delimiter=';')
+            escritor.writerow(COLUNAS)
+            for linha in linhas:
+                escritor.writerow('' if valor is None else valor for valor in linha)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return os.path.getsize(caminho)
+
+
+def gravar_npz(caminho, linhas):
+    """Um array por coluna, montado direto das linhas. Retorna os bytes gravados."""
+    import numpy as np
+    n = len(linhas)
+    colunas = {}
+    for i, coluna in enumerate(COLUNAS):
+        if coluna in COLUNAS_NUMERICAS:
+            colunas[coluna] = np.fromiter((np.nan if linha[i] is None else linha[i]
+                                           for linha in linhas), dtype=np.float64, count=n)
+        else:
+            colunas[coluna] = np.array([linha[i] for linha in linhas], dtype=str)
+    buffer = io.BytesIO()
+    np.savez(buffer, **colunas)
+    return gravar_atomico(caminho, buffer.getvalue())
+
+
+def exportar_coorte(armazenamento, pasta_pacientes, pasta_saida, processos=None,
+                    tamanho_lote=TAMANHO_LOTE, ao_progresso=None):
+    """
+    Atualiza coorte.csv e coorte.npz em pasta_saida. ao_progresso(lidos,
+    total a ler) é chamada a cada lote extraído. processos=1 lê na própria
+    thread. Retorna um ResumoExportacao.
+    """
+    inicio = time.perf_counter()
+    resumo = ResumoExportacao()
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminho_estado = os.path.join(pasta_saida, ESTADO)
+    estado = carregar_estado(caminho_estado)  # chave -> [versão, linha]
+
+    versoes = armazenamento.versoes()
+    removidos = set(estado) - set(versoes)
+    for chave in removidos:
+        del estado[chave]
+    resumo.removidos = len(removidos)
+    alterados = sorted(chave for chave, versao in versoes.items()
+                       if chave not in estado or estado[chave][0] != versao)
+    saidas = [os.path.join(pasta_saida, nome) for nome in ('coorte.csv', 'coorte.npz')]
+
+    def incorporar(extraidas):
+        for chave, linha, erro in extraidas:
+            if erro is None:
+                estado[chave] = [versoes[chave], linha]
+                resumo.lidos += 1
+            else:
+                estado.pop(chave, None)
+                resumo.falhas.append((chave, erro))
+        if ao_progresso is not None:
+            ao_progresso(resumo.lidos + len(resumo.falhas), len(alterados))
+
+    inicio_leitura = time.perf_counter()
+    lotes = [alterados[i:i + tamanho_lote] for i in range(0, len(alterados), tamanho_lote)]
+    if processos == 1 or len(lotes) <= 1:
+        for lote in lotes:
+            incorporar(extrair(armazenamento, lote))
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = [executor.submit(extrair_lote, armazenamento.tipo, pasta_pacientes, lote)
+                       for lote in lotes]
+            for futuro in as_completed(futuros):
+                incorporar(futuro.result())
+    resumo.segundos_leitura = time.perf_counter() - inicio_leitura
+    resumo.pacientes = len(estado)
+
+    if alterados or removidos or not all(os.path.exists(caminho) for caminho in saidas):
+        linhas = [estado[chave][1] for chave in sorted(estado)]
+        resumo.bytes_gravados += gravar_csv(saidas[0], linhas)
+        resumo.bytes_gravados += gravar_npz(saidas[1], linhas)
+        resumo.bytes_gravados += gravar_atomico(caminho_estado, json.dumps(
+            {'versao': VERSAO, 'colunas': COLUNAS, 'pacientes': estado},
+            ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    resumo.segundos = time.perf_counter() - inicio
+    return resumo
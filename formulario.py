@@ -0,0 +1,133 @@
+"""
+Modelo dos campos do formulário, ligado aos widgets por variáveis do Tk.
+
+Cada campo tem uma StringVar (ou BooleanVar, nas caixas de seleção)
+identificada pelo caminho do valor nos dados do paciente:
+('paciente', 'nome'), ('paciente', 'anamnese', 'queixa_principal'),
+('clinicos', 'doencas', 'Diabetes')... Entries e Comboboxes são criados com
+textvariable=modelo.var(caminho): abrir um paciente é só atribuir as
+variáveis (carregar), sem apagar e reinserir o texto de cada widget, e os
+widgets são redesenhados juntos quando o Tk fica ocioso. As abas ainda não
+construídas não têm variáveis: elas leem os dados atuais ao serem criadas.
+
+Um Text não aceita variável; ele é registrado com vincular_texto e
+atualizado na mesma passada de carregar.
+"""
+import tkinter as tk
+
+# (rótulo, campo) das abas Identificação e Antropometria; os mesmos campos
+# são as colunas aceitas na importação de planilhas (importacao.py)
+CAMPOS_IDENTIFICACAO = [
+    ('Nome Completo:', 'nome'),
+    ('Data de Nascimento:', 'data_nascimento'),
+    ('Idade:', 'idade'),
+    ('Sexo:', 'sexo'),
+    ('Nº de Registro:', 'registro'),
+    ('Telefone:', 'telefone'),
+    ('Email:', 'email'),
+    ('Endereço:', 'endereco'),
+    ('Profissão:', 'profissao'),
+    ('Contato de Emergência :', 'contato_emergencia'),
+    ('Telefone de Emergência :', 'telefone_emergencia'),
+    ('Estado Civil:', 'estado_civil'),
+    ('Escolaridade:', 'escolaridade'),
+    ('Data da Admissão:', 'data_admissao'),
+]
+CAMPOS_ANTROPOMETRIA = [
+    ('Peso Atual (kg):', 'peso_atual'),
+    ('Altura (cm):', 'altura'),
+    ('Peso Habitual (kg):', 'peso_habitual'),
+    ('Peso Estimado (kg):', 'peso_estimado'),
+    ('Peso Ideal (kg):', 'peso_ideal'),
+    ('Altura Estimada (cm):', 'altura_estimada'),
+    ('Altura do Joelho (cm):', 'altura_joelho'),
+    ('Circunferência do Braço (cm):', 'circ_braco'),
+    ('Circunferência Muscular do Braço (cm):', 'circ_musc_braco'),
+    ('Circunferência da Panturrilha (cm):', 'circ_panturrilha'),
+    ('Circunferência da Cintura (cm):', 'circ_cintura'),
+    ('Circunferência do Quadril (cm):', 'circ_quadril'),
+    ('Circunferência Abdominal (cm):', 'circ_abdominal'),
+    ('Dobra Cutânea Tricipital (mm):', 'dobra_triceps'),
+    ('Dobra Cutânea Bicipital (mm):', 'dobra_biceps'),
+    ('Dobra Cutânea Subescapular (mm):', 'dobra_subescapular'),
+    ('Dobra Cutânea Suprailiaca (mm):', 'dobra_suprailiaca'),
+    ('Dobra Cutânea Abdominal (mm):', 'dobra_abdominal'),
+    ('Dobra Cutânea Peitoral (mm):', 'dobra_peitoral'),
+    ('Dobra Cutânea Axilar (mm):', 'dobra_axilar'),
+    ('Percentual de Gordura (%):', 'percentual_gordura'),
+    ('Data da Medição:', 'data_medicao'),
+]
+# Exames laboratoriais da aba Avaliação Clínica (também exportados por exportacao.py)
+CAMPOS_EXAMES = [
+    ('Glicemia (mg/dL):', 'glicemia'),
+    ('Hemoglobina (g/dL):', 'hemoglobina'),
+    ('Colesterol Total (mg/dL):', 'colesterol_total'),
+    ('HDL (mg/dL):', 'hdl'),
+    ('LDL (mg/dL):', 'ldl'),
+    ('Triglicerídeos (mg/dL):', 'triglicerideos'),
+    ('Ureia (mg/dL):', 'ureia'),
+    ('Creatinina (mg/dL):', 'creatinina'),
+    ('Albumina (g/dL):', 'albumina'),
+    ('Proteínas Totais (g/dL):', 'proteinas_totais'),
+    ('Pré-albumina (mg/dL):', 'pre_albumina'),
+    ('Ferro (µg/dL):', 'ferro'),
+    ('Transferrina (mg/dL):', 'transferrina'),
+    ('Ferritina (ng/mL):', 'ferritina'),
+    ('Vitamina B12 (pg/mL):', 'vitamin_b12'),
+    ('Folato (ng/mL):', 'folato'),
+]
+
+
+def obter(dados, caminho, booleano=False):
+    """Valor de caminho em dados ('' se ausente); booleano: se o último item está na lista."""
+    if booleano:
+        *caminho, item = caminho
+    valor = dados
+    for chave in caminho:
+        valor = valor.get(chave) if isinstance(valor, dict) else None
+        if valor is None:
+            break
+    if booleano:
+        return item in (valor or [])
+    return '' if valor is None else str(valor)
+
+
+class ModeloFormulario:
+
+    def __init__(self, master, fonte):
+        """fonte(): dict seção -> dados atuais, lido ao criar ou recarregar os campos."""
+        self.master = master
+        self.fonte = fonte
+        self.vars = {}    # caminho -> (variável, booleano)
+        self.textos = {}  # caminho -> tk.Text
+
+    def var(self, caminho, booleano=False):
+        """Variável do campo, criada com o valor atual na primeira chamada."""
+        if caminho not in self.vars:
+            valor = obter(self.fonte(), caminho, booleano)
+            classe = tk.BooleanVar if booleano else tk.StringVar
+            self.vars[caminho] = (classe(self.master, value=valor), booleano)
+        return self.vars[caminho][0]
+
+    def vincular_texto(self, caminho, widget):
+        widget.insert('1.0', obter(self.fonte(), caminho))
+        self.textos[caminho] = widget
+        return widget
+
+    def carregar(self, secoes=None):
+        """
+        Copia os dados atuais para todos os campos já criados (ou só para os
+        das secoes indicadas). Retorna quantos campos foram atualizados.
+        """
+        dados = self.fonte()
+        atualizados = 0
+        for caminho, (var, booleano) in self.vars.items():
+            if secoes is None or caminho[0] in secoes:
+                var.set(obter(dados, caminho, booleano))
+                atualizados += 1
+        for caminho, widget in self.textos.items():
+            if secoes is None or caminho[0] in secoes:
+                widget.delete('1.0', tk.END)
+                widget.insert('1.0', obter(dados, caminho))
+                atualizados += 1
+        return atualizados
@@ -0,0 +1,486 @@
+"""
+Gráficos do dashboard nutricional.
+
+PainelGraficos desenha os quatro gráficos numa figura 2x2 a partir apenas dos
+dados da avaliação, sem consultar widgets. Os artistas (linha do peso,
+barras, rótulos) são criados uma única vez; cada atualização só troca os
+dados deles, sem ax.clear() nem recriar o gráfico. Os relatórios em PDF não
+usam o matplotlib: os mesmos gráficos (com as constantes deste módulo) são
+desenhados em vetor por graficos_pdf, e por isso o matplotlib só é
+importado dentro dos métodos.
+
+A linha de evolução do peso nunca recebe mais pontos do que o eixo tem
+pixels: reduzir_min_max guarda o menor e o maior peso de cada faixa de
+tempo, o que preserva picos e quedas mesmo com milhares de pesagens.
+NavegacaoPeso acrescenta zoom (roda do mouse) e arraste com blitting.
+PainelCoorte mostra os indicadores agregados de todos os pacientes e
+PainelEvolucao, as medidas das evoluções de um paciente ao longo das visitas.
+AgendadorRenderizacao agrupa pedidos de redesenho próximos num só.
+"""
+import numpy as np
+
+from coorte import FAIXAS_IMC
+from nutricao import CLASSES_RISCO
+from serie_historica import reduzir_min_max, tempo_local
+
+ESTILO = 'seaborn-v0_8'
+
+# Conteúdo dos gráficos do dashboard (tela e PDF)
+GRUPOS_FREQUENCIA = 5  # Primeiros 5 grupos
+FREQUENCIAS_EXEMPLO = [3, 5, 4, 2, 6]  # Valores exemplo convertidos para números
+INDICADORES = ['IMC', 'RCQ', 'Perda Peso %']
+VALORES_IDEAIS = [25, 0.85, 0]  # Valores de referência
+MACROS = ['Carboidratos', 'Proteínas', 'Lipídios']
+
+PONTOS_COM_MARCADOR = 100  # Acima disso a linha de peso é desenhada sem marcadores
+DOENCAS_COORTE = 10  # Doenças mostradas na prevalência da coorte
+
+# Campos da evolução nutricional na linha do tempo: um gráfico para cada
+# medida e um para todas as dobras cutâneas
+MEDIDAS_EVOLUCAO = [('peso_evo', 'Peso (kg)'), ('imc_evo', 'IMC (kg/m²)'),
+                    ('circ_panturrilha_evo', 'Circunferência da Panturrilha (cm)')]
+DOBRAS_EVOLUCAO = [('dobra_triceps_evo', 'Tricipital'), ('dobra_biceps_evo', 'Bicipital'),
+                   ('dobra_subescapular_evo', 'Subescapular'),
+                   ('dobra_suprailiaca_evo', 'Suprailíaca'), ('dobra_abdominal_evo', 'Abdominal'),
+                   ('dobra_peitoral_evo', 'Peitoral'), ('dobra_axilar_evo', 'Axilar')]
+CAMPOS_EVOLUCAO = [campo for campo, _ in MEDIDAS_EVOLUCAO + DOBRAS_EVOLUCAO]
+
+
+def _aviso(ax, texto):
+    return ax.text(0.5, 0.5, texto, ha='center', va='center', transform=ax.transAxes)
+
+
+class PainelGraficos:
+
+    def __init__(self, fig, eixos, cores):
+        self.fig = fig
+        self.ax1, self.ax2, self.ax3, self.ax4 = eixos
+        self.cores = cores
+        self._grupos = None
+        # Série completa do peso (dias do matplotlib, kg); a linha mostra uma redução
+        self.x_peso = np.array([])
+        self.y_peso = np.array([], dtype=np.float32)
+
+        # Gráfico 1: Evolução do Peso
+        self.linha_peso, = self.ax1.plot(np.array([], dtype='datetime64[s]'),
+                                         np.array([], dtype=np.float32),
+                                         marker='o', color=cores['secundaria'], linewidth=2)
+        self.ax1.set_title('Evolução do Peso', fontweight='bold')
+        self.ax1.set_ylabel('Peso (kg)')
+        self.ax1.grid(True, alpha=0.3)
+        self.aviso_peso = _aviso(self.ax1, 'Sem dados históricos')
+        # Zoom, arraste ou mudança de tamanho: reamostra a janela visível
+        self.ax1.callbacks.connect('xlim_changed', lambda ax: self.reamostrar_peso())
+
+        # Gráfico 2: Distribuição de Macronutrientes (% da energia do recordatório)
+        cores_macro = [cores['sucesso'], cores['info'], cores['alerta']]
+        self.fatias_macros, self.rotulos_macros, self.percentuais_macros = self.ax2.pie(
+            [1] * len(MACROS), labels=MACROS, colors=cores_macro, autopct='%1.1f%%', startangle=90)
+        self.ax2.set_title('Distribuição de Macronutrientes', fontweight='bold')
+        self.aviso_macros = _aviso(self.ax2, 'Preencha o recordatório\n24h')
+
+        # Gráfico 3: Frequência Alimentar
+        x = np.arange(GRUPOS_FREQUENCIA)
+        self.barras_frequencia = self.ax3.bar(x, FREQUENCIAS_EXEMPLO,
+                                              color=cores['secundaria'], alpha=0.7)
+        self.rotulos_frequencia = [
+            self.ax3.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 0.1,
+                          f'{freq}x', ha='center', va='bottom')
+            for bar, freq in zip(self.barras_frequencia, FREQUENCIAS_EXEMPLO)]
+        self.ax3.set_xticks(x)
+        self.ax3.tick_params(axis='x', rotation=45)
+        self.ax3.set_title('Frequência de Consumo por Grupo', fontweight='bold')
+        self.aviso_frequencia = _aviso(self.ax3, 'Preencha a avaliação\nalimentar')
+
+        # Gráfico 4: Indicadores Antropométricos
+        x = np.arange(len(INDICADORES))
+        width = 0.35
+        self.barras_atuais = self.ax4.bar(x - width/2, [0] * len(INDICADORES), width,
+                                          label='Atual', color=cores['secundaria'], alpha=0.7)
+        self.barras_ideais = self.ax4.bar(x + width/2, VALORES_IDEAIS, width,
+                                          label='Referência', color=cores['sucesso'], alpha=0.7)
+        self.rotulos_indicadores = [
+            self.ax4.text(bar.get_x() + bar.get_width()/2., 0, '', ha='center', va='bottom')
+            for bar in list(self.barras_atuais) + list(self.barras_ideais)]
+        self.ax4.set_title('Indicadores Antropométricos', fontweight='bold')
+        self.ax4.set_ylabel('Valores')
+        self.ax4.set_xticks(x)
+        self.ax4.set_xticklabels(INDICADORES)
+        self.legenda = self.ax4.legend()
+        self.aviso_indicadores = _aviso(self.ax4, 'Preencha a avaliação\nantropométrica')
+
+        self.fig.tight_layout()
+
+    def atualizar(self, antropometricos, historico, frequencia, macros=None):
+        """
+        historico: SerieAntropometrica;
+        frequencia: dict grupo alimentar -> frequência marcada ('' se vazia);
+        macros: % da energia de carboidratos, proteínas e lipídios
+        (composicao.macros_recordatorio), ou None sem recordatório.
+        """
+        import matplotlib.dates as mdates
+        # Gráfico 1: colunas da série, reduzidas à largura do eixo em pixels
+        x = mdates.date2num(historico.datas())
+        y = historico.coluna('peso')
+        validos = ~np.isnan(y)
+        x, y = x[validos], y[validos]
+        if len(x) and np.any(np.diff(x) < 0):
+            ordem = np.argsort(x, kind='stable')
+            x, y = x[ordem], y[ordem]
+        self.x_peso, self.y_peso = x, y
+        tem_historico = len(x) > 0
+        if tem_historico:
+            self.reamostrar_peso(inteira=True)
+            self.ax1.relim()
+            self.ax1.autoscale_view()
+        self.linha_peso.set_visible(tem_historico)
+        self.aviso_peso.set_visible(not tem_historico)
+
+        # Gráfico 2: mesmos ângulos e posições de rótulo que ax.pie calcularia
+        if macros is not None:
+            inicio = 90
+            for fatia, rotulo, percentual, valor in zip(
+                    self.fatias_macros, self.rotulos_macros, self.percentuais_macros, macros):
+                angulo = 360 * valor / sum(macros)
+                fatia.set_theta1(inicio)
+                fatia.set_theta2(inicio + angulo)
+                meio = np.deg2rad(inicio + angulo / 2)
+                x, y = np.cos(meio), np.sin(meio)
+                rotulo.set_position((1.1 * x, 1.1 * y))
+                rotulo.set_horizontalalignment('left' if x > 0 else 'right')
+                percentual.set_position((0.6 * x, 0.6 * y))
+                percentual.set_text(f'{valor:.1f}%')
+                for artista in (fatia, rotulo, percentual):
+                    artista.set_visible(valor > 0)
+                inicio += angulo
+        else:
+            for artista in self.fatias_macros + self.rotulos_macros + self.percentuais_macros:
+                artista.set_visible(False)
+        self.aviso_macros.set_visible(macros is None)
+
+        # Gráfico 3
+        preenchida = any(frequencia.values())
+        grupos = list(frequencia.keys())[:GRUPOS_FREQUENCIA]
+        if preenchida and grupos != self._grupos:
+            # Só os nomes dos grupos mudam o layout; ajusta apenas nesse caso
+            self._grupos = grupos
+            self.ax3.set_xticks(np.arange(len(grupos)))
+            self.ax3.set_xticklabels(grupos)
+            self.ax3.set_ylabel('Frequência Semanal')
+            self.fig.tight_layout()
+        for i, (bar, rotulo) in enumerate(zip(self.barras_frequencia, self.rotulos_frequencia)):
+            visivel = preenchida and i < len(grupos)
+            bar.set_visible(visivel)
+            rotulo.set_visible(visivel)
+        self.ax3.xaxis.set_visible(preenchida)
+        self.ax3.yaxis.set_visible(preenchida)
+        self.aviso_frequencia.set_visible(not preenchida)
+
+        # Gráfico 4
+        preenchida = bool(antropometricos)
+        if preenchida:
+            valores_atuais = [
+                antropometricos.get('imc', 0),
+                antropometricos.get('rcq', 0),
+                antropometricos.get('perda_peso_perc', 0)
+            ]
+            for bar, valor in zip(self.barras_atuais, valores_atuais):
+                bar.set_height(valor)
+            barras = list(self.barras_atuais) + list(self.barras_ideais)
+            for bar, rotulo in zip(barras, self.rotulos_indicadores):
+                height = bar.get_height()
+                rotulo.set_position((bar.get_x() + bar.get_width()/2., height + 0.5))
+                rotulo.set_text(f'{height:.1f}' if height > 0 else '')
+            self.ax4.relim()
+            self.ax4.autoscale_view()
+        for artista in (list(self.barras_atuais) + list(self.barras_ideais)
+                        + self.rotulos_indicadores + [self.legenda]):
+            artista.set_visible(preenchida)
+        self.ax4.xaxis.set_visible(preenchida)
+        self.ax4.yaxis.set_visible(preenchida)
+        self.aviso_indicadores.set_visible(not preenchida)
+
+    def reamostrar_peso(self, inteira=False):
+        """Põe na linha só os pontos necessários para a janela visível do eixo."""
+        x, y = self.x_peso, self.y_peso
+        if not len(x):
+            return
+        if inteira:
+            inicio, fim = 0, len(x)
+        else:
+            xmin, xmax = self.ax1.get_xlim()
+            # Um ponto além de cada borda, para a linha não terminar antes dela
+            inicio = max(np.searchsorted(x, xmin) - 1, 0)
+            fim = min(np.searchsorted(x, xmax, side='right') + 1, len(x))
+        baldes = max(int(self.ax1.bbox.width) // 2, 1)
+        xs, ys = reduzir_min_max(x[inicio:fim], y[inicio:fim], baldes)
+        self.linha_peso.set_data(xs, ys)
+        self.linha_peso.set_marker('o' if len(xs) <= PONTOS_COM_MARCADOR else '')
+
+    def ver_tudo(self):
+        """Volta ao período completo depois de zoom ou arraste."""
+        if len(self.x_peso):
+            self.reamostrar_peso(inteira=True)
+            self.ax1.relim()
+            self.ax1.autoscale_view()
+
+
+class PainelCoorte:
+    """
+    Indicadores da coorte (coorte.AgregadosCoorte) em três gráficos lado a
+    lado; como no PainelGraficos, as barras são criadas uma vez e cada
+    atualização só muda alturas, larguras e textos.
+    """
+
+    def __init__(self, fig, eixos, cores):
+        self.fig = fig
+        self.ax1, self.ax2, self.ax3 = eixos
+
+        # Distribuição do IMC, colorida pelos pontos de corte para idosos
+        faixas = FAIXAS_IMC[:-1]
+        cores_faixas = [cores['alerta'] if f < 22 else cores['sucesso'] if f < 27 else cores['perigo']
+                        for f in faixas]
+        self.barras_imc = self.ax1.bar(faixas, np.zeros(len(faixas)), width=1, align='edge',
+                                       color=cores_faixas, alpha=0.8)
+        for corte in (22, 27):
+            self.ax1.axvline(corte, color=cores['texto_secundario'], linestyle='--', linewidth=1)
+        self.ax1.set_xlabel('IMC (kg/m²)')
+        self.ax1.set_ylabel('Pacientes')
+
+        # Risco nutricional (% dos pacientes)
+        x = np.arange(len(CLASSES_RISCO))
+        self.barras_risco = self.ax2.bar(x, [0] * len(CLASSES_RISCO), width=0.6, alpha=0.8,
+                                         color=[cores['sucesso'], cores['alerta'], cores['perigo']])
+        self.rotulos_risco = [self.ax2.text(i, 0, '', ha='center', va='bottom') for i in x]
+        self.ax2.set_xticks(x)
+        self.ax2.set_xticklabels(CLASSES_RISCO)
+        self.ax2.set_ylim(0, 110)
+        self.ax2.set_ylabel('% dos pacientes')
+        self.ax2.set_title('Risco Nutricional', fontweight='bold')
+
+        # Prevalência das doenças mais frequentes
+        y = np.arange(DOENCAS_COORTE)
+        self.barras_doencas = self.ax3.barh(y, [0] * DOENCAS_COORTE, color=cores['secundaria'],
+                                            alpha=0.7)
+        self.rotulos_doencas = [self.ax3.text(0, i, '', va='center') for i in y]
+        self.ax3.set_yticks(y)
+        self.ax3.set_yticklabels([''] * DOENCAS_COORTE)
+        self.ax3.invert_yaxis()
+        self.ax3.set_xlim(0, 110)
+        self.ax3.set_xlabel('% dos pacientes')
+        self.ax3.set_title('Prevalência de Doenças', fontweight='bold')
+
+        self.fig.tight_layout()
+
+    def atualizar(self, agregados):
+        com_imc = agregados.total - agregados.sem_imc
+        for bar, quantidade in zip(self.barras_imc, agregados.histograma_imc):
+            bar.set_height(quantidade)
+        self.ax1.set_ylim(0, max(agregados.histograma_imc.max(), 1) * 1.15)
+        self.ax1.set_title(f'Distribuição do IMC (n = {com_imc})', fontweight='bold')
+
+        for bar, rotulo, risco in zip(self.barras_risco, self.rotulos_risco, CLASSES_RISCO):
+            percentual = agregados.percentual(agregados.riscos[risco])
+            bar.set_height(percentual)
+            rotulo.set_y(percentual + 1)
+            rotulo.set_text(f'{percentual:.1f}%' if agregados.total else '')
+
+        prevalencias = agregados.prevalencias(DOENCAS_COORTE)
+        nomes = []
+        for i, (bar, rotulo) in enumerate(zip(self.barras_doencas, self.rotulos_doencas)):
+            if i < len(prevalencias):
+                doenca, quantidade, percentual = prevalencias[i]
+                nomes.append(doenca)
+                bar.set_width(percentual)
+                rotulo.set_x(percentual + 1)
+                rotulo.set_text(f'{percentual:.1f}% ({quantidade})')
+            else:
+                nomes.append('')
+                bar.set_width(0)
+                rotulo.set_text('')
+        if nomes != [t.get_text() for t in self.ax3.get_yticklabels()]:
+            self.ax3.set_yticklabels(nomes)
+            self.fig.tight_layout()
+
+
+class PainelEvolucao:
+    """
+    Medidas das evoluções nutricionais ao longo das visitas, numa figura 2x2:
+    peso, IMC, circunferência da panturrilha e dobras cutâneas. Cada campo
+    tem uma linha criada uma vez; visitas sem o campo preenchido são puladas.
+    """
+
+    def __init__(self, fig, eixos, cores):
+        import matplotlib.dates as mdates
+        self.fig = fig
+        self.eixos = list(eixos)
+        cores_dobras = ['#3498db', '#27ae60', '#f39c12', '#e74c3c', '#9b59b6', '#17a2b8',
+                        '#2c3e50']
+        self.linhas = {}
+        for ax, (campo, titulo) in zip(self.eixos, MEDIDAS_EVOLUCAO):
+            self.linhas[campo], = ax.plot([], [], marker='o', color=cores['secundaria'],
+                                          linewidth=2)
+            ax.set_title(titulo, fontweight='bold')
+        ax = self.eixos[3]
+        for (campo, rotulo), cor in zip(DOBRAS_EVOLUCAO, cores_dobras):
+            self.linhas[campo], = ax.plot([], [], marker='o', markersize=3, color=cor,
+                                          label=rotulo)
+        ax.set_title('Dobras Cutâneas (mm)', fontweight='bold')
+        self.avisos = [_aviso(ax, 'Sem evoluções no período') for ax in self.eixos]
+        for ax in self.eixos:
+            ax.grid(True, alpha=0.3)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%y'))
+        self.legenda = None
+        self.fig.tight_layout()
+
+    def atualizar(self, datas, valores):
+        """datas: timestamps das visitas; valores: {campo: [valor ou NaN, ...]}."""
+        import matplotlib.dates as mdates
+        x = mdates.date2num(tempo_local(datas).astype('datetime64[s]'))
+        for campo, linha in self.linhas.items():
+            y = np.asarray(valores.get(campo, []), dtype=np.float64)
+            validos = ~np.isnan(y) if len(y) else np.zeros(0, dtype=bool)
+            linha.set_data(x[validos], y[validos])
+            linha.set_marker('o' if validos.sum() <= PONTOS_COM_MARCADOR else '')
+            linha.set_label(linha.get_label().lstrip('_') if validos.any()
+                            else '_' + linha.get_label().lstrip('_'))
+
+        campos_por_eixo = [[campo] for campo, _ in MEDIDAS_EVOLUCAO] + \
+                          [[campo for campo, _ in DOBRAS_EVOLUCAO]]
+        for ax, aviso, campos in zip(self.eixos, self.avisos, campos_por_eixo):
+            com_dados = any(len(self.linhas[campo].get_xdata()) for campo in campos)
+            aviso.set_visible(not com_dados)
+            ax.tick_params(labelbottom=len(x) > 0, labelleft=com_dados)
+            if com_dados:
+                ax.relim()
+                ax.autoscale_view()
+            if len(x):
+                # Todos os gráficos mostram o mesmo período
+                margem = max((x[-1] - x[0]) * 0.03, 1)
+                ax.set_xlim(x[0] - margem, x[-1] + margem)
+        # Legenda só com as dobras que têm medidas no período
+        if self.legenda is not None:
+            self.legenda.remove()
+            self.legenda = None
+        if any(len(self.linhas[campo].get_xdata()) for campo, _ in DOBRAS_EVOLUCAO):
+            self.legenda = self.eixos[3].legend(fontsize=7)
+
+
+class NavegacaoPeso:
+    """
+    Zoom com a roda do mouse, arraste com o botão esquerdo e duplo clique
+    para ver tudo no gráfico de evolução do peso.
+
+    Durante a interação só a linha é redesenhada (blitting) sobre o fundo do
+    eixo guardado no início do gesto; o eixo completo, com marcas e grade
+    atualizadas, é redesenhado uma única vez quando o gesto termina.
+    """
+
+    def __init__(self, painel, fim_gesto_ms=250):
+        self.painel = painel
+        self.ax = painel.ax1
+        self.canvas = painel.fig.canvas
+        self._fundo = None
+        self._arraste = None
+        self._temporizador = self.canvas.new_timer(interval=fim_gesto_ms)
+        self._temporizador.single_shot = True
+        self._temporizador.add_callback(self._finalizar)
+        self.canvas.mpl_connect('scroll_event', self._rolar)
+        self.canvas.mpl_connect('button_press_event', self._pressionar)
+        self.canvas.mpl_connect('motion_notify_event', self._mover)
+        self.canvas.mpl_connect('button_release_event', self._soltar)
+        self.canvas.mpl_connect('resize_event', lambda evento: painel.reamostrar_peso())
+
+    def _ativo(self, evento):
+        return evento.inaxes is self.ax and len(self.painel.x_peso) > 0
+
+    def _iniciar(self):
+        if self._fundo is None:
+            self.painel.linha_peso.set_animated(True)
+            self.canvas.draw()
+            self._fundo = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def _blit(self):
+        self.canvas.restore_region(self._fundo)
+        self.ax.draw_artist(self.painel.linha_peso)
+        self.canvas.blit(self.ax.bbox)
+
+    def _finalizar(self):
+        if self._fundo is None:
+            return
+        self._fundo = None
+        self.painel.linha_peso.set_animated(False)
+        self.canvas.draw_idle()
+
+    def _rolar(self, evento):
+        if not self._ativo(evento):
+            return
+        self._iniciar()
+        fator = 0.8 if evento.button == 'up' else 1.25
+        xmin, xmax = self.ax.get_xlim()
+        x = evento.xdata
+        self.ax.set_xlim(x - (x - xmin) * fator, x + (xmax - x) * fator)
+        self._blit()
+        # Fim do gesto: sem novas voltas da roda durante fim_gesto_ms
+        self._temporizador.stop()
+        self._temporizador.start()
+
+    def _pressionar(self, evento):
+        if not self._ativo(evento):
+            return
+        if evento.dblclick:
+            self.painel.ver_tudo()
+            self.canvas.draw_idle()
+            return
+        if evento.button == 1:
+            self._iniciar()
+            self._arraste = (evento.x, self.ax.get_xlim())
+
+    def _mover(self, evento):
+        if self._arraste is None or evento.x is None:
+            return
+        x0, (xmin, xmax) = self._arraste
+        deslocamento = (evento.x - x0) * (xmax - xmin) / self.ax.bbox.width
+        self.ax.set_xlim(xmin - deslocamento, xmax - deslocamento)
+        self._blit()
+
+    def _soltar(self, evento):
+        if self._arraste is None:
+            return
+        self._arraste = None
+        self._finalizar()
+
+
+class AgendadorRenderizacao:
+    """
+    Agrupa os pedidos de redesenho feitos dentro de uma janela curta (um
+    quadro, ~16 ms) numa única chamada de desenhar().
+
+    desenhar: função que atualiza os artistas e chama canvas.draw_idle();
+        retorna False quando não havia nada a redesenhar.
+    agendar: função no estilo root.after(ms, callback).
+    pedidos / realizados: contadores de pedidos recebidos e de redesenhos
+        efetivamente feitos.
+    """
+
+    def __init__(self, desenhar, agendar, janela_ms=16):
+        self.desenhar = desenhar
+        self.agendar = agendar
+        self.janela_ms = janela_ms
+        self.pedidos = 0
+        self.realizados = 0
+        self._agendamento = None
+
+    def pedir(self):
+        self.pedidos += 1
+        if self._agendamento is None:
+            self._agendamento = self.agendar(self.janela_ms, self._executar)
+
+    @property
+    def pendente(self):
+        return self._agendamento is not None
+
+    def _executar(self):
+        self._agendamento = None
+        if self.desenhar():
+            self.realizados += 1
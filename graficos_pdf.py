@@ -0,0 +1,236 @@
+"""
+Gráficos do dashboard para o relatório em PDF, desenhados em vetor.
+
+desenho_dashboard monta os mesmos quatro gráficos do dashboard da tela
+(graficos.PainelGraficos) como um Drawing do reportlab, que entra no
+relatório como qualquer outro flowable: o PDF fica com linhas e texto em
+vetor, sem rasterizar uma figura do matplotlib nem abrir PNG com o PIL.
+
+Os desenhos ficam num cache em memória indexado pelo hash dos dados
+plotados; gerar de novo o relatório de um paciente que não mudou reaproveita
+o desenho pronto.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, Group, String
+from reportlab.graphics.widgets.markers import makeMarker
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+from graficos import FREQUENCIAS_EXEMPLO, GRUPOS_FREQUENCIA, INDICADORES, MACROS, VALORES_IDEAIS
+from serie_historica import reduzir_min_max, tempo_local
+
+LARGURA = 6.5 * inch
+PONTOS_PESO = 200  # Máximo de baldes da linha de peso (o gráfico tem ~200 pt de largura)
+PONTOS_COM_MARCADOR = 100
+LIMITE_CACHE = 32  # Desenhos guardados; os menos usados recentemente saem primeiro
+
+_cache = OrderedDict()
+estatisticas_cache = {'acertos': 0, 'faltas': 0}
+
+
+def _cor(cores, nome, alfa=1):
+    cor = colors.HexColor(cores[nome])
+    if alfa < 1:
+        cor = colors.Color(cor.red, cor.green, cor.blue, alpha=alfa)
+    return cor
+
+
+def _dados_plotados(antropometricos, historico, frequencia):
+    """Só o que aparece nos gráficos: peso por data, grupos e indicadores."""
+    tempo = np.asarray(historico.tempo, dtype=np.int64)
+    peso = np.asarray(historico.coluna('peso'), dtype=np.float32)
+    grupos = list(frequencia.keys())[:GRUPOS_FREQUENCIA] if any(frequencia.values()) else []
+    indicadores = ([antropometricos.get(chave, 0) for chave in ('imc', 'rcq', 'perda_peso_perc')]
+                   if antropometricos else None)
+    return tempo, peso, grupos, indicadores
+
+
+def chave_cache(antropometricos, historico, frequencia, macros, cores, largura=LARGURA):
+    tempo, peso, grupos, indicadores = _dados_plotados(antropometricos, historico, frequencia)
+    h = hashlib.sha1()
+    h.update(tempo.tobytes())
+    h.update(peso.tobytes())
+    h.update(json.dumps([grupos, indicadores, macros, cores, largura],
+                        sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def desenho_dashboard(antropometricos, historico, frequencia, macros, cores, largura=LARGURA):
+    """
+    Drawing 2x2 com os gráficos do dashboard, largura x 2/3 da largura.
+
+    historico: SerieAntropometrica; frequencia: dict grupo alimentar ->
+    frequência marcada ('' se vazia); macros: % da energia de carboidratos,
+    proteínas e lipídios, ou None sem recordatório.
+    """
+    chave = chave_cache(antropometricos, historico, frequencia, macros, cores, largura)
+    desenho = _cache.get(chave)
+    if desenho is not None:
+        _cache.move_to_end(chave)
+        estatisticas_cache['acertos'] += 1
+        return desenho
+    estatisticas_cache['faltas'] += 1
+
+    tempo, peso, grupos, indicadores = _dados_plotados(antropometricos, historico, frequencia)
+    altura = largura * 2 / 3
+    w, h = largura / 2, altura / 2
+    desenho = Drawing(largura, altura)
+    _grafico_peso(desenho, 0, h, w, h, tempo, peso, cores)
+    _grafico_macros(desenho, w, h, w, h, macros, cores)
+    _grafico_frequencia(desenho, 0, 0, w, h, grupos, cores)
+    _grafico_indicadores(desenho, w, 0, w, h, indicadores, cores)
+
+    _cache[chave] = desenho
+    if len(_cache) > LIMITE_CACHE:
+        _cache.popitem(last=False)
+    return desenho
+
+
+def limpar_cache():
+    _cache.clear()
+
+
+def _titulo(desenho, x, y, w, h, texto):
+    desenho.add(String(x + w / 2, y + h - 12, texto, fontName='Helvetica-Bold',
+                       fontSize=9, textAnchor='middle'))
+
+
+def _aviso(desenho, x, y, w, h, texto):
+    linhas = texto.split('\n')
+    for i, linha in enumerate(linhas):
+        desenho.add(String(x + w / 2, y + h / 2 + (len(linhas) / 2 - i - 1) * 10, linha,
+                           fontName='Helvetica', fontSize=8, textAnchor='middle',
+                           fillColor=colors.grey))
+
+
+def _data(dias):
+    # dias já estão no horário local (tempo_local); formatar como UTC não desloca
+    return datetime.fromtimestamp(dias * 86400, timezone.utc).strftime('%d/%m/%y')
+
+
+def _grafico_peso(desenho, x, y, w, h, tempo, peso, cores):
+    _titulo(desenho, x, y, w, h, 'Evolução do Peso')
+    validos = ~np.isnan(peso)
+    dias = tempo_local(tempo[validos]) / 86400
+    kg = peso[validos].astype(np.float64)
+    if not len(dias):
+        _aviso(desenho, x, y, w, h, 'Sem dados históricos')
+        return
+    if np.any(np.diff(dias) < 0):
+        ordem = np.argsort(dias, kind='stable')
+        dias, kg = dias[ordem], kg[ordem]
+    dias, kg = reduzir_min_max(dias, kg, PONTOS_PESO // 2)
+
+    grafico = LinePlot()
+    grafico.x, grafico.y = x + 38, y + 24
+    grafico.width, grafico.height = w - 50, h - 46
+    grafico.data = [list(zip(dias.tolist(), kg.tolist()))]
+    linha = grafico.lines[0]
+    linha.strokeColor = _cor(cores, 'secundaria')
+    linha.strokeWidth = 1.5
+    if len(dias) <= PONTOS_COM_MARCADOR:
+        linha.symbol = makeMarker('FilledCircle', size=3,
+                                  fillColor=_cor(cores, 'secundaria'))
+    inicio, fim = float(dias[0]), float(dias[-1])
+    if fim == inicio:
+        inicio, fim = inicio - 1, fim + 1
+    grafico.xValueAxis.valueMin, grafico.xValueAxis.valueMax = inicio, fim
+    grafico.xValueAxis.valueSteps = np.linspace(inicio, fim, 4).tolist()
+    grafico.xValueAxis.labelTextFormat = _data
+    grafico.xValueAxis.labels.fontSize = 6
+    margem = max(float(kg.max() - kg.min()) * 0.1, 1)
+    grafico.yValueAxis.valueMin = float(kg.min()) - margem
+    grafico.yValueAxis.valueMax = float(kg.max()) + margem
+    grafico.yValueAxis.labels.fontSize = 6
+    grafico.yValueAxis.visibleGrid = True
+    grafico.yValueAxis.gridStrokeColor = colors.Color(0, 0, 0, alpha=0.15)
+    desenho.add(grafico)
+    rotulo = Group(String(0, 0, 'Peso (kg)', fontName='Helvetica', fontSize=6,
+                          textAnchor='middle'))
+    rotulo.translate(x + 10, y + 24 + grafico.height / 2)
+    rotulo.rotate(90)
+    desenho.add(rotulo)
+
+
+def _grafico_macros(desenho, x, y, w, h, macros, cores):
+    _titulo(desenho, x, y, w, h, 'Distribuição de Macronutrientes')
+    if macros is None:
+        _aviso(desenho, x, y, w, h, 'Preencha o recordatório\n24h')
+        return
+    pizza = Pie()
+    lado = min(w, h) - 50
+    pizza.x, pizza.y = x + (w - lado) / 2, y + 12
+    pizza.width = pizza.height = lado
+    pizza.data = macros
+    pizza.labels = [f"{rotulo} {valor:.1f}%" if valor > 0 else ''
+                    for rotulo, valor in zip(MACROS, macros)]
+    pizza.startAngle = 90
+    pizza.direction = 'anticlockwise'
+    pizza.simpleLabels = 0
+    pizza.slices.fontSize = 7
+    pizza.slices.strokeColor = colors.white
+    for i, nome in enumerate(('sucesso', 'info', 'alerta')):
+        pizza.slices[i].fillColor = _cor(cores, nome)
+    desenho.add(pizza)
+
+
+def _grafico_frequencia(desenho, x, y, w, h, grupos, cores):
+    _titulo(desenho, x, y, w, h, 'Frequência de Consumo por Grupo')
+    if not grupos:
+        _aviso(desenho, x, y, w, h, 'Preencha a avaliação\nalimentar')
+        return
+    barras = VerticalBarChart()
+    barras.x, barras.y = x + 30, y + 40
+    barras.width, barras.height = w - 40, h - 62
+    barras.data = [FREQUENCIAS_EXEMPLO[:len(grupos)]]
+    barras.bars[0].fillColor = _cor(cores, 'secundaria', 0.7)
+    barras.bars.strokeColor = None
+    barras.barLabelFormat = '%dx'
+    barras.barLabels.nudge = 5
+    barras.barLabels.fontSize = 6
+    barras.valueAxis.valueMin = 0
+    barras.valueAxis.labels.fontSize = 6
+    barras.categoryAxis.categoryNames = grupos
+    barras.categoryAxis.labels.angle = 45
+    barras.categoryAxis.labels.boxAnchor = 'ne'
+    barras.categoryAxis.labels.fontSize = 6
+    desenho.add(barras)
+
+
+def _grafico_indicadores(desenho, x, y, w, h, indicadores, cores):
+    _titulo(desenho, x, y, w, h, 'Indicadores Antropométricos')
+    if indicadores is None:
+        _aviso(desenho, x, y, w, h, 'Preencha a avaliação\nantropométrica')
+        return
+    barras = VerticalBarChart()
+    barras.x, barras.y = x + 30, y + 20
+    barras.width, barras.height = w - 40, h - 42
+    barras.data = [[float(valor or 0) for valor in indicadores], VALORES_IDEAIS]
+    barras.bars[0].fillColor = _cor(cores, 'secundaria', 0.7)
+    barras.bars[1].fillColor = _cor(cores, 'sucesso', 0.7)
+    barras.bars.strokeColor = None
+    barras.barLabelFormat = lambda valor: f'{valor:.1f}' if valor > 0 else ''
+    barras.barLabels.nudge = 5
+    barras.barLabels.fontSize = 6
+    barras.valueAxis.valueMin = 0
+    barras.valueAxis.labels.fontSize = 6
+    barras.categoryAxis.categoryNames = INDICADORES
+    barras.categoryAxis.labels.fontSize = 7
+    desenho.add(barras)
+
+    legenda = Legend()
+    legenda.x, legenda.y = x + w - 60, y + h - 22
+    legenda.fontSize = 6
+    legenda.columnMaximum = 2
+    legenda.colorNamePairs = [(_cor(cores, 'secundaria', 0.7), 'Atual'),
+                              (_cor(cores, 'sucesso', 0.7), 'Referência')]
+    desenho.add(legenda)
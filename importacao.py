@@ -0,0 +1,361 @@
+"""
+Importação de planilhas (CSV) de admissões para o armazenamento de pacientes.
+
+O arquivo é lido linha a linha por geradores e enviado em lotes a processos
+de validação; só alguns lotes ficam em andamento ao mesmo tempo, então a
+memória usada não depende do tamanho do arquivo. Os processos validam e
+normalizam os campos (números com vírgula ou ponto, faixas plausíveis,
+datas, sexo). Os lotes validados são gravados na ordem do arquivo, pelo
+mesmo caminho das gravações da tela (armazenamento.preparar e gravar, de
+forma atômica): cada linha é mesclada ao paciente já existente, IMC, RCQ,
+CMB e AMB do lote inteiro saem de uma única chamada vetorizada
+(nutricao.calcular_indicadores) e as medidas entram no histórico.
+
+As colunas são reconhecidas pelo nome do campo (peso_atual) ou pelo rótulo
+da tela ("Peso Atual (kg)"), sem diferenciar acentos e maiúsculas; outros
+nomes podem ser mapeados explicitamente.
+
+Uso: python app.py --importar-csv ARQUIVO [--mapa-colunas COLUNA=campo ...]
+"""
+import csv
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from armazenamento import chave_paciente, normalizar_texto, secoes_vazias
+from formulario import CAMPOS_ANTROPOMETRIA, CAMPOS_IDENTIFICACAO
+
+TAMANHO_LOTE = 250
+ERROS_GUARDADOS = 1000  # Linhas rejeitadas listadas no resumo; as demais só são contadas
+
+CAMPOS_DATA = ('data_nascimento', 'data_admissao', 'data_medicao')
+CAMPOS_NUMERICOS = [campo for _, campo in CAMPOS_ANTROPOMETRIA if campo not in CAMPOS_DATA]
+
+# Faixas plausíveis (idosos); fora delas a linha é rejeitada
+FAIXAS = {
+    'peso_atual': (20, 300), 'peso_habitual': (20, 300), 'peso_estimado': (20, 300),
+    'peso_ideal': (20, 300), 'altura': (100, 230), 'altura_estimada': (100, 230),
+    'altura_joelho': (30, 80), 'percentual_gordura': (1, 80),
+}
+FAIXA_CIRCUNFERENCIA = (5, 250)
+FAIXA_DOBRA = (1, 100)
+
+SEXOS = {'m': 'Masculino', 'masc': 'Masculino', 'masculino': 'Masculino',
+         'f': 'Feminino', 'fem': 'Feminino', 'feminino': 'Feminino'}
+FORMATOS_DATA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y')
+
+
+def _nome_coluna(texto):
+    """'Peso Atual (kg):' -> 'peso_atual'"""
+    texto = re.sub(r'\(.*?\)', ' ', normalizar_texto(texto))
+    return '_'.join(re.findall(r'[a-z0-9]+', texto))
+
+
+# Nome normalizado da coluna -> campo
+ALIASES = {}
+for _rotulo, _campo in CAMPOS_IDENTIFICACAO + CAMPOS_ANTROPOMETRIA:
+    ALIASES[_nome_coluna(_rotulo)] = _campo
+    ALIASES[_campo] = _campo
+ALIASES.update({'nome_completo': 'nome', 'paciente': 'nome', 'n_de_registro': 'registro',
+                'prontuario': 'registro', 'nascimento': 'data_nascimento', 'peso': 'peso_atual',
+                'admissao': 'data_admissao'})
+
+
+def mapear_colunas(cabecalho, mapa=None):
+    """
+    (coluna -> campo, colunas ignoradas) para o cabeçalho do CSV. mapa:
+    dict coluna -> campo que tem precedência sobre o reconhecimento automático.
+    """
+    mapa = {_nome_coluna(coluna): campo for coluna, campo in (mapa or {}).items()}
+    desconhecidos = set(mapa.values()) - set(ALIASES.values())
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos no mapa de colunas: {', '.join(sorted(desconhecidos))}")
+    colunas, ignoradas = {}, []
+    for coluna in cabecalho:
+        nome = _nome_coluna(coluna)
+        campo = mapa.get(nome) or ALIASES.get(nome)
+        if campo and campo not in colunas.values():
+            colunas[coluna] = campo
+        else:
+            ignoradas.append(coluna)
+    return colunas, ignoradas
+
+
+def ler_linhas(caminho):
+    """
+    Gera o cabeçalho e depois (nº da linha, dict coluna -> texto) de cada linha,
+    sem carregar o arquivo. Detecta o separador (vírgula ou ponto e vírgula).
+    """
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+        amostra = f.read(8192)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.DictReader(f, dialect=dialeto)
+        yield leitor.fieldnames or []
+        for linha in leitor:
+            yield leitor.line_num, linha
+
+
+def em_lotes(itens, tamanho=TAMANHO_LOTE):
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _data(texto):
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida: {texto!r}")
+
+
+def _faixa(campo):
+    if campo in FAIXAS:
+        return FAIXAS[campo]
+    return FAIXA_DOBRA if campo.startswith('dobra_') else FAIXA_CIRCUNFERENCIA
+
+
+def validar_linha(linha, colunas):
+    """(paciente, antropometricos, data da medição ou None, erros) de uma linha do CSV."""
+    paciente, antropometricos, erros = {}, {}, []
+    quando = None
+    for coluna, campo in colunas.items():
+        texto = (linha.get(coluna) or '').strip()
+        if not texto:
+            continue
+        try:
+            if campo in CAMPOS_DATA:
+                data = _data(texto)
+                texto = data.strftime('%d/%m/%Y')
+                if campo == 'data_medicao':
+                    quando = data
+                elif campo == 'data_admissao' and quando is None:
+                    quando = data
+            if campo in CAMPOS_NUMERICOS:
+                valor = float(texto.replace(',', '.'))
+                minimo, maximo = _faixa(campo)
+                if not minimo <= valor <= maximo:
+                    raise ValueError(f"fora da faixa {minimo}–{maximo}: {texto}")
+                antropometricos[campo] = valor
+            elif campo == 'data_medicao':
+                antropometricos[campo] = texto
+            elif campo == 'sexo':
+                if normalizar_texto(texto) not in SEXOS:
+                    raise ValueError(f"sexo inválido: {texto!r}")
+                paciente[campo] = SEXOS[normalizar_texto(texto)]
+            elif campo == 'idade':
+                idade = int(texto)
+                if not 0 <= idade <= 130:
+                    raise ValueError(f"idade inválida: {texto}")
+                paciente[campo] = str(idade)
+            else:
+                paciente[campo] = texto
+        except ValueError as e:
+            erros.append(f"{coluna}: {e}")
+    if not paciente.get('nome'):
+        erros.append("nome em branco")
+    return paciente, antropometricos, quando, erros
+
+
+def validar_lote(lote, colunas):
+    """
+    Valida um lote de (nº da linha, linha) num processo de trabalho. Retorna
+    [(nº da linha, paciente, antropometricos, data da medição, erros)].
+    """
+    return [(numero,) + validar_linha(linha, colunas) for numero, linha in lote]
+
+
+INDICADORES = ('imc', 'rcq', 'perda_peso_perc', 'cmb', 'amb',
+               'classificacao_imc', 'classificacao_rcq')
+
+
+def calcular_lote(medidas, sexos):
+    """
+    Recalcula os indicadores de todas as medidas do lote (dicts
+    antropometricos, alterados no lugar) numa única chamada vetorizada, como
+    nutricao.calcular_antropometria faz para um paciente.
+    """
+    import numpy as np
+    from diario_evolucao import numero
+    from nutricao import CLASSES_IMC, CLASSES_RCQ, calcular_indicadores
+
+    def coluna(campo):
+        return [numero(antropo.get(campo)) for antropo in medidas]
+
+    resultado = calcular_indicadores(
+        coluna('peso_atual'), coluna('altura'), peso_habitual=coluna('peso_habitual'),
+        cintura=coluna('circ_cintura'), quadril=coluna('circ_quadril'),
+        braco=coluna('circ_braco'), dobra_triceps=coluna('dobra_triceps'),
+        masculino=[sexo == 'Masculino' for sexo in sexos])
+    for i, antropo in enumerate(medidas):
+        for chave in INDICADORES:
+            antropo.pop(chave, None)  # Calculados com as medidas anteriores
+        for chave in ('imc', 'rcq', 'perda_peso_perc', 'cmb', 'amb'):
+            valor = float(resultado[chave][i])
+            if not np.isnan(valor):
+                antropo[chave] = valor
+        if 'imc' in antropo:
+            antropo['classificacao_imc'] = CLASSES_IMC[resultado['classificacao_imc'][i]]
+        if 'rcq' in antropo:
+            antropo['classificacao_rcq'] = CLASSES_RCQ[resultado['classificacao_rcq'][i]]
+
+
+def gravar_lote(armazenamento, pasta_pacientes, validas):
+    """
+    Grava as linhas válidas de um lote [(paciente, antropometricos, data da
+    medição)], na ordem. Cada linha é mesclada ao que já existe do paciente
+    (identificação e medidas da linha sobrepõem as anteriores; as demais
+    seções são mantidas) e acrescenta uma consulta ao histórico; um paciente
+    com várias linhas no lote é lido e gravado uma vez só.
+    Retorna {chave: True se o paciente já existia antes do lote}, um por paciente.
+    """
+    from serie_historica import (SerieAntropometrica, carregar_historico, pasta_serie,
+                                 referencia_historico)
+    pacientes = {}  # chave -> [dados, série ou None, já existia]
+    consultas = []  # (chave, medidas após a linha, data da medição)
+    for paciente, antropometricos, quando in validas:
+        chave = chave_paciente(paciente['nome'])
+        if chave not in pacientes:
+            try:
+                pacientes[chave] = [armazenamento.carregar(paciente['nome']), None, True]
+            except (OSError, KeyError, ValueError):
+                pacientes[chave] = [secoes_vazias(), None, False]
+        entrada = pacientes[chave]
+        dados = entrada[0]
+        dados['paciente'] = dict(dados.get('paciente') or {}, **paciente)
+        # Um dict novo por linha: cada consulta do histórico guarda as suas medidas
+        dados['antropometricos'] = dict(dados.get('antropometricos') or {}, **antropometricos)
+        if any(campo in antropometricos for campo in CAMPOS_NUMERICOS):
+            consultas.append((chave, dados['antropometricos'], quando))
+
+    if consultas:
+        calcular_lote([medidas for _, medidas, _ in consultas],
+                      [pacientes[chave][0]['paciente'].get('sexo') for chave, _, _ in consultas])
+    for chave, medidas, quando in consultas:
+        entrada = pacientes[chave]
+        if entrada[1] is None:
+            historico = entrada[0].get('historico')
+            if isinstance(historico, dict) and historico.get('formato') == 'npy':
+                # Sem memory-map: os .npy serão substituídos logo em seguida
+                entrada[1] = SerieAntropometrica.carregar(
+                    os.path.join(pasta_pacientes, historico['pasta']), mmap=False)
+            else:
+                entrada[1] = carregar_historico(historico, pasta_pacientes)
+        entrada[1].anexar(quando or datetime.now(), medidas)
+
+    for chave, (dados, serie, _) in pacientes.items():
+        secoes = ['paciente', 'antropometricos']
+        if serie is not None:
+            serie.salvar(pasta_serie(pasta_pacientes, chave))
+            dados['historico'] = referencia_historico(chave, serie)
+            secoes.append('historico')
+        armazenamento.gravar(armazenamento.preparar(dados, secoes))
+    return {chave: existia for chave, (_, _, existia) in pacientes.items()}
+
+
+class ResumoImportacao:
+
+    def __init__(self):
+        self.lidas = 0
+        self.novos = 0
+        self.atualizados = 0
+        self.rejeitadas = 0
+        self.erros = []  # (nº da linha, [mensagens]), até ERROS_GUARDADOS
+        self.chaves = set()  # pacientes gravados
+        self.colunas = {}
+        self.ignoradas = []
+        self.segundos = 0.0
+        self.cancelada = False
+
+    @property
+    def importadas(self):
+        """Linhas gravadas (um paciente pode ter várias)."""
+        return self.lidas - self.rejeitadas
+
+    def __str__(self):
+        taxa = self.lidas / self.segundos if self.segundos else 0
+        return (f"{self.lidas} linhas em {self.segundos:.1f} s ({taxa:.0f} linhas/s): "
+                f"{self.novos} pacientes novos, {self.atualizados} atualizados, "
+                f"{self.rejeitadas} linhas rejeitadas" + (" (cancelada)" if self.cancelada else ""))
+
+
+def importar_csv(caminho, armazenamento, pasta_pacientes, mapa=None, processos=None,
+                 tamanho_lote=TAMANHO_LOTE, ao_progresso=None, cancelado=None):
+    """
+    Importa as linhas de um CSV. ao_progresso(resumo) é chamada a cada lote
+    gravado. processos=1 valida na própria thread, sem criar processos.
+    cancelado(): verificada entre lotes; se True, a importação para depois do
+    lote em gravação (os já gravados ficam) e o resumo sai com cancelada.
+    Retorna um ResumoImportacao.
+    """
+    inicio = time.perf_counter()
+    resumo = ResumoImportacao()
+    linhas = ler_linhas(caminho)
+    resumo.colunas, resumo.ignoradas = mapear_colunas(next(linhas), mapa)
+    if 'nome' not in resumo.colunas.values():
+        raise ValueError("O arquivo não tem uma coluna com o nome do paciente.")
+
+    def gravar(validadas):
+        validas = []
+        for numero, paciente, antropometricos, quando, erros in validadas:
+            resumo.lidas += 1
+            if not erros:
+                validas.append((paciente, antropometricos, quando))
+                continue
+            resumo.rejeitadas += 1
+            if len(resumo.erros) < ERROS_GUARDADOS:
+                resumo.erros.append((numero, erros))
+        for chave, existia in gravar_lote(armazenamento, pasta_pacientes, validas).items():
+            if chave in resumo.chaves:
+                continue  # Já contado num lote anterior
+            if existia:
+                resumo.atualizados += 1
+            else:
+                resumo.novos += 1
+            resumo.chaves.add(chave)
+        resumo.segundos = time.perf_counter() - inicio
+        if ao_progresso is not None:
+            ao_progresso(resumo)
+
+    def interromper():
+        resumo.cancelada = cancelado is not None and cancelado()
+        return resumo.cancelada
+
+    lotes = em_lotes(linhas, tamanho_lote)
+    if processos == 1:
+        for lote in lotes:
+            if interromper():
+                break
+            gravar(validar_lote(lote, resumo.colunas))
+    else:
+        # spawn: os processos não herdam a interface nem as threads do Tk
+        processos = processos or os.cpu_count() or 1
+        limite = 2 * processos  # Lotes em andamento
+        with ProcessPoolExecutor(max_workers=processos, mp_context=get_context('spawn')) as executor:
+            pendentes = deque()
+            for lote in lotes:
+                pendentes.append(executor.submit(validar_lote, lote, resumo.colunas))
+                if len(pendentes) >= limite:
+                    gravar(pendentes.popleft().result())
+                    if interromper():
+                        break
+            while pendentes and not interromper():
+                gravar(pendentes.popleft().result())
+            if resumo.cancelada:
+                executor.shutdown(cancel_futures=True)
+    resumo.segundos = time.perf_counter() - inicio
+    return resumo
@@ -0,0 +1,219 @@
+"""
+Cálculos e classificações nutricionais, independentes da interface.
+
+As funções escalares recebem os dicionários de uma avaliação (as mesmas
+seções salvas no JSON do paciente). calcular_indicadores e as funções
+*_coorte recebem arrays NumPy e avaliam uma coorte inteira numa única
+chamada vetorizada; classificar_imc, determinar_status_nutricional e
+determinar_risco_nutricional (usadas pela tela, catálogo, coorte, relatórios
+e exportação) chamam esse mesmo núcleo com arrays de um elemento.
+
+Benchmark: python nutricao.py --benchmark [quantidade]
+"""
+import sys
+import time
+
+import numpy as np
+
+PI = 3.1416  # mesmo valor usado desde a primeira versão dos cálculos
+
+CLASSES_IMC = ("Baixo peso", "Adequado", "Sobrepeso")
+CLASSES_RCQ = ("Baixo risco", "Alto risco")
+CLASSES_STATUS = ("Desnutrição", "Adequado", "Sobrepeso")
+CLASSES_RISCO = ("Baixo Risco", "Risco Moderado", "Alto Risco")
+
+
+def _array(valores, tamanho):
+    if valores is None:
+        return np.full(tamanho, np.nan)
+    return np.asarray(valores, dtype=np.float64)
+
+
+def calcular_indicadores(peso, altura_cm, peso_habitual=None, cintura=None, quadril=None,
+                         braco=None, dobra_triceps=None, masculino=None):
+    """
+    IMC, RCQ, % de perda de peso, CMB e AMB de uma coorte inteira.
+
+    Todos os parâmetros são arrays do mesmo tamanho (NaN ou 0 = não medido);
+    peso_habitual ausente é tratado como igual ao peso atual, e 'masculino' é
+    um array booleano. Os resultados são arrays float64 com NaN onde o
+    indicador não pode ser calculado, e códigos int8 das classificações
+    (-1 quando não calculado), que indexam CLASSES_IMC e CLASSES_RCQ.
+    """
+    peso = np.asarray(peso, dtype=np.float64)
+    n = len(peso)
+    altura = _array(altura_cm, n) / 100  # Converter para metros
+    peso_habitual = _array(peso_habitual, n)
+    peso_habitual = np.where(np.isnan(peso_habitual), peso, peso_habitual)
+    cintura, quadril = _array(cintura, n), _array(quadril, n)
+    braco, dobra_triceps = _array(braco, n), _array(dobra_triceps, n)
+    masculino = np.zeros(n, dtype=bool) if masculino is None else np.asarray(masculino, dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        imc = np.where(altura > 0, peso / altura ** 2, np.nan)
+        rcq = np.where((cintura > 0) & (quadril > 0), cintura / quadril, np.nan)
+        perda = np.where(peso_habitual > 0, (peso_habitual - peso) / peso_habitual * 100, np.nan)
+        cmb = np.where((braco > 0) & (dobra_triceps > 0), braco - PI * dobra_triceps / 10, np.nan)
+    amb = cmb ** 2 / (4 * PI)
+
+    return {
+        'imc': imc,
+        'classificacao_imc': classificar_imc_coorte(imc),
+        'rcq': rcq,
+        'classificacao_rcq': np.where(np.isnan(rcq), -1,
+                                      (rcq > np.where(masculino, 0.95, 0.80))).astype(np.int8),
+        'perda_peso_perc': perda,
+        'cmb': cmb,
+        'amb': amb,
+    }
+
+
+def classificar_imc_coorte(imc):
+    # Pontos de corte específicos para idosos: < 22, 22–27, > 27
+    imc = np.asarray(imc, dtype=np.float64)
+    codigos = np.searchsorted([22, 27], imc, side='right').astype(np.int8)
+    codigos[imc == 27] = 1
+    codigos[np.isnan(imc)] = -1
+    return codigos
+
+
+def status_nutricional_coorte(imc, perda_peso_perc):
+    """Códigos de CLASSES_STATUS; medidas ausentes contam como 0, como na tela."""
+    imc = np.nan_to_num(np.asarray(imc, dtype=np.float64))
+    perda = np.nan_to_num(np.asarray(perda_peso_perc, dtype=np.float64))
+    return np.select([(imc < 22) | (perda > 10), imc > 27], [0, 2], 1).astype(np.int8)
+
+
+def risco_nutricional_coorte(tem_data_nascimento, n_doencas, perda_peso_perc, apetite_ruim):
+    """Códigos de CLASSES_RISCO a partir dos quatro fatores de risco."""
+    perda = np.nan_to_num(np.asarray(perda_peso_perc, dtype=np.float64))
+    fatores = (np.asarray(tem_data_nascimento, dtype=np.int8)
+               + (np.asarray(n_doencas) > 2)
+               + (perda > 5)
+               + np.asarray(apetite_ruim, dtype=np.int8))
+    return np.select([fatores >= 3, fatores >= 1], [2, 1], 0).astype(np.int8)
+
+
+def calcular_antropometria(medidas, sexo=''):
+    """
+    Indicadores de um único paciente a partir dos valores numéricos do
+    formulário (dict campo -> float; campos vazios podem ser omitidos).
+    Retorna só os indicadores que puderam ser calculados.
+    """
+    def coluna(campo):
+        return [medidas.get(campo) or 0.0]
+
+    peso = coluna('peso_atual')
+    resultado = calcular_indicadores(
+        peso, coluna('altura'),
+        peso_habitual=[medidas.get('peso_habitual') or peso[0]],
+        cintura=coluna('circ_cintura'), quadril=coluna('circ_quadril'),
+        braco=coluna('circ_braco'), dobra_triceps=coluna('dobra_triceps'),
+        masculino=[sexo == "Masculino"])
+
+    calculados = {}
+    for chave in ('imc', 'rcq', 'perda_peso_perc', 'cmb', 'amb'):
+        valor = float(resultado[chave][0])
+        if not np.isnan(valor):
+            calculados[chave] = valor
+    if 'imc' in calculados:
+        calculados['classificacao_imc'] = CLASSES_IMC[resultado['classificacao_imc'][0]]
+    if 'rcq' in calculados:
+        calculados['classificacao_rcq'] = CLASSES_RCQ[resultado['classificacao_rcq'][0]]
+    return calculados
+
+
+def classificar_imc(imc):
+    return CLASSES_IMC[classificar_imc_coorte([imc])[0]]
+
+
+def determinar_status_nutricional(antropometricos):
+    return CLASSES_STATUS[status_nutricional_coorte(
+        [antropometricos.get('imc', 0)], [antropometricos.get('perda_peso_perc', 0)])[0]]
+
+
+def determinar_risco_nutricional(paciente, antropometricos, clinicos, alimentares):
+    # Lógica simplificada: data de nascimento informada conta como idade
+    # avançada, mais de duas doenças crônicas, perda de peso > 5% e apetite
+    # regular ou ruim
+    return CLASSES_RISCO[risco_nutricional_coorte(
+        [bool(paciente.get('data_nascimento'))],
+        [len(clinicos.get('doencas') or [])],
+        [antropometricos.get('perda_peso_perc', 0)],
+        [(alimentares.get('habitos') or {}).get('apetite') in ('Regular', 'Ruim')])[0]]
+
+
+def avaliar(dados):
+    """Status e risco a partir de um documento completo (JSON do paciente)."""
+    paciente = dados.get('paciente', {})
+    antropometricos = dados.get('antropometricos', {})
+    return (determinar_status_nutricional(antropometricos),
+            determinar_risco_nutricional(paciente, antropometricos,
+                                         dados.get('clinicos', {}),
+                                         dados.get('alimentares', {})))
+
+
+def _coorte_sintetica(n, semente=0):
+    gerador = np.random.default_rng(semente)
+    return {
+        'peso': gerador.normal(68, 12, n).clip(35, 140),
+        'altura_cm': gerador.normal(162, 9, n).clip(135, 200),
+        'peso_habitual': gerador.normal(70, 12, n).clip(35, 140),
+        'cintura': gerador.normal(92, 11, n).clip(55, 150),
+        'quadril': gerador.normal(102, 9, n).clip(70, 160),
+        'braco': gerador.normal(28, 4, n).clip(15, 45),
+        'dobra_triceps': gerador.normal(16, 6, n).clip(3, 45),
+        'masculino': gerador.random(n) < 0.45,
+        'tem_data_nascimento': gerador.random(n) < 0.9,
+        'n_doencas': gerador.integers(0, 6, n),
+        'apetite_ruim': gerador.random(n) < 0.3,
+    }
+
+
+def benchmark(n=100_000):
+    """Vazão do núcleo vetorizado comparada ao cálculo paciente a paciente."""
+    coorte = _coorte_sintetica(n)
+
+    inicio = time.perf_counter()
+    indicadores = calcular_indicadores(coorte['peso'], coorte['altura_cm'], coorte['peso_habitual'],
+                                       coorte['cintura'], coorte['quadril'], coorte['braco'],
+                                       coorte['dobra_triceps'], coorte['masculino'])
+    status_nutricional_coorte(indicadores['imc'], indicadores['perda_peso_perc'])
+    risco_nutricional_coorte(coorte['tem_data_nascimento'], coorte['n_doencas'],
+                             indicadores['perda_peso_perc'], coorte['apetite_ruim'])
+    vetorizado = time.perf_counter() - inicio
+
+    # Referência: as mesmas fórmulas, paciente a paciente, em Python puro
+    amostra = min(n, 20_000)
+    c = {chave: valores[:amostra].tolist() for chave, valores in coorte.items()}
+    inicio = time.perf_counter()
+    imc_laco = []
+    for i in range(amostra):
+        altura = c['altura_cm'][i] / 100
+        imc = c['peso'][i] / altura ** 2
+        _ = "Baixo peso" if imc < 22 else "Adequado" if imc <= 27 else "Sobrepeso"
+        rcq = c['cintura'][i] / c['quadril'][i]
+        limite = 0.95 if c['masculino'][i] else 0.80
+        _ = "Baixo risco" if rcq <= limite else "Alto risco"
+        perda = (c['peso_habitual'][i] - c['peso'][i]) / c['peso_habitual'][i] * 100
+        cmb = c['braco'][i] - PI * c['dobra_triceps'][i] / 10
+        _ = cmb ** 2 / (4 * PI)
+        _ = "Desnutrição" if imc < 22 or perda > 10 else "Sobrepeso" if imc > 27 else "Adequado"
+        imc_laco.append(imc)
+    por_paciente = (time.perf_counter() - inicio) / amostra * n
+
+    if not np.allclose(imc_laco, indicadores['imc'][:amostra]):
+        raise AssertionError("IMC vetorizado diverge do cálculo paciente a paciente")
+
+    print(f"Pacientes: {n}")
+    print(f"Vetorizado:   {vetorizado * 1000:9.1f} ms  ({n / vetorizado:,.0f} pacientes/s)")
+    print(f"Por paciente: {por_paciente * 1000:9.1f} ms  ({n / por_paciente:,.0f} pacientes/s, "
+          f"estimado a partir de {amostra})")
+    print(f"Ganho: {por_paciente / vetorizado:.0f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    else:
+        print(__doc__)
@@ -0,0 +1,134 @@
+"""
+Observador de alterações em pacientes/ feitas fora deste programa.
+
+Quando duas estações usam a mesma pasta pacientes/ (ou o mesmo banco), um
+paciente salvo numa delas precisa aparecer atualizado na outra. O observador
+compara periodicamente as versões de todos os pacientes
+(armazenamento.versoes: mtime e tamanho de cada JSON, ou a data da última
+gravação no SQLite) com as da verificação anterior, sem APIs de
+notificação específicas de sistema operacional.
+
+A leitura das versões roda numa thread de E/S e as verificações são
+agendadas com root.after, com espera exponencial: começa em
+INTERVALO_MIN_MS, dobra a cada verificação sem mudanças até
+INTERVALO_MAX_MS e volta ao mínimo quando algo muda ou quando se pede
+(acelerar). As gravações feitas pelo próprio programa são registradas
+(registrar) para não serem confundidas com alterações externas.
+"""
+from armazenamento import chave_paciente
+
+
+class ObservadorPacientes:
+
+    INTERVALO_MIN_MS = 1000
+    INTERVALO_MAX_MS = 30000
+
+    def __init__(self, armazenamento, agendar, cancelar, trabalhador, ao_mudar, ocupado=None):
+        """
+        ao_mudar(alterados, removidos): conjuntos de chaves, chamada na thread
+        do Tk. ocupado(): True enquanto houver gravações próprias em andamento
+        (a verificação é adiada, para não confundi-las com alterações externas).
+        """
+        self.armazenamento = armazenamento
+        self.agendar = agendar
+        self.cancelar = cancelar
+        self.trabalhador = trabalhador
+        self.ao_mudar = ao_mudar
+        self.ocupado = ocupado
+        self.versoes = None  # chave -> versão na última verificação
+        self.intervalo_ms = self.INTERVALO_MIN_MS
+        self.verificacoes = 0
+        self._agendamento = None
+        self._lendo = False
+        self._registradas = {}  # chave -> versão registrada durante a leitura em andamento
+
+    def iniciar(self):
+        self._agendar()
+
+    def parar(self):
+        if self._agendamento is not None:
+            self.cancelar(self._agendamento)
+            self._agendamento = None
+
+    def acelerar(self):
+        """Verifica logo (ex.: ao voltar para a janela) e recomeça a espera do mínimo."""
+        if self.intervalo_ms == self.INTERVALO_MIN_MS:
+            return
+        self.intervalo_ms = self.INTERVALO_MIN_MS
+        self.parar()
+        self._agendar()
+
+    def registrar(self, *nomes):
+        """Aceita a versão atual desses pacientes (gravados ou lidos por este programa)."""
+        for nome in nomes:
+            chave, versao = self._versao(nome)
+            if self._lendo:
+                self._registradas[chave] = versao
+            if self.versoes is None:
+                continue
+            if versao is None:
+                self.versoes.pop(chave, None)
+            else:
+                self.versoes[chave] = versao
+
+    def conflito(self, nome):
+        """True se o paciente mudou no armazenamento desde a última versão conhecida."""
+        if self.versoes is None:
+            return False
+        chave, versao = self._versao(nome)
+        conhecida = self.versoes.get(chave)
+        return conhecida is not None and versao != conhecida
+
+    def _versao(self, nome):
+        return chave_paciente(nome), self.armazenamento.versao(nome)
+
+    def _agendar(self):
+        self._agendamento = self.agendar(self.intervalo_ms, self._verificar)
+
+    def _verificar(self):
+        self._agendamento = None
+        if self._lendo or (self.ocupado is not None and self.ocupado()):
+            self._agendar()
+            return
+        self._lendo = True
+        self._registradas.clear()
+        self.trabalhador.enviar(self.armazenamento.versoes,
+                                ao_concluir=self._comparar, ao_falhar=self._falhou)
+
+    def _comparar(self, atuais):
+        self._lendo = False
+        if self.ocupado is not None and self.ocupado():
+            # Uma gravação própria terminou durante a leitura e ainda não foi
+            # registrada: a leitura é descartada e refeita depois
+            if self._agendamento is None:
+                self._agendar()
+            return
+        self.verificacoes += 1
+        anteriores = self.versoes
+        # Gravações registradas durante a leitura valem mais que o que foi lido
+        for chave, versao in self._registradas.items():
+            if versao is None:
+                atuais.pop(chave, None)
+            else:
+                atuais[chave] = versao
+        self.versoes = atuais
+        if anteriores is None:
+            alterados = removidos = set()  # Primeira leitura: só a referência
+        else:
+            alterados = {chave for chave, versao in atuais.items()
+                         if anteriores.get(chave) != versao}
+            removidos = set(anteriores) - set(atuais)
+        if alterados or removidos:
+            self.intervalo_ms = self.INTERVALO_MIN_MS
+            self.ao_mudar(alterados, removidos)
+        else:
+            self.intervalo_ms = min(self.intervalo_ms * 2, self.INTERVALO_MAX_MS)
+        if self._agendamento is None:
+            self._agendar()
+
+    def _falhou(self, erro):
+        # Pasta de rede indisponível, por exemplo: tenta de novo mais tarde
+        self._lendo = False
+        self.intervalo_ms = min(self.intervalo_ms * 2, self.INTERVALO_MAX_MS)
+        if self._agendamento is None:
+            self._agendar()
@@ -0,0 +1,173 @@
+"""
+Camada de persistência da avaliação aberta na tela.
+
+Cada salvar_* marca como "suja" apenas a seção que alterou; as marcações
+feitas num intervalo curto são agrupadas numa única gravação. A gravação em
+arquivo é atômica (arquivo temporário + fsync + rename), de modo que uma
+queda no meio da escrita nunca deixa o JSON do paciente pela metade.
+
+Uma gravação que falha é tentada de novo, com espera crescente: se o
+paciente ainda está na tela, as seções voltam a ficar sujas (os dados da
+tela são os mais novos); se já se trocou de paciente, o instantâneo que
+falhou é guardado e regravado antes das próximas gravações.
+"""
+import os
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+EstatisticaGravacao = namedtuple('EstatisticaGravacao',
+                                 'quando secoes bytes latencia_ms caminho nome')
+
+ESPERA_MAXIMA_MS = 60000  # Entre novas tentativas depois de falhas seguidas
+
+
+def gravar_atomico(caminho, conteudo):
+    """Grava 'conteudo' (bytes) em 'caminho' sem nunca expor um arquivo parcial."""
+    pasta = os.path.dirname(caminho) or '.'
+    os.makedirs(pasta, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(prefix='.tmp_', dir=pasta)
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Garante que o rename também chegou ao disco (POSIX)
+        fd_pasta = os.open(pasta, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd_pasta)
+        finally:
+            os.close(fd_pasta)
+    return len(conteudo)
+
+
+class GerenciadorPersistencia:
+    """
+    Controla as seções sujas e agrupa gravações.
+
+    obter_dados: função que devolve o documento atual (dict por seção).
+    agendar: função no estilo root.after(ms, callback); sem ela, grava na hora.
+    trabalhador: TrabalhadorES que faz a escrita fora da thread da interface;
+        o instantâneo serializado é sempre preparado na thread que chama.
+    ao_gravar / ao_falhar: chamadas com a EstatisticaGravacao ou a exceção.
+    """
+
+    def __init__(self, armazenamento, obter_dados, agendar=None, cancelar=None,
+                 atraso_ms=300, trabalhador=None, ao_gravar=None, ao_falhar=None):
+        self.armazenamento = armazenamento
+        self.obter_dados = obter_dados
+        self.agendar = agendar
+        self.cancelar = cancelar
+        self.atraso_ms = atraso_ms
+        self.trabalhador = trabalhador
+        self.ao_gravar = ao_gravar
+        self.ao_falhar = ao_falhar
+        self.sujas = set()
+        self.falhas = []  # (lote, secoes, nome) que falharam, de pacientes fora da tela
+        self.falhas_seguidas = 0
+        self.estatisticas = []
+        self._agendamento = None
+
+    def marcar(self, *secoes):
+        """Marca seções como alteradas e agenda a gravação agrupada."""
+        self.sujas.update(secoes)
+        if self.agendar is None:
+            self.gravar_agora()
+        elif self._agendamento is None:
+            self._agendamento = self.agendar(self.atraso_ms, self._gravar_agendado)
+
+    @property
+    def pendente(self):
+        return bool(self.sujas or self.falhas)
+
+    def _gravar_agendado(self):
+        self._agendamento = None
+        self.gravar_agora()
+
+    def gravar_agora(self):
+        """Grava imediatamente as seções sujas (ex.: antes de trocar de paciente)."""
+        if self._agendamento is not None and self.cancelar is not None:
+            self.cancelar(self._agendamento)
+        self._agendamento = None
+        # Instantâneos que falharam antes, na ordem, antes dos dados atuais
+        falhas, self.falhas = self.falhas, []
+        for lote, secoes, nome in falhas:
+            self._enviar(lote, secoes, nome)
+        if not self.sujas:
+            return None
+
+        secoes = tuple(sorted(self.sujas))
+        self.sujas.clear()
+        try:
+            dados = self.obter_dados()
+            nome = (dados.get('paciente') or {}).get('nome')
+            lote = self.armazenamento.preparar(dados, secoes)
+        except Exception as e:
+            self._falhou(secoes, e)
+            return None
+        return self._enviar(lote, secoes, nome)
+
+    def _enviar(self, lote, secoes, nome):
+        if self.trabalhador is None:
+            try:
+                return self._concluido(self._gravar_lote(lote, secoes, nome))
+            except Exception as e:
+                self._falhou(secoes, e, lote, nome)
+                return None
+
+        self.trabalhador.enviar(self._gravar_lote, lote, secoes, nome,
+                                ao_concluir=self._concluido,
+                                ao_falhar=lambda e: self._falhou(secoes, e, lote, nome))
+        return None
+
+    def descartar(self):
+        """Esquece as seções sujas sem gravá-las (ex.: ao recarregar o paciente do disco)."""
+        if self._agendamento is not None and self.cancelar is not None:
+            self.cancelar(self._agendamento)
+        self._agendamento = None
+        self.sujas.clear()
+
+    def _gravar_lote(self, lote, secoes, nome):
+        # Pode rodar na thread de E/S: não toca nos dados da interface
+        inicio = time.perf_counter()
+        caminho, tamanho = self.armazenamento.gravar(lote)
+        return EstatisticaGravacao(datetime.now(), secoes, tamanho,
+                                   (time.perf_counter() - inicio) * 1000, caminho, nome)
+
+    def _concluido(self, estatistica):
+        self.falhas_seguidas = 0
+        self.estatisticas.append(estatistica)
+        del self.estatisticas[:-100]
+        if self.ao_gravar is not None:
+            self.ao_gravar(estatistica)
+        return estatistica
+
+    def _falhou(self, secoes, erro, lote=None, nome=None):
+        self.falhas_seguidas += 1
+        if lote is not None and nome != self._nome_atual():
+            # O paciente saiu da tela: só o instantâneo tem essas alterações
+            self.falhas.append((lote, secoes, nome))
+        else:
+            # Mantém as seções sujas para a próxima tentativa
+            self.sujas.update(secoes)
+        if self.agendar is not None and self._agendamento is None:
+            espera = min(self.atraso_ms * 2 ** self.falhas_seguidas, ESPERA_MAXIMA_MS)
+            self._agendamento = self.agendar(espera, self._gravar_agendado)
+        if self.ao_falhar is None:
+            raise erro
+        self.ao_falhar(erro)
+
+    def _nome_atual(self):
+        try:
+            return (self.obter_dados().get('paciente') or {}).get('nome')
+        except Exception:
+            return None
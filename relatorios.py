@@ -0,0 +1,409 @@
+"""
+Relatórios em PDF, para a tela e para geração em lote.
+
+Cada seção do relatório (dados pessoais, antropometria, clínica, ...) é uma
+função registrada com @secao; os tipos de relatório (TIPOS_RELATORIO: o
+completo, o antropométrico, o clínico e o alimentar) são listas dessas
+seções, montadas por montar_relatorio, que mede o tempo de cada uma. Os
+estilos de parágrafo e de tabela são criados uma vez por processo.
+
+As seções usam só os dados da avaliação; os gráficos entram em vetor
+(graficos_pdf), sem matplotlib. gerar_pdf faz tudo a partir de um
+instantâneo dos dados, numa thread de trabalho da interface, informando o
+progresso (flowables já diagramados) e aceitando cancelamento.
+A geração em lote (python app.py --relatorios-lote) distribui os pacientes do
+armazenamento configurado (JSON ou SQLite) entre processos.
+"""
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+import composicao
+import nutricao
+from armazenamento import criar_armazenamento
+from graficos_pdf import desenho_dashboard
+from persistencia import gravar_atomico
+from serie_historica import carregar_historico
+
+
+# Estilos do processo: criados no primeiro relatório e reaproveitados nos demais
+_estilos = None
+_estilos_tabela = None
+
+
+def estilos():
+    global _estilos
+    if _estilos is None:
+        _estilos = getSampleStyleSheet()
+        _estilos.add(ParagraphStyle(
+            'CustomTitle',
+            parent=_estilos['Heading1'],
+            fontSize=16,
+            spaceAfter=20,
+            alignment=1  # Centralizado
+        ))
+    return _estilos
+
+
+def estilos_tabela():
+    """TableStyle compartilhados: 'rotulos' (1ª coluna em cinza), 'cabecalho' e 'macros'."""
+    global _estilos_tabela
+    if _estilos_tabela is None:
+        base = [
+            ('BOX', (0,0), (-1,-1), 1, colors.black),
+            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+            ('FONTSIZE', (0,0), (-1,-1), 10),
+            ('VALIGN',(0,0),(-1,-1),'MIDDLE')
+        ]
+        _estilos_tabela = {
+            'rotulos': TableStyle([('BACKGROUND', (0, 0), (0, -1), colors.lightgrey)] + base),
+            'cabecalho': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0,0),(-1,0), colors.whitesmoke),
+            ] + base),
+            'macros': TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey)] + base + [
+                ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+                ('ALIGN', (1,0), (-1,-1), 'RIGHT'),
+            ]),
+        }
+    return _estilos_tabela
+
+
+def _tabela(linhas, larguras, estilo='rotulos'):
+    tabela = Table(linhas, colWidths=larguras, hAlign='LEFT')
+    tabela.setStyle(estilos_tabela()[estilo])
+    return tabela
+
+
+# Registro das seções: nome -> função(dados, historico, cores) que devolve os
+# flowables da seção (lista vazia quando não há o que mostrar)
+SECOES_RELATORIO = {}
+
+
+def secao(nome):
+    def registrar(funcao):
+        SECOES_RELATORIO[nome] = funcao
+        return funcao
+    return registrar
+
+
+# Tipo de relatório -> (título, seções na ordem em que aparecem)
+TIPOS_RELATORIO = {
+    'completo': ("RELATÓRIO DE AVALIAÇÃO NUTRICIONAL - IDOSOS",
+                 ['pessoais', 'antropometria', 'clinica', 'alimentar', 'intervencao',
+                  'evolucao', 'dashboard', 'historico']),
+    'antropometrico': ("RELATÓRIO ANTROPOMÉTRICO - IDOSOS",
+                       ['pessoais', 'antropometria', 'evolucao', 'historico']),
+    'clinico': ("RELATÓRIO CLÍNICO - IDOSOS", ['pessoais', 'clinica']),
+    'alimentar': ("RELATÓRIO ALIMENTAR - IDOSOS", ['pessoais', 'alimentar', 'intervencao']),
+}
+
+
+def montar_relatorio(dados, historico, cores, tipo='completo', tempos=None):
+    """
+    Conteúdo (flowables) de um relatório de TIPOS_RELATORIO.
+
+    dados: avaliação completa (dict por seção, como no JSON do paciente);
+    historico: SerieAntropometrica; cores: paleta do dashboard (CORES);
+    tempos: dict opcional que recebe os segundos gastos em cada seção.
+    """
+    titulo, secoes = TIPOS_RELATORIO[tipo]
+    story = [Paragraph(titulo, estilos()['CustomTitle']), Spacer(1, 12)]
+    for nome in secoes:
+        inicio = time.perf_counter()
+        story.extend(SECOES_RELATORIO[nome](dados, historico, cores))
+        if tempos is not None:
+            tempos[nome] = time.perf_counter() - inicio
+    return story
+
+
+@secao('pessoais')
+def secao_pessoais(dados, historico, cores):
+    paciente = dados.get('paciente') or {}
+    if not paciente:
+        return []
+    linhas = [[rotulo, paciente.get(key, '')] for rotulo, key in [
+        ("Nome:", 'nome'),
+        ("Data de Nascimento:", 'data_nascimento'),
+        ("Idade:", 'idade'),
+        ("Sexo:", 'sexo'),
+        ("Nº de Registro:", 'registro'),
+        ("Telefone:", 'telefone'),
+        ("Email:", 'email'),
+        ("Endereço:", 'endereco'),
+        ("Contato de Emergência:", 'contato_emergencia'),
+        ("Telefone de Emergência:", 'telefone_emergencia'),
+        ("Data da Admissão:", 'data_admissao'),
+    ]]
+    return [Paragraph("DADOS PESSOAIS", estilos()['Heading2']),
+            _tabela(linhas, [2*inch, 4*inch]), Spacer(1, 12)]
+
+
+@secao('antropometria')
+def secao_antropometria(dados, historico, cores):
+    antropometricos = dados.get('antropometricos') or {}
+    if not antropometricos:
+        return []
+    linhas = [[rotulo, f"{antropometricos.get(key, '')}"] for rotulo, key in [
+        ("IMC:", 'imc'),
+        ("Classificação IMC:", 'classificacao_imc'),
+        ("RCQ:", 'rcq'),
+        ("Classificação RCQ:", 'classificacao_rcq'),
+        ("Perda de Peso (%):", 'perda_peso_perc'),
+        ("CMB (cm):", 'cmb'),
+        ("AMB (cm²):", 'amb')
+    ]]
+    return [Paragraph("AVALIAÇÃO ANTROPOMÉTRICA", estilos()['Heading2']),
+            _tabela(linhas, [2*inch, 4*inch]), Spacer(1, 12)]
+
+
+@secao('clinica')
+def secao_clinica(dados, historico, cores):
+    clinicos = dados.get('clinicos') or {}
+    if not clinicos:
+        return []
+    styles = estilos()
+    story = [Paragraph("AVALIAÇÃO CLÍNICA", styles['Heading2'])]
+    # Doenças e condições
+    doencas = clinicos.get('doencas', [])
+    story.append(Paragraph(f"<b>Doenças/Condições:</b> {', '.join(doencas)}", styles['Normal']))
+    story.append(Spacer(1, 6))
+    # Medicamentos
+    meds = clinicos.get('medicamentos', '')
+    story.append(Paragraph(f"<b>Medicamentos:</b> {meds}", styles['Normal']))
+    story.append(Spacer(1, 6))
+    # Exames laboratoriais
+    lab_items = [[rotulo, clinicos.get(key, '')] for rotulo, key in [
+        ("Glicemia (mg/dL):", 'glicemia'),
+        ("Hemoglobina (g/dL):", 'hemoglobina'),
+        ("Colesterol Total (mg/dL):", 'colesterol_total'),
+        ("HDL (mg/dL):", 'hdl'),
+        ("LDL (mg/dL):", 'ldl'),
+        ("Triglicerídeos (mg/dL):", 'triglicerideos')
+    ]]
+    story += [_tabela(lab_items, [2*inch, 4*inch]), Spacer(1, 12)]
+    return story
+
+
+@secao('alimentar')
+def secao_alimentar(dados, historico, cores):
+    alimentares = dados.get('alimentares') or {}
+    if not alimentares:
+        return []
+    styles = estilos()
+    story = [Paragraph("AVALIAÇÃO ALIMENTAR", styles['Heading2'])]
+    # Recordatório
+    record = alimentares.get('recordatorio', {})
+    for refeicao, texto in record.items():
+        story.append(Paragraph(f"<b>{refeicao}:</b> {texto}", styles['Normal']))
+        story.append(Spacer(1, 4))
+    story.append(Spacer(1, 6))
+    # Energia e macronutrientes de cada refeição (tabela de composição)
+    por_refeicao, total = composicao.analisar_recordatorio(record)
+    if total[0] > 0:
+        macro_table = [["Refeição", "kcal", "CHO (g)", "PTN (g)", "LIP (g)"]]
+        for refeicao, totais in list(por_refeicao.items()) + [("Total", total)]:
+            macro_table.append([refeicao, f"{totais[0]:.0f}"] + [f"{v:.1f}" for v in totais[1:]])
+        story += [_tabela(macro_table, [2*inch] + [inch] * 4, 'macros'), Spacer(1, 12)]
+    # Frequência alimentar
+    freq = alimentares.get('frequencia', {})
+    freq_table = [[rotulo, freq.get(rotulo, '')] for rotulo in freq]
+    if freq_table:
+        story += [_tabela(freq_table, [3*inch, 3*inch]), Spacer(1, 12)]
+    return story
+
+
+@secao('intervencao')
+def secao_intervencao(dados, historico, cores):
+    interven = dados.get('intervencao') or {}
+    if not interven:
+        return []
+    styles = estilos()
+    story = [Paragraph("INTERVENÇÃO NUTRICIONAL", styles['Heading2']), Spacer(1, 12)]
+    for rotulo, chave in [("Objetivos", 'objetivos'), ("Dieta", 'dieta'),
+                          ("Suplementação", 'suplementacao'), ("Recomendações", 'recomendacoes')]:
+        story.append(Paragraph(f"<b>{rotulo}:</b> {interven.get(chave, '')}", styles['Normal']))
+        story.append(Spacer(1, 6))
+    story[-1] = Spacer(1, 12)
+    return story
+
+
+@secao('evolucao')
+def secao_evolucao(dados, historico, cores):
+    evolucao = dados.get('evolucao') or {}
+    if not evolucao:
+        return []
+    evo_table = [[rotulo, evolucao.get(chave, '')] for rotulo, chave in [
+        ("Peso (kg):", 'peso_evo'),
+        ("IMC (kg/m²):", 'imc_evo'),
+        ('Estado Nutricional:', 'estado_nutri_evo'),
+        ('Adesão à Dieta:', 'adesao_dieta_evo'),
+        ('Apetite:', 'apetite_evo'),
+        ('Evolução Clínica:', 'evolucao_clinica_evo'),
+        ('Circunferência do Braço (cm):', 'circ_braco_evo'),
+        ('Circunferência Muscular do Braço (cm):', 'circ_musc_braco_evo'),
+        ('Circunferência da Panturrilha (cm):', 'circ_panturrilha_evo'),
+        ('Circunferência da Cintura (cm):', 'circ_cintura_evo'),
+        ('Circunferência do Quadril (cm):', 'circ_quadril_evo'),
+        ('Circunferência Abdominal (cm):', 'circ_abdominal_evo'),
+        ('Dobra Cutânea Tricipital (mm):', 'dobra_triceps_evo'),
+        ('Dobra Cutânea Bicipital (mm):', 'dobra_biceps_evo'),
+        ('Dobra Cutânea Subescapular (mm):', 'dobra_subescapular_evo'),
+        ('Dobra Cutânea Suprailiaca (mm):', 'dobra_suprailiaca_evo'),
+        ('Dobra Cutânea Abdominal (mm):', 'dobra_abdominal_evo'),
+        ('Dobra Cutânea Peitoral (mm):', 'dobra_peitoral_evo'),
+        ('Dobra Cutânea Axilar (mm):', 'dobra_axilar_evo'),
+        ("Avaliador:", 'nome_avaliador_evo')
+    ]]
+    return [Paragraph("EVOLUÇÃO NUTRICIONAL", estilos()['Heading2']),
+            _tabela(evo_table, [3*inch, 4*inch]), Spacer(1, 12)]
+
+
+@secao('dashboard')
+def secao_dashboard(dados, historico, cores):
+    styles = estilos()
+    alimentares = dados.get('alimentares') or {}
+    status, risco = nutricao.avaliar(dados)
+    return [
+        Paragraph("DASHBOARD NUTRICIONAL", styles['Heading2']),
+        Spacer(1, 12),
+        Paragraph(f"<b>Status Nutricional:</b> {status}", styles['Normal']),
+        Paragraph(f"<b>Risco Nutricional:</b> {risco}", styles['Normal']),
+        Spacer(1, 12),
+        # Gráficos em vetor, 6.5 polegadas de largura (reaproveitados se os dados não mudaram)
+        desenho_dashboard(
+            dados.get('antropometricos') or {}, historico, alimentares.get('frequencia') or {},
+            composicao.macros_recordatorio(alimentares.get('recordatorio') or {}), cores),
+        Spacer(1, 12),
+    ]
+
+
+@secao('historico')
+def secao_historico(dados, historico, cores):
+    hist_table = [[data, '' if peso is None else f"{peso:g}"]
+                  for data, peso in historico.para_lista()]
+    if not hist_table:
+        return []
+    return [Paragraph("HISTÓRICO DE CONSULTAS", estilos()['Heading2']),
+            _tabela([["Data", "Peso (kg)"]] + hist_table, [3*inch, 3*inch], 'cabecalho'),
+            Spacer(1, 12)]
+
+
+class RelatorioCancelado(Exception):
+    pass
+
+
+def construir_pdf(nome_arquivo, story, ao_progresso=None, cancelado=None):
+    """
+    Diagrama o story e grava o PDF de forma atômica (um relatório cancelado
+    ou com erro não deixa arquivo pela metade).
+
+    ao_progresso(feitos, total): chamada a cada flowable diagramado;
+    cancelado(): se retornar True, interrompe com RelatorioCancelado.
+    """
+    total = len(story)
+
+    def progresso(tipo, valor):
+        if tipo != 'PROGRESS':
+            return
+        if cancelado is not None and cancelado():
+            raise RelatorioCancelado()
+        if ao_progresso is not None:
+            ao_progresso(valor, total)
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4)
+    doc.setProgressCallBack(progresso)
+    doc.build(story)
+    gravar_atomico(nome_arquivo, buf.getvalue())
+    return nome_arquivo
+
+
+def gerar_pdf(nome_arquivo, dados, historico, cores, ao_progresso=None, cancelado=None,
+              tipo='completo', tempos=None):
+    """
+    Relatório do tipo pedido a partir de um instantâneo (dados e histórico
+    copiados). tempos recebe os segundos de cada seção e da 'diagramacao'.
+    """
+    if cancelado is not None and cancelado():
+        raise RelatorioCancelado()
+    story = montar_relatorio(dados, historico, cores, tipo, tempos)
+    inicio = time.perf_counter()
+    construir_pdf(nome_arquivo, story, ao_progresso, cancelado)
+    if tempos is not None:
+        tempos['diagramacao'] = time.perf_counter() - inicio
+    return nome_arquivo
+
+
+def resumo_tempos(tempos):
+    """'62 ms (diagramacao 40 ms, dashboard 9 ms, ...)': as três etapas mais demoradas."""
+    partes = sorted(tempos.items(), key=lambda item: -item[1])
+    return (f"{sum(tempos.values()) * 1000:.0f} ms ("
+            + ", ".join(f"{nome} {segundos * 1000:.0f} ms" for nome, segundos in partes[:3]) + ")")
+
+
+# Geração em lote
+def nome_relatorio(chave):
+    """chave do paciente -> relatorio_<chave>.pdf"""
+    return f"relatorio_{chave}.pdf"
+
+
+_armazenamentos = {}  # (tipo, pasta) -> armazenamento aberto por este processo
+
+
+def gerar_relatorio(tipo, pasta_pacientes, chave, pasta_saida, cores):
+    """
+    Gera o PDF de um paciente num processo de trabalho, que abre o próprio
+    armazenamento (JSON ou SQLite). Retorna (arquivo PDF, segundos).
+    """
+    inicio = time.perf_counter()
+    if (tipo, pasta_pacientes) not in _armazenamentos:
+        _armazenamentos[tipo, pasta_pacientes] = criar_armazenamento(tipo, pasta_pacientes)
+    dados = _armazenamentos[tipo, pasta_pacientes].carregar(chave)
+    historico = carregar_historico(dados.get('historico'), pasta_pacientes)
+    story = montar_relatorio(dados, historico, cores)
+
+    saida = construir_pdf(os.path.join(pasta_saida, nome_relatorio(chave)), story)
+    return saida, time.perf_counter() - inicio
+
+
+def gerar_lote(armazenamento, pasta_pacientes, pasta_saida, cores, processos=None,
+               ao_progresso=None):
+    """
+    Gera o relatório de cada paciente do armazenamento em pasta_saida.
+
+    Uma falha num paciente não interrompe o lote. ao_progresso(feitos, total,
+    chave, resultado, erro) é chamada a cada relatório concluído, com
+    resultado = (PDF, segundos) ou erro = a exceção.
+    Retorna (gerados, falhas), listas de (chave, resultado ou erro).
+    """
+    chaves = sorted(armazenamento.versoes())
+    os.makedirs(pasta_saida, exist_ok=True)
+    gerados, falhas = [], []
+    if not chaves:
+        return gerados, falhas
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(gerar_relatorio, armazenamento.tipo, pasta_pacientes, chave,
+                                   pasta_saida, cores): chave
+                   for chave in chaves}
+        for futuro in as_completed(futuros):
+            chave = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                falhas.append((chave, e))
+                resultado, erro = None, e
+            else:
+                gerados.append((chave, resultado))
+                erro = None
+            if ao_progresso is not None:
+                ao_progresso(len(gerados) + len(falhas), len(chaves), chave, resultado, erro)
+    return gerados, falhas
@@ -0,0 +1,218 @@
+"""
+Histórico antropométrico em colunas NumPy.
+
+Cada medida do histórico é um array: o tempo em segundos desde a época
+(int64) e uma coluna float32 para peso, IMC, circunferências e dobras
+cutâneas (NaN quando a medida não foi informada na consulta). Em disco,
+cada coluna é um .npy em pacientes/historico/<chave>/, que pode ser aberto
+com memory-map: históricos longos carregam e são plotados sem criar um
+objeto Python por consulta.
+"""
+import io
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from persistencia import gravar_atomico
+
+# Coluna da série -> campo em dados_antropometricos
+CAMPOS = {
+    'peso': 'peso_atual',
+    'imc': 'imc',
+    'circ_braco': 'circ_braco',
+    'circ_musc_braco': 'circ_musc_braco',
+    'circ_panturrilha': 'circ_panturrilha',
+    'circ_cintura': 'circ_cintura',
+    'circ_quadril': 'circ_quadril',
+    'circ_abdominal': 'circ_abdominal',
+    'dobra_triceps': 'dobra_triceps',
+    'dobra_biceps': 'dobra_biceps',
+    'dobra_subescapular': 'dobra_subescapular',
+    'dobra_suprailiaca': 'dobra_suprailiaca',
+    'dobra_abdominal': 'dobra_abdominal',
+    'dobra_peitoral': 'dobra_peitoral',
+    'dobra_axilar': 'dobra_axilar',
+}
+
+FORMATO_DATA_LEGADO = "%d/%m/%Y %H:%M"
+
+
+class SerieAntropometrica:
+
+    def __init__(self, tempo=None, colunas=None):
+        self._tempo = np.asarray(tempo if tempo is not None else [], dtype=np.int64)
+        self._colunas = {}
+        for nome in CAMPOS:
+            valores = (colunas or {}).get(nome)
+            if valores is None or len(valores) != len(self._tempo):
+                valores = np.full(len(self._tempo), np.nan, dtype=np.float32)
+            self._colunas[nome] = np.asarray(valores, dtype=np.float32)
+        self._n = len(self._tempo)
+
+    def __len__(self):
+        return self._n
+
+    # Acesso às colunas (visões, sem cópia)
+    @property
+    def tempo(self):
+        return self._tempo[:self._n]
+
+    def coluna(self, nome):
+        return self._colunas[nome][:self._n]
+
+    def datas(self):
+        """Tempo no horário local como datetime64, aceito diretamente pelo matplotlib."""
+        return tempo_local(self.tempo).astype('datetime64[s]')
+
+    def ultimo(self, nome):
+        valores = self.coluna(nome)
+        validos = valores[~np.isnan(valores)]
+        return float(validos[-1]) if len(validos) else None
+
+    # Escrita
+    def anexar(self, quando, antropometricos):
+        """Acrescenta uma consulta a partir de dados_antropometricos."""
+        if self._n == len(self._tempo):
+            self._crescer()
+        self._tempo[self._n] = int(quando.timestamp())
+        for nome, campo in CAMPOS.items():
+            valor = antropometricos.get(campo)
+            try:
+                self._colunas[nome][self._n] = float(valor)
+            except (TypeError, ValueError):
+                self._colunas[nome][self._n] = np.nan
+        self._n += 1
+
+    def _crescer(self):
+        # Dobra a capacidade; também troca arrays somente leitura (memory-map)
+        # por cópias em memória na primeira consulta acrescentada
+        capacidade = max(16, 2 * len(self._tempo))
+        tempo = np.zeros(capacidade, dtype=np.int64)
+        tempo[:self._n] = self._tempo[:self._n]
+        self._tempo = tempo
+        for nome, valores in self._colunas.items():
+            novo = np.full(capacidade, np.nan, dtype=np.float32)
+            novo[:self._n] = valores[:self._n]
+            self._colunas[nome] = novo
+
+    def copia(self):
+        """Instantâneo independente (para gravar em outra thread)."""
+        return SerieAntropometrica(self.tempo.copy(),
+                                   {nome: self.coluna(nome).copy() for nome in CAMPOS})
+
+    # Persistência
+    def salvar(self, pasta):
+        """Grava uma .npy por coluna, de forma atômica. Retorna os bytes gravados."""
+        total = 0
+        colunas = [('tempo', self.tempo)] + [(nome, self.coluna(nome)) for nome in CAMPOS]
+        for nome, valores in colunas:
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(valores))
+            total += gravar_atomico(os.path.join(pasta, f"{nome}.npy"), buffer.getvalue())
+        return total
+
+    @classmethod
+    def carregar(cls, pasta, mmap=True):
+        modo = 'r' if mmap else None
+        try:
+            tempo = np.load(os.path.join(pasta, 'tempo.npy'), mmap_mode=modo)
+        except FileNotFoundError:
+            return cls()
+        colunas = {}
+        for nome in CAMPOS:
+            caminho = os.path.join(pasta, f"{nome}.npy")
+            if os.path.exists(caminho):
+                colunas[nome] = np.load(caminho, mmap_mode=modo)
+        serie = cls.__new__(cls)
+        serie._tempo = tempo
+        serie._n = len(tempo)
+        serie._colunas = {nome: colunas.get(nome, np.full(len(tempo), np.nan, dtype=np.float32))
+                          for nome in CAMPOS}
+        return serie
+
+    # Compatibilidade com o formato antigo (lista de dicts em 'historico')
+    @classmethod
+    def de_lista(cls, historico):
+        tempo, pesos = [], []
+        for consulta in historico:
+            try:
+                quando = datetime.strptime(consulta.get('data', ''), FORMATO_DATA_LEGADO)
+            except ValueError:
+                continue
+            tempo.append(int(quando.timestamp()))
+            try:
+                pesos.append(float(consulta.get('peso')))
+            except (TypeError, ValueError):
+                pesos.append(np.nan)
+        return cls(tempo, {'peso': pesos})
+
+    def para_lista(self, campos=('peso',)):
+        """Linhas [data 'dd/mm/AAAA HH:MM', valores...] para tabelas de relatório."""
+        linhas = []
+        colunas = [self.coluna(nome) for nome in campos]
+        for i, segundos in enumerate(self.tempo):
+            data = datetime.fromtimestamp(int(segundos)).strftime(FORMATO_DATA_LEGADO)
+            linhas.append([data] + [None if np.isnan(c[i]) else float(c[i]) for c in colunas])
+        return linhas
+
+
+def tempo_local(tempo):
+    """
+    Segundos desde a época (UTC) -> mesmos instantes no horário local.
+    datetime64 não tem fuso e é exibido como UTC; somando o deslocamento
+    local, os gráficos mostram o mesmo dia e hora que para_lista. O
+    deslocamento (que muda no horário de verão) é calculado uma vez por hora
+    distinta, não por consulta.
+    """
+    tempo = np.asarray(tempo, dtype=np.int64)
+    if not len(tempo):
+        return tempo.copy()
+    horas, posicoes = np.unique(tempo // 3600, return_inverse=True)
+    deslocamentos = np.array([time.localtime(int(hora) * 3600).tm_gmtoff for hora in horas],
+                             dtype=np.int64)
+    return tempo + deslocamentos[posicoes.reshape(tempo.shape)]
+
+
+def pasta_serie(pasta_pacientes, chave):
+    return os.path.join(pasta_pacientes, 'historico', chave)
+
+
+def carregar_historico(historico, pasta_pacientes):
+    """
+    Série a partir da seção 'historico' de uma avaliação: a referência aos
+    .npy (formato atual) ou a lista de consultas (formato antigo).
+    """
+    if isinstance(historico, dict) and historico.get('formato') == 'npy':
+        return SerieAntropometrica.carregar(os.path.join(pasta_pacientes, historico['pasta']))
+    if isinstance(historico, list):
+        return SerieAntropometrica.de_lista(historico)
+    return SerieAntropometrica()
+
+
+def referencia_historico(chave, serie):
+    """O que vai na seção 'historico' do JSON: só a localização da série."""
+    return {'formato': 'npy', 'pasta': f"historico/{chave}", 'registros': len(serie)}
+
+
+def reduzir_min_max(x, y, baldes):
+    """
+    Reduz a série (x crescente) a no máximo ~2 pontos por balde de mesma
+    largura em x: o menor e o maior y de cada balde, mais o primeiro e o
+    último ponto, na ordem original. Custo O(n), sem laço em Python.
+    """
+    n = len(x)
+    if n <= 2 * baldes:
+        return x, y
+    bordas = np.linspace(x[0], x[-1], baldes + 1)[:-1]
+    inicios = np.unique(np.searchsorted(x, bordas))  # baldes vazios são descartados
+    balde = np.repeat(np.arange(len(inicios)), np.diff(np.append(inicios, n)))
+    indices = [[0, n - 1]]
+    for extremo in (np.minimum.reduceat(y, inicios), np.maximum.reduceat(y, inicios)):
+        # Primeira posição de cada balde em que o extremo é atingido
+        posicoes = np.flatnonzero(y == extremo[balde])
+        _, primeiras = np.unique(balde[posicoes], return_index=True)
+        indices.append(posicoes[primeiras])
+    indices = np.unique(np.concatenate(indices))
+    return x[indices], y[indices]
@@ -0,0 +1,111 @@
+"""
+Pacientes abertos recentemente, mantidos em memória (cache LRU).
+
+Ao trocar de paciente, o modelo do anterior (dados de todas as seções, série
+antropométrica e linha do tempo das evoluções) é guardado aqui, já gravado em
+disco; reabri-lo é um acerto do cache, sem ler o arquivo nem decodificar o
+JSON. O cache tem um orçamento de memória: quando o total estimado passa do
+limite, os pacientes usados há mais tempo são descartados.
+
+O tamanho de cada modelo é estimado percorrendo os dicionários e listas com
+sys.getsizeof e somando os bytes dos arrays NumPy; é uma aproximação, mas
+suficiente para manter o total na ordem de grandeza do limite.
+"""
+import os
+import sys
+from collections import OrderedDict
+
+LIMITE_PADRAO_MB = 64  # Substituível pela variável de ambiente NUTRI_CACHE_MB
+
+
+def tamanho_aproximado(objeto, vistos=None):
+    """Bytes ocupados por objeto e pelo que ele contém (dict, list, tuple, arrays)."""
+    if vistos is None:
+        vistos = set()
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    nbytes = getattr(objeto, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes  # array NumPy
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        total += sum(tamanho_aproximado(chave, vistos) + tamanho_aproximado(valor, vistos)
+                     for chave, valor in objeto.items())
+    elif isinstance(objeto, (list, tuple, set)):
+        total += sum(tamanho_aproximado(item, vistos) for item in objeto)
+    elif hasattr(objeto, '__dict__'):
+        total += tamanho_aproximado(vars(objeto), vistos)
+    return total
+
+
+class ModeloPaciente:
+    """O que é preciso para reabrir um paciente sem ir ao disco."""
+
+    def __init__(self, nome, dados, historico, linha_tempo=None):
+        self.nome = nome
+        self.dados = dados
+        self.historico = historico
+        self.linha_tempo = linha_tempo
+        self.tamanho = tamanho_aproximado((dados, historico, linha_tempo))
+
+
+class CacheSessao:
+
+    def __init__(self, limite_bytes=None):
+        if limite_bytes is None:
+            limite_bytes = int(float(os.environ.get('NUTRI_CACHE_MB', LIMITE_PADRAO_MB))
+                               * 1024 * 1024)
+        self.limite_bytes = limite_bytes
+        self._modelos = OrderedDict()  # chave do paciente -> ModeloPaciente
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._modelos)
+
+    def __contains__(self, chave):
+        return chave in self._modelos
+
+    def guardar(self, chave, modelo):
+        """Guarda (ou substitui) o modelo e descarta os menos recentes se passar do limite."""
+        self.remover(chave)
+        if modelo.tamanho > self.limite_bytes:
+            return  # Sozinho já não caberia
+        self._modelos[chave] = modelo
+        self.bytes += modelo.tamanho
+        while self.bytes > self.limite_bytes:
+            _, antigo = self._modelos.popitem(last=False)
+            self.bytes -= antigo.tamanho
+            self.descartes += 1
+
+    def retirar(self, chave):
+        """
+        Modelo do paciente, retirado do cache (o paciente aberto não fica no
+        cache: volta para ele ao ser trocado por outro), ou None.
+        """
+        modelo = self.remover(chave)
+        if modelo is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+        return modelo
+
+    def remover(self, chave):
+        modelo = self._modelos.pop(chave, None)
+        if modelo is not None:
+            self.bytes -= modelo.tamanho
+        return modelo
+
+    def recentes(self):
+        """[(chave, nome)] do paciente usado mais recentemente ao mais antigo."""
+        return [(chave, modelo.nome) for chave, modelo in reversed(self._modelos.items())]
+
+    def resumo(self):
+        consultas = self.acertos + self.faltas
+        taxa = f"{self.acertos * 100 / consultas:.0f}%" if consultas else "-"
+        return (f"{len(self)} pacientes, {self.bytes / 1024 / 1024:.1f} de "
+                f"{self.limite_bytes / 1024 / 1024:.0f} MB | acertos {self.acertos}, "
+                f"faltas {self.faltas} ({taxa}), descartes {self.descartes}")
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+from diario_evolucao import (INTERVALO_COMPLETA, MARCA_DIFERENCA, DiarioEvolucao,
+                             LinhaTempoEvolucao)
+
+INICIO = datetime(2025, 1, 1, 9, 0)
+
+
+def visitas(n):
+    """Evoluções em que só o peso muda todo dia; o avaliador troca e a nota some às vezes."""
+    resultado = []
+    for dia in range(n):
+        visita = {'peso_evo': f"{60 + dia * 0.1:.1f}",
+                  'nome_avaliador_evo': "Ana" if dia // 5 % 2 else "Carlos"}
+        if dia % 3:
+            visita['evolucao_clinica_evo'] = "Sem queixas"
+        resultado.append(visita)
+    return resultado
+
+
+def preencher(pasta, dados):
+    diario = DiarioEvolucao(pasta, "Maria da Silva")
+    for dia, visita in enumerate(dados):
+        diario.anexar(visita, INICIO + timedelta(days=dia))
+    return diario
+
+
+def test_anexar_e_ler_atravessando_evolucoes_completas(tmp_path):
+    dados = visitas(2 * INTERVALO_COMPLETA + 3)
+    diario = preencher(tmp_path, dados)
+
+    marcas = [posicao & MARCA_DIFERENCA for _, posicao in diario._registros()]
+    completas = [i for i, marca in enumerate(marcas) if not marca]
+    assert completas == [0, INTERVALO_COMPLETA, 2 * INTERVALO_COMPLETA]
+
+    assert [e['evolucao'] for e in diario.todas()] == dados
+    # Janelas que começam numa diferença, numa completa e logo antes dela
+    for inicio in (1, INTERVALO_COMPLETA - 1, INTERVALO_COMPLETA, INTERVALO_COMPLETA + 1):
+        lidas = diario.ler(inicio, inicio + 3)
+        assert [e['evolucao'] for e in lidas] == dados[inicio:inicio + 3]
+    assert diario.ultimos(1)[0]['evolucao'] == dados[-1]
+
+
+def test_diario_reaberto_continua_as_diferencas(tmp_path):
+    dados = visitas(INTERVALO_COMPLETA + 5)
+    preencher(tmp_path, dados[:7])
+    diario = DiarioEvolucao(tmp_path, "Maria da Silva")
+    for dia, visita in enumerate(dados[7:], 7):
+        diario.anexar(visita, INICIO + timedelta(days=dia))
+    assert [e['evolucao'] for e in DiarioEvolucao(tmp_path, "Maria da Silva").todas()] == dados
+
+
+def test_reescrever_mantem_o_conteudo(tmp_path):
+    dados = visitas(INTERVALO_COMPLETA + 4)
+    diario = preencher(tmp_path, dados)
+    invertidas = list(reversed(diario.todas()))
+    diario.reescrever(invertidas)
+    assert diario.todas() == invertidas
+
+
+def test_linha_tempo_le_so_a_janela(tmp_path):
+    dados = visitas(40)
+    linha = LinhaTempoEvolucao(preencher(tmp_path, dados))
+    inicio = (INICIO + timedelta(days=30)).timestamp()
+    janela = linha.evolucoes(inicio)
+    assert [dados_visita for _, dados_visita in janela] == dados[30:]
+    assert linha.lidas == 10
+
+
+def test_indice_reconstruido_apos_linha_truncada(tmp_path):
+    dados = visitas(5)
+    diario = preencher(tmp_path, dados)
+    with open(diario.caminho, 'ab') as f:
+        f.write(b'{"data":"2025-01-06T09:00:00","mud')  # Gravação interrompida
+    diario = DiarioEvolucao(tmp_path, "Maria da Silva")
+    assert [e['evolucao'] for e in diario.todas()] == dados
+
+
+def test_indice_faltando_registro_e_reconstruido(tmp_path):
+    dados = visitas(6)
+    diario = preencher(tmp_path, dados)
+    with open(diario.caminho_indice, 'r+b') as f:
+        f.truncate(4 * 16)  # Queda entre a linha e o registro do índice
+    diario = DiarioEvolucao(tmp_path, "Maria da Silva")
+    assert len(diario) == 6
+    assert [e['evolucao'] for e in diario.todas()] == dados
+
+
+def test_linha_corrompida_no_fim_vai_para_quarentena(tmp_path):
+    dados = visitas(5)
+    diario = preencher(tmp_path, dados)
+    with open(diario.caminho, 'ab') as f:
+        f.write(b'garbage\n')
+    diario = DiarioEvolucao(tmp_path, "Maria da Silva")
+    assert [e['evolucao'] for e in diario.todas()] == dados
+    with open(diario.caminho_corrompido, 'rb') as f:
+        assert f.read() == b'garbage\n'
+
+
+def test_linha_corrompida_no_meio_separa_as_diferencas_dependentes(tmp_path):
+    dados = visitas(5)
+    diario = preencher(tmp_path, dados)
+    with open(diario.caminho, 'rb') as f:
+        linhas = f.readlines()
+    linhas[2] = b'#' * (len(linhas[2]) - 1) + b'\n'  # Mesmo tamanho: o índice não percebe
+    with open(diario.caminho, 'wb') as f:
+        f.writelines(linhas)
+
+    diario = DiarioEvolucao(tmp_path, "Maria da Silva")
+    assert [e['evolucao'] for e in diario.ler()] == dados[:2]
+    with open(diario.caminho_corrompido, 'rb') as f:
+        assert f.read() == b''.join(linhas[2:])
+    # O diário continua aceitando evoluções
+    diario.anexar(dados[4], INICIO + timedelta(days=10))
+    assert diario.ultimos(1)[0]['evolucao'] == dados[4]
+
+
+def test_linha_tempo_recarrega_apos_quarentena(tmp_path):
+    dados = visitas(5)
+    diario = preencher(tmp_path, dados)
+    linha = LinhaTempoEvolucao(diario)
+    with open(diario.caminho, 'rb') as f:
+        linhas = f.readlines()
+    linhas[3] = b'#' * (len(linhas[3]) - 1) + b'\n'
+    with open(diario.caminho, 'wb') as f:
+        f.writelines(linhas)
+    assert [dados_visita for _, dados_visita in linha.evolucoes()] == dados[:3]
+    assert len(linha) == 3
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from armazenamento import ArmazenamentoJSON, secoes_vazias
+from importacao import importar_csv, mapear_colunas
+from serie_historica import carregar_historico
+
+
+@pytest.fixture
+def armazenamento(tmp_path):
+    pasta = tmp_path / 'pacientes'
+    pasta.mkdir()
+    return ArmazenamentoJSON(str(pasta))
+
+
+def csv(tmp_path, texto):
+    caminho = tmp_path / 'admissoes.csv'
+    caminho.write_text(texto, encoding='utf-8')
+    return str(caminho)
+
+
+def test_linhas_mescladas_ao_paciente_existente(tmp_path, armazenamento):
+    existente = secoes_vazias()
+    existente['paciente'] = {'nome': 'Ana Souza', 'registro': '123', 'sexo': 'Feminino'}
+    existente['antropometricos'] = {'altura': 160.0, 'circ_cintura': 80.0}
+    existente['clinicos'] = {'doencas': ['Diabetes']}
+    armazenamento.salvar(existente)
+
+    caminho = csv(tmp_path, "Nome;Peso Atual (kg);Data da Medição\n"
+                            "Ana Souza;64,0;01/02/2025\n"
+                            "Ana Souza;62,5;01/03/2025\n")
+    resumo = importar_csv(caminho, armazenamento, armazenamento.pasta, processos=1)
+
+    assert (resumo.lidas, resumo.novos, resumo.atualizados, resumo.rejeitadas) == (2, 0, 1, 0)
+    dados = armazenamento.carregar('Ana Souza')
+    assert dados['paciente']['registro'] == '123'  # Campos fora do CSV são mantidos
+    assert dados['clinicos'] == {'doencas': ['Diabetes']}
+    antropometricos = dados['antropometricos']
+    assert antropometricos['peso_atual'] == 62.5  # A última linha vale
+    assert antropometricos['circ_cintura'] == 80.0
+    assert antropometricos['imc'] == pytest.approx(62.5 / 1.6 ** 2)  # Altura já gravada
+    assert antropometricos['classificacao_imc'] == 'Adequado'
+
+    historico = carregar_historico(dados['historico'], armazenamento.pasta)
+    np.testing.assert_allclose(historico.coluna('peso'), [64.0, 62.5])
+
+
+def test_paciente_novo_com_varias_linhas_conta_uma_vez(tmp_path, armazenamento):
+    caminho = csv(tmp_path, "nome,peso,altura,sexo\n"
+                            "Beto Lima,70,170,M\n"
+                            "Beto Lima,71,170,M\n"
+                            ",50,150,F\n")
+    resumo = importar_csv(caminho, armazenamento, armazenamento.pasta, processos=1,
+                          tamanho_lote=1)
+    assert (resumo.novos, resumo.atualizados, resumo.rejeitadas) == (1, 0, 1)
+    assert resumo.importadas == 2
+    assert resumo.chaves == {'Beto_Lima'}
+    assert armazenamento.carregar('Beto Lima')['paciente']['sexo'] == 'Masculino'
+
+
+def test_importacao_cancelada_entre_lotes(tmp_path, armazenamento):
+    linhas = "".join(f"Paciente {i};60;160\n" for i in range(10))
+    caminho = csv(tmp_path, "nome;peso;altura\n" + linhas)
+    resumo = importar_csv(caminho, armazenamento, armazenamento.pasta, processos=1,
+                          tamanho_lote=2, cancelado=lambda: len(armazenamento.versoes()) >= 4)
+    assert resumo.cancelada
+    assert resumo.lidas == 4
+    assert len(armazenamento.versoes()) == 4
+
+
+def test_mapa_de_colunas():
+    colunas, ignoradas = mapear_colunas(['Paciente', 'Peso (kg)', 'Observações'],
+                                        {'Peso (kg)': 'peso_atual'})
+    assert colunas == {'Paciente': 'nome', 'Peso (kg)': 'peso_atual'}
+    assert ignoradas == ['Observações']
+    with pytest.raises(ValueError):
+        mapear_colunas(['Nome'], {'Nome': 'inexistente'})
@@ -0,0 +1,135 @@
+import json
+import os
+
+import pytest
+
+from armazenamento import ArmazenamentoJSON
+from persistencia import GerenciadorPersistencia, gravar_atomico
+
+
+def test_gravar_atomico_substitui_o_arquivo(tmp_path):
+    caminho = tmp_path / 'sub' / 'avaliacao.json'
+    assert gravar_atomico(str(caminho), b'primeira') == len(b'primeira')
+    gravar_atomico(str(caminho), b'segunda')
+    assert caminho.read_bytes() == b'segunda'
+    assert os.listdir(caminho.parent) == ['avaliacao.json']
+
+
+def test_gravar_atomico_falha_mantem_o_anterior_e_remove_temporario(tmp_path, monkeypatch):
+    caminho = tmp_path / 'avaliacao.json'
+    caminho.write_bytes(b'anterior')
+
+    def replace_falho(origem, destino):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, 'replace', replace_falho)
+    with pytest.raises(OSError):
+        gravar_atomico(str(caminho), b'nova')
+    assert caminho.read_bytes() == b'anterior'
+    assert os.listdir(tmp_path) == ['avaliacao.json']
+
+
+class ArmazenamentoFalho(ArmazenamentoJSON):
+    """Grava como o JSON, mas falha enquanto falhar for True."""
+
+    def __init__(self, pasta):
+        super().__init__(pasta)
+        self.falhar = False
+
+    def gravar(self, lote):
+        if self.falhar:
+            raise OSError("pasta de rede indisponível")
+        return super().gravar(lote)
+
+
+class TrabalhadorManual:
+    """TrabalhadorES sem thread: as tarefas só rodam em executar()."""
+
+    pendentes = 0
+
+    def __init__(self):
+        self.tarefas = []
+
+    def enviar(self, funcao, *args, ao_concluir=None, ao_falhar=None):
+        self.tarefas.append((funcao, args, ao_concluir, ao_falhar))
+
+    def executar(self):
+        tarefas, self.tarefas = self.tarefas, []
+        for funcao, args, ao_concluir, ao_falhar in tarefas:
+            try:
+                resultado = funcao(*args)
+            except Exception as e:
+                ao_falhar(e)
+            else:
+                ao_concluir(resultado)
+
+
+class Tela:
+    """Documento aberto na 'tela' e agendamentos feitos pela persistência."""
+
+    def __init__(self, nome, peso):
+        self.dados = {'paciente': {'nome': nome}, 'antropometricos': {'peso_atual': peso}}
+        self.agendados = []
+
+    def agendar(self, ms, funcao):
+        self.agendados.append(ms)
+        return len(self.agendados)
+
+
+def gerenciador(tmp_path, tela):
+    armazenamento = ArmazenamentoFalho(str(tmp_path))
+    trabalhador = TrabalhadorManual()
+    erros = []
+    persistencia = GerenciadorPersistencia(armazenamento, lambda: tela.dados,
+                                           agendar=tela.agendar, cancelar=lambda _: None,
+                                           trabalhador=trabalhador, ao_falhar=erros.append)
+    return persistencia, armazenamento, trabalhador, erros
+
+
+def gravado(tmp_path, nome):
+    with open(tmp_path / f"avaliacao_{nome}.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_falha_com_o_paciente_na_tela_volta_a_sujar_as_secoes(tmp_path):
+    tela = Tela('Ana', 60)
+    persistencia, armazenamento, trabalhador, erros = gerenciador(tmp_path, tela)
+    armazenamento.falhar = True
+    persistencia.marcar('antropometricos')
+    persistencia.gravar_agora()
+    trabalhador.executar()
+
+    assert len(erros) == 1
+    assert persistencia.sujas == {'antropometricos'}
+    assert persistencia.falhas == []
+    assert tela.agendados[-1] > persistencia.atraso_ms  # Nova tentativa, mais espaçada
+
+    tela.dados['antropometricos']['peso_atual'] = 61  # Editado antes da nova tentativa
+    armazenamento.falhar = False
+    persistencia.gravar_agora()
+    trabalhador.executar()
+    assert not persistencia.pendente
+    assert persistencia.falhas_seguidas == 0
+    assert gravado(tmp_path, 'Ana')['antropometricos']['peso_atual'] == 61
+
+
+def test_falha_depois_de_trocar_de_paciente_guarda_o_instantaneo(tmp_path):
+    tela = Tela('Ana', 60)
+    persistencia, armazenamento, trabalhador, erros = gerenciador(tmp_path, tela)
+    armazenamento.falhar = True
+    persistencia.marcar('antropometricos')
+    persistencia.gravar_agora()
+    tela.dados = {'paciente': {'nome': 'Beto'}, 'antropometricos': {'peso_atual': 80}}
+    trabalhador.executar()  # A falha chega com Beto na tela
+
+    assert persistencia.sujas == set()
+    assert [nome for _, _, nome in persistencia.falhas] == ['Ana']
+    assert persistencia.pendente
+
+    armazenamento.falhar = False
+    persistencia.marcar('antropometricos')
+    persistencia.gravar_agora()
+    trabalhador.executar()
+    assert not persistencia.pendente
+    assert gravado(tmp_path, 'Ana')['antropometricos']['peso_atual'] == 60
+    assert gravado(tmp_path, 'Beto')['antropometricos']['peso_atual'] == 80
@@ -0,0 +1,67 @@
+"""
+Thread de E/S em segundo plano para a interface Tk.
+
+A interface prepara um instantâneo dos dados (já serializado) e entrega a
+tarefa ao TrabalhadorES; a gravação em disco acontece numa thread separada,
+em ordem de chegada. Conclusões e falhas voltam para a thread do Tk por uma
+fila consultada com root.after, pois widgets só podem ser tocados por ela.
+"""
+import queue
+import threading
+
+
+class TrabalhadorES:
+
+    def __init__(self, root, intervalo_ms=50):
+        self.root = root
+        self.intervalo_ms = intervalo_ms
+        self._tarefas = queue.Queue()
+        self._resultados = queue.Queue()
+        self._pendentes = 0
+        self._verificacao = None
+        self._thread = threading.Thread(target=self._executar, name='TrabalhadorES', daemon=True)
+        self._thread.start()
+
+    @property
+    def pendentes(self):
+        return self._pendentes
+
+    def enviar(self, funcao, *args, ao_concluir=None, ao_falhar=None):
+        """Executa funcao(*args) na thread de E/S (chamar só da thread do Tk)."""
+        self._pendentes += 1
+        self._tarefas.put((funcao, args, ao_concluir, ao_falhar))
+        if self._verificacao is None:
+            self._verificacao = self.root.after(self.intervalo_ms, self._verificar)
+
+    def aguardar(self):
+        """Bloqueia até todas as tarefas terminarem e entrega os resultados."""
+        self._tarefas.join()
+        self._entregar()
+
+    def _executar(self):
+        while True:
+            funcao, args, ao_concluir, ao_falhar = self._tarefas.get()
+            try:
+                resultado = funcao(*args)
+            except Exception as e:
+                self._resultados.put((ao_falhar, e))
+            else:
+                self._resultados.put((ao_concluir, resultado))
+            finally:
+                self._tarefas.task_done()
+
+    def _verificar(self):
+        self._verificacao = None
+        self._entregar()
+        if self._pendentes:
+            self._verificacao = self.root.after(self.intervalo_ms, self._verificar)
+
+    def _entregar(self):
+        while True:
+            try:
+                callback, valor = self._resultados.get_nowait()
+            except queue.Empty:
+                return
+            self._pendentes -= 1
+            if callback is not None:
+                callback(valor)